@@ -0,0 +1,107 @@
+# === activity.py ===
+import math
+import logging
+import torch
+from config import (SEGMENT_DURATION, SEGMENT_OVERLAP, ACTIVITY_MIN_RMS_DB, ACTIVITY_MIN_CHANGE_DB,
+                    ACTIVITY_MAX_SKIP_SECONDS, ACTIVITY_BANDS)
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = "active"
+QUIET = "quiet"          # 배경 잡음 수준
+UNCHANGED = "unchanged"  # 마지막으로 처리한 세그먼트와 스펙트럼이 거의 같음
+
+
+class ActivityGate:
+    """
+    분리 전에 마이크별 세그먼트를 처리할지 판단하는 가벼운 게이트
+
+    - RMS가 배경 잡음(noise_sample.pt)보다 min_rms_db 이상 크지 않으면 'quiet'
+    - 마지막으로 처리한 같은 마이크 세그먼트와의 대역별 평균 스펙트럼 차이가
+      min_change_db보다 작으면 'unchanged'
+    - 단, 마지막 처리 후 max_skip_seconds가 지나면 무조건 처리
+
+    마이크별 상태를 순서대로 갱신하므로 한 스레드에서 세그먼트 순서대로 호출해야 한다.
+    """
+
+    def __init__(self, noise_clip, min_rms_db=ACTIVITY_MIN_RMS_DB, min_change_db=ACTIVITY_MIN_CHANGE_DB,
+                 max_skip_seconds=ACTIVITY_MAX_SKIP_SECONDS, bands=ACTIVITY_BANDS, n_fft=2048,
+                 hop_seconds=SEGMENT_DURATION - SEGMENT_OVERLAP):
+        """
+        :param noise_clip: 배경 잡음 샘플 (numpy 배열 또는 텐서)
+        :param min_rms_db: 처리 대상으로 볼 배경 잡음 대비 최소 RMS (dB)
+        :param min_change_db: 처리 대상으로 볼 최소 스펙트럼 변화 (대역 평균 |ΔdB|)
+        :param max_skip_seconds: 연속으로 건너뛸 수 있는 최대 시간 (초)
+        :param bands: 스펙트럼 비교에 사용할 주파수 대역 수
+        :param n_fft: 스펙트럼 계산 FFT 크기
+        :param hop_seconds: 연속된 세그먼트 시작 간격 (초)
+        """
+        self.min_rms_db = min_rms_db
+        self.min_change_db = min_change_db
+        self.max_skip = max(1, math.ceil(max_skip_seconds / hop_seconds))  # 세그먼트 수
+        self.bands = bands
+        self.n_fft = n_fft
+        self.window = torch.hann_window(n_fft)
+
+        noise = torch.as_tensor(noise_clip, dtype=torch.float32).flatten()
+        self.noise_rms = noise.pow(2).mean().sqrt().clamp_min(1e-10).item()
+
+        self._reference = {}  # 마이크 → 마지막으로 처리한 세그먼트의 대역 스펙트럼 (dB)
+        self._skipped = {}    # 마이크 → 연속으로 건너뛴 세그먼트 수
+
+    def _band_spectrum(self, audio):
+        # (mics, samples) → (mics, bands) 대역별 평균 파워 (dB)
+        spec = torch.stft(audio, self.n_fft, hop_length=self.n_fft, window=self.window,
+                          center=False, return_complex=True).abs().pow(2).mean(dim=-1)  # (mics, freqs)
+        usable = spec.shape[-1] // self.bands * self.bands
+        bands = spec[:, 1:usable + 1].reshape(spec.shape[0], self.bands, -1).mean(dim=-1)
+        return 10 * torch.log10(bands + 1e-12)
+
+    def __call__(self, audio):
+        """
+        세그먼트의 마이크별 처리 여부를 판단합니다.
+
+        :param audio: (mics, samples) 텐서
+        :return: 마이크별 판단 리스트 ('active', 'quiet', 'unchanged')
+        """
+        audio = torch.as_tensor(audio, dtype=torch.float32)
+        with metrics.timer("activity_seconds"):
+            rms_db = 20 * torch.log10(audio.pow(2).mean(dim=-1).sqrt().clamp_min(1e-10) / self.noise_rms)
+            spectra = self._band_spectrum(audio)
+
+        decisions = []
+        for mic_idx in range(audio.shape[0]):
+            reference = self._reference.get(mic_idx)
+            if rms_db[mic_idx] < self.min_rms_db:
+                decision = QUIET
+            elif reference is not None and (spectra[mic_idx] - reference).abs().mean() < self.min_change_db:
+                decision = UNCHANGED
+            else:
+                decision = ACTIVE
+
+            if decision != ACTIVE and self._skipped.get(mic_idx, 0) + 1 > self.max_skip:
+                decision = ACTIVE  # 최대 건너뛰기 간격 초과 → 강제 처리
+
+            if decision == ACTIVE:
+                self._reference[mic_idx] = spectra[mic_idx]
+                self._skipped[mic_idx] = 0
+            else:
+                self._skipped[mic_idx] = self._skipped.get(mic_idx, 0) + 1
+                metrics.inc("mic_segments_skipped", reason=decision)
+            logger.debug("🚦 마이크 %d: %s (RMS %+.1fdB)", mic_idx, decision, rms_db[mic_idx].item())
+            decisions.append(decision)
+        return decisions
+
+
+if __name__ == "__main__":
+    # 배경 잡음만 있는 세그먼트 → 기계음 → 같은 기계음 → 다른 기계음 순서로 판단 확인
+    from benchmarks.synthetic import generate_noise_clip, generate_machine_audio
+
+    noise = generate_noise_clip(seconds=5)
+    gate = ActivityGate(noise)
+    idle = torch.as_tensor(generate_noise_clip(seconds=SEGMENT_DURATION, seed=2)).unsqueeze(0)
+    machine = torch.as_tensor(generate_machine_audio(mics=1, seconds=SEGMENT_DURATION, seed=0).T)
+    other = torch.as_tensor(generate_machine_audio(mics=1, seconds=SEGMENT_DURATION, seed=5).T)
+    for name, segment in [("idle", idle), ("machine", machine), ("machine", machine), ("other", other)]:
+        print(f"{name:8s} → {gate(segment)[0]}")
@@ -0,0 +1,9 @@
+"""
+파이프라인 단계별 벤치마크
+
+합성 기계음(fan / pump / bearing 유사 신호)으로 각 단계의 처리 시간과
+real-time factor(처리 시간 / 오디오 길이, 1보다 작아야 실시간)를 측정합니다.
+
+    python -m benchmarks --mics 1 2 4 --seconds 10 --output bench.json
+    python -m benchmarks --compare bench.json
+"""
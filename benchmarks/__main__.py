@@ -0,0 +1,40 @@
+import sys
+import json
+import argparse
+from benchmarks.stages import run_benchmarks, compare_results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="파이프라인 단계별 벤치마크 (CPU, 오프라인)")
+    parser.add_argument("--mics", type=int, nargs="+", default=[1, 2], help="마이크 수 목록")
+    parser.add_argument("--seconds", type=float, nargs="+", default=[10], help="세그먼트 길이 목록 (초)")
+    parser.add_argument("--repeats", type=int, default=3, help="반복 횟수 (중앙값 사용)")
+    parser.add_argument("--stages", nargs="+", default=None, help="측정할 단계 이름 (기본: 전부)")
+    parser.add_argument("--no-checkpoint", action="store_true", help="실제 체크포인트 측정 생략")
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+    parser.add_argument("--compare", default=None, help="비교할 기준 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="회귀로 판단할 RTF 증가율")
+    args = parser.parse_args(argv)
+
+    result = run_benchmarks(args.mics, args.seconds, args.repeats,
+                            include_checkpoint=not args.no_checkpoint, stages=args.stages)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 결과 저장: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(result, baseline, args.threshold)
+        for stage, mics, seconds, base_rtf, rtf in regressions:
+            print(f"❌ 회귀: {stage} mics={mics} {seconds}초: RTF {base_rtf:.3f} → {rtf:.3f}")
+        if regressions:
+            return 1
+        print(f"✅ 회귀 없음 (기준: +{args.threshold * 100:.0f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import io
+import os
+import shutil
+import time
+import platform
+import statistics
+from contextlib import redirect_stdout
+import numpy as np
+import torch
+from config import SAMPLE_RATE, SOURCES, MODEL_PATH, OUTPUT_FOLDER
+from benchmarks.synthetic import generate_machine_audio, generate_noise_clip
+
+
+def time_call(fn, repeats=3):
+    """
+    fn을 한 번 워밍업한 뒤 repeats번 실행하여 중앙값 시간을 반환합니다 (출력은 숨김).
+
+    :return: 중앙값 실행 시간 (초)
+    """
+    with redirect_stdout(io.StringIO()):
+        fn()
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def _load_models(include_checkpoint):
+    from demucs.htdemucs import HTDemucs
+    from model import load_model
+    from resample import init_resampler
+
+    torch.manual_seed(0)
+    models = {"separate_random": HTDemucs(sources=SOURCES).eval()}
+    if include_checkpoint and os.path.exists(MODEL_PATH):
+        with redirect_stdout(io.StringIO()):
+            models["separate_checkpoint"], _ = load_model()
+    with redirect_stdout(io.StringIO()):
+        init_resampler(models["separate_random"].samplerate)
+    return models
+
+
+def build_cases(audio, noise_clip, models, timestamp_str):
+    """
+    한 입력(audio)에 대해 단계별 (이름, 실행 함수) 목록을 만듭니다.
+
+    :param audio: [samples, mics] numpy 배열
+    :param noise_clip: 배경 잡음 샘플
+    :param models: {단계 이름: 모델}
+    :param timestamp_str: save_mel_tensor가 쓸 임시 세그먼트 폴더명
+    """
+    from main import adaptive_level_adjust
+    from denoise import denoise, SpectralGate
+    from model import separate_batch
+    from mel import save_mel_tensor, get_mel_extractor
+    from convert_folder_to_mel import amplify_audio
+
+    mics = audio.shape[1]
+    channels = [np.ascontiguousarray(audio[:, mic_idx]) for mic_idx in range(mics)]
+    gate = SpectralGate.from_noise_clip(noise_clip)
+    with redirect_stdout(io.StringIO()):
+        separated = separate_batch(models["separate_random"], channels)  # (mics, sources, channels, samples)
+    extractor = get_mel_extractor()
+
+    def save_all_mels():
+        for mic_idx in range(mics):
+            for src_idx, src in enumerate(separated[mic_idx]):
+                save_mel_tensor(src, mic_idx, SOURCES[src_idx], timestamp_str)
+
+    cases = [
+        ("denoise", lambda: [denoise(channel, noise_clip) for channel in channels]),
+        ("denoise_torch", lambda: gate(torch.from_numpy(np.ascontiguousarray(audio.T)))),
+        ("adaptive_level_adjust", lambda: [adaptive_level_adjust(channel, target_rms_db=-18.0) for channel in channels]),
+    ]
+    for name, model in models.items():
+        cases.append((name, lambda model=model: separate_batch(model, channels)))
+    cases += [
+        ("save_mel_tensor", save_all_mels),
+        ("mel_extractor", lambda: extractor(separated)),
+        ("amplify_audio", lambda: [amplify_audio(torch.from_numpy(channel).unsqueeze(0)) for channel in channels]),
+    ]
+    return cases
+
+
+def run_benchmarks(mic_counts=(1, 2), durations=(10,), repeats=3, include_checkpoint=True, stages=None):
+    """
+    마이크 수 × 세그먼트 길이 조합마다 모든 단계를 측정합니다.
+
+    :param mic_counts: 마이크 수 목록
+    :param durations: 세그먼트 길이 목록 (초)
+    :param repeats: 반복 횟수 (중앙값 사용)
+    :param include_checkpoint: MODEL_PATH가 있으면 실제 체크포인트도 측정
+    :param stages: 측정할 단계 이름 목록 (None이면 전부)
+    :return: {"meta": {...}, "results": [{"stage", "mics", "seconds", "time", "rtf"}, ...]}
+    """
+    models = _load_models(include_checkpoint)
+    noise_clip = generate_noise_clip()
+    timestamp_str = f"benchmark_{os.getpid()}"
+    results = []
+
+    try:
+        for seconds in durations:
+            for mics in mic_counts:
+                audio = generate_machine_audio(mics=mics, seconds=seconds)
+                for name, fn in build_cases(audio, noise_clip, models, timestamp_str):
+                    if stages is not None and name not in stages:
+                        continue
+                    elapsed = time_call(fn, repeats)
+                    rtf = elapsed / seconds
+                    results.append({"stage": name, "mics": mics, "seconds": seconds,
+                                    "time": elapsed, "rtf": rtf})
+                    print(f"⏱️ {name:<22} mics={mics:<2} {seconds:>4}초: {elapsed:.3f}초 (RTF {rtf:.3f})")
+    finally:
+        shutil.rmtree(os.path.join(OUTPUT_FOLDER, timestamp_str), ignore_errors=True)
+
+    meta = {
+        "torch": torch.__version__,
+        "threads": torch.get_num_threads(),
+        "cpu": platform.processor() or platform.machine(),
+        "sample_rate": SAMPLE_RATE,
+        "repeats": repeats,
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare_results(current, baseline, threshold=0.2):
+    """
+    기준 결과와 비교해 RTF가 threshold 비율 이상 나빠진 항목을 찾습니다.
+
+    :param current: run_benchmarks 결과
+    :param baseline: 저장된 기준 결과
+    :param threshold: 허용 증가율 (0.2 = 20%)
+    :return: [(stage, mics, seconds, 기준 RTF, 현재 RTF), ...]
+    """
+    reference = {(r["stage"], r["mics"], r["seconds"]): r["rtf"] for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        key = (r["stage"], r["mics"], r["seconds"])
+        if key not in reference:
+            continue
+        base_rtf = reference[key]
+        if r["rtf"] > base_rtf * (1 + threshold):
+            regressions.append((*key, base_rtf, r["rtf"]))
+    return regressions
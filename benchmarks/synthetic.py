@@ -0,0 +1,67 @@
+import numpy as np
+from config import SAMPLE_RATE
+
+
+def fan_sound(n, sr, rng, blade_hz=None):
+    """블레이드 통과 주파수의 고조파 + 광대역 바람 소리"""
+    t = np.arange(n) / sr
+    blade_hz = blade_hz or rng.uniform(80, 160)
+    tone = sum(np.sin(2 * np.pi * blade_hz * k * t + rng.uniform(0, 2 * np.pi)) / k for k in range(1, 6))
+    wind = np.convolve(rng.standard_normal(n), np.ones(32) / 32, mode="same")
+    return 0.3 * tone + 0.5 * wind
+
+
+def pump_sound(n, sr, rng, cycle_hz=None):
+    """저주파 맥동으로 진폭 변조된 모터 고조파"""
+    t = np.arange(n) / sr
+    cycle_hz = cycle_hz or rng.uniform(2, 6)
+    motor_hz = rng.uniform(40, 60)
+    pulsation = 0.6 + 0.4 * np.sin(2 * np.pi * cycle_hz * t)
+    motor = sum(np.sin(2 * np.pi * motor_hz * k * t) / k for k in range(1, 8))
+    return 0.4 * pulsation * motor
+
+
+def bearing_sound(n, sr, rng, fault_hz=None):
+    """결함 주파수로 반복되는 충격 + 고주파 공진"""
+    fault_hz = fault_hz or rng.uniform(90, 200)
+    resonance_hz = rng.uniform(3000, 6000)
+    impulses = np.zeros(n)
+    period = int(sr / fault_hz)
+    impulses[::period] = 1.0
+    decay = np.arange(int(0.005 * sr)) / sr
+    ring = np.exp(-decay * 800) * np.sin(2 * np.pi * resonance_hz * decay)
+    return 0.5 * np.convolve(impulses, ring, mode="same") + 0.02 * rng.standard_normal(n)
+
+
+GENERATORS = {"fan": fan_sound, "pump": pump_sound, "bearing": bearing_sound}
+
+
+def generate_machine_audio(mics=2, seconds=10, sr=SAMPLE_RATE, seed=0, noise_level=0.01):
+    """
+    여러 마이크가 기계음 혼합을 듣는 상황을 흉내 낸 합성 오디오를 생성합니다.
+
+    각 마이크는 fan / pump / bearing 신호를 서로 다른 비율로 섞어 듣습니다.
+
+    :param mics: 마이크(채널) 수
+    :param seconds: 길이 (초)
+    :param sr: 샘플링 주파수
+    :param seed: 난수 시드 (같은 시드면 같은 결과)
+    :param noise_level: 배경 잡음 크기
+    :return: [samples, channels] float32 numpy 배열 (record_segment와 같은 형태)
+    """
+    rng = np.random.default_rng(seed)
+    n = int(sr * seconds)
+    sources = [generate(n, sr, rng) for generate in GENERATORS.values()]
+
+    audio = np.empty((n, mics), dtype=np.float32)
+    for mic_idx in range(mics):
+        weights = rng.dirichlet(np.ones(len(sources)))
+        mix = sum(w * s for w, s in zip(weights, sources)) + noise_level * rng.standard_normal(n)
+        audio[:, mic_idx] = 0.5 * mix / (np.abs(mix).max() + 1e-8)
+    return audio
+
+
+def generate_noise_clip(seconds=10, sr=SAMPLE_RATE, seed=1, noise_level=0.01):
+    """배경 잡음 샘플 (noise_sample.pt 대용, 1차원 float32 배열)"""
+    rng = np.random.default_rng(seed)
+    return (noise_level * rng.standard_normal(int(sr * seconds))).astype(np.float32)
@@ -0,0 +1,315 @@
+# === capture.py ===
+import threading
+import time
+import logging
+import numpy as np
+from config import SAMPLE_RATE, SEGMENT_DURATION, SEGMENT_OVERLAP, RING_BUFFER_SECONDS, INPUT_DEVICE
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """
+    미리 할당된 다채널 링 버퍼 (미러링 방식)
+
+    각 프레임을 [i]와 [i + capacity] 두 위치에 기록하므로,
+    어느 위치에서 시작하는 윈도우든 복사 없이 연속된 numpy view로 꺼낼 수 있다.
+    """
+
+    def __init__(self, capacity, channels, dtype=np.float32):
+        """
+        :param capacity: 버퍼 길이 (프레임 수)
+        :param channels: 채널 수
+        :param dtype: 샘플 자료형
+        """
+        self.capacity = int(capacity)
+        self.channels = int(channels)
+        self._data = np.zeros((2 * self.capacity, self.channels), dtype=dtype)
+        self.write_pos = 0  # 지금까지 기록된 누적 프레임 수
+
+    def write(self, frames):
+        """
+        프레임을 기록합니다. capacity보다 긴 입력은 마지막 capacity 프레임만 남습니다.
+
+        :param frames: (frames, channels) 형태의 numpy 배열
+        """
+        n = len(frames)
+        if n > self.capacity:
+            self.write_pos += n - self.capacity
+            frames = frames[-self.capacity:]
+            n = self.capacity
+
+        start = self.write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = frames[:first]
+        self._data[start + self.capacity:start + self.capacity + first] = frames[:first]
+
+        rest = n - first
+        if rest > 0:
+            self._data[:rest] = frames[first:]
+            self._data[self.capacity:self.capacity + rest] = frames[first:]
+
+        self.write_pos += n
+
+    def view(self, pos, length):
+        """
+        누적 프레임 위치 pos부터 length 프레임을 복사 없이 반환합니다.
+
+        :param pos: 누적 프레임 위치
+        :param length: 윈도우 길이 (프레임 수, capacity 이하)
+        :return: (length, channels) numpy view
+        """
+        if length > self.capacity:
+            raise ValueError(f"윈도우 길이({length})가 버퍼 크기({self.capacity})보다 큽니다")
+        start = pos % self.capacity
+        return self._data[start:start + length]
+
+
+class FakeStatus:
+    """sounddevice.CallbackFlags 대용 (테스트용)"""
+
+    def __init__(self, input_overflow=False):
+        self.input_overflow = input_overflow
+
+    def __bool__(self):
+        return self.input_overflow
+
+
+class FakeInputStream:
+    """
+    오디오 하드웨어 없이 ContinuousRecorder를 구동하기 위한 가짜 입력 스트림
+
+    sounddevice.InputStream과 같은 방식으로 별도 스레드에서 callback을 호출한다.
+    """
+
+    def __init__(self, samplerate, channels, callback, blocksize=1024, signal=None, realtime=True):
+        """
+        :param samplerate: 샘플링 주파수
+        :param channels: 채널 수
+        :param callback: callback(indata, frames, time_info, status)
+        :param blocksize: 한 번에 전달할 프레임 수
+        :param signal: signal(start_frame, frames, channels) -> (frames, channels) 배열, None이면 약한 잡음
+        :param realtime: True면 실제 시간 속도로, False면 최대 속도로 전달
+        """
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize or 1024
+        self._callback = callback
+        self._signal = signal
+        self._realtime = realtime
+        self._rng = np.random.default_rng(0)
+        self._running = threading.Event()
+        self._thread = None
+        self.frames_sent = 0
+
+    def _generate(self, start, frames):
+        if self._signal is not None:
+            return np.asarray(self._signal(start, frames, self.channels), dtype=np.float32)
+        return (self._rng.standard_normal((frames, self.channels)) * 1e-3).astype(np.float32)
+
+    def _run(self):
+        period = self.blocksize / self.samplerate
+        next_time = time.monotonic()
+        while self._running.is_set():
+            block = self._generate(self.frames_sent, self.blocksize)
+            self._callback(block, self.blocksize, None, FakeStatus())
+            self.frames_sent += self.blocksize
+            if self._realtime:
+                next_time += period
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def start(self):
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+
+
+def fake_stream_factory(signal=None, realtime=True):
+    """
+    ContinuousRecorder(stream_factory=...)에 넘길 가짜 스트림 생성 함수를 만듭니다.
+
+    :param signal: FakeInputStream의 signal 인자
+    :param realtime: FakeInputStream의 realtime 인자
+    """
+    def factory(samplerate, channels, callback, device=None, blocksize=0):
+        return FakeInputStream(samplerate, channels, callback, blocksize=blocksize,
+                               signal=signal, realtime=realtime)
+    return factory
+
+
+def _sounddevice_stream_factory(samplerate, channels, callback, device=None, blocksize=0):
+    import sounddevice as sd
+    return sd.InputStream(samplerate=samplerate, channels=channels, dtype='float32',
+                          device=device, blocksize=blocksize, callback=callback)
+
+
+class ContinuousRecorder:
+    """
+    callback 방식 InputStream으로 끊김 없이 녹음하면서
+    SEGMENT_DURATION 길이의 윈도우를 복사 없이 꺼내 주는 캡처 장치
+
+    반환된 윈도우는 링 버퍼의 view이므로, 버퍼가 한 바퀴 돌기 전
+    (buffer_seconds - segment_duration 초 이내)에 사용하거나 직접 복사해야 한다.
+    read_segment(hold=True)로 받은 윈도우는 release_segment()로 반납할 때까지 추적하며,
+    그 전에 녹음이 윈도우를 덮어쓰면 overrun으로 센다 (overwritten_segments).
+    """
+
+    def __init__(self, device=INPUT_DEVICE, channels=None, samplerate=SAMPLE_RATE,
+                 segment_duration=SEGMENT_DURATION, overlap=SEGMENT_OVERLAP,
+                 buffer_seconds=RING_BUFFER_SECONDS, stream_factory=None, blocksize=0):
+        """
+        :param device: 입력 장치 (None이면 기본 장치)
+        :param channels: 채널 수 (None이면 장치의 최대 입력 채널 수)
+        :param samplerate: 샘플링 주파수
+        :param segment_duration: 세그먼트 길이 (초)
+        :param overlap: 연속된 세그먼트 간 겹치는 길이 (초)
+        :param buffer_seconds: 링 버퍼 길이 (초)
+        :param stream_factory: 스트림 생성 함수 (None이면 sounddevice 사용, 테스트 시 fake_stream_factory())
+        :param blocksize: callback 한 번당 프레임 수 (0이면 장치 기본값)
+        """
+        if stream_factory is None:
+            stream_factory = _sounddevice_stream_factory
+            if channels is None:
+                import sounddevice as sd
+                device_info = sd.query_devices(device, kind='input')
+                channels = device_info['max_input_channels']  # type: ignore
+        if channels is None:
+            raise ValueError("가짜 스트림을 사용할 때는 channels를 지정해야 합니다")
+
+        self.samplerate = samplerate
+        self.channels = int(channels)
+        self.segment_frames = int(samplerate * segment_duration)
+        self.hop_frames = self.segment_frames - int(samplerate * overlap)
+        if self.hop_frames <= 0:
+            raise ValueError(f"overlap({overlap}초)은 segment_duration({segment_duration}초)보다 작아야 합니다")
+
+        capacity = int(samplerate * buffer_seconds)
+        if capacity < self.segment_frames:
+            raise ValueError(f"buffer_seconds({buffer_seconds}초)는 segment_duration 이상이어야 합니다")
+        self._ring = RingBuffer(capacity, self.channels)
+
+        self._cond = threading.Condition()
+        self._read_pos = 0
+        self._closed = False
+        self._held = {}  # 소비자가 아직 사용 중인 윈도우 시작 위치 (삽입 순서 = 위치 순서)
+        self.last_segment_start = 0  # 마지막으로 반환한 윈도우의 누적 프레임 위치
+
+        # 통계
+        self.overruns = 0         # 소비가 늦어 읽지 않은 데이터를 덮어쓴 횟수
+        self.dropped_frames = 0   # 덮어써서 잃어버린 프레임 수
+        self.overwritten_segments = 0  # 반납 전에 덮어써진 hold 윈도우 수
+        self.input_overflows = 0  # 장치 드라이버가 보고한 입력 overflow 횟수
+        self._reported_drops = 0
+        self._reported_overwrites = 0
+
+        self._stream = stream_factory(samplerate, self.channels, self._callback,
+                                      device=device, blocksize=blocksize)
+
+    def _callback(self, indata, frames, time_info, status):
+        if status and getattr(status, 'input_overflow', False):
+            self.input_overflows += 1
+
+        with self._cond:
+            limit = self._ring.write_pos + frames - self._ring.capacity  # 이번 기록으로 이 위치 앞은 덮어써짐
+            if self._read_pos < limit:
+                # 아직 읽지 않은 가장 오래된 프레임을 덮어쓰게 됨 → 읽기 위치를 앞으로 당김
+                self.overruns += 1
+                self.dropped_frames += limit - self._read_pos
+                self._read_pos = limit
+            while self._held and next(iter(self._held)) < limit:
+                # 파이프라인이 아직 사용 중인 윈도우를 덮어쓰게 됨 (처리가 녹음보다 느림)
+                del self._held[next(iter(self._held))]
+                self.overruns += 1
+                self.overwritten_segments += 1
+            self._ring.write(indata)
+            self._cond.notify_all()
+
+    def start(self):
+        self._stream.start()
+        logger.info("🎙 연속 녹음 시작 (채널: %d, 세그먼트: %d프레임, hop: %d프레임)",
+                    self.channels, self.segment_frames, self.hop_frames)
+
+    def close(self):
+        self._stream.stop()
+        self._stream.close()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()  # read_segment에서 대기 중인 스레드를 깨움
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def available_frames(self):
+        """읽지 않고 버퍼에 쌓여 있는 프레임 수"""
+        with self._cond:
+            return self._ring.write_pos - self._read_pos
+
+    def read_segment(self, timeout=None, hold=False):
+        """
+        다음 세그먼트 윈도우를 기다렸다가 반환합니다.
+
+        :param timeout: 최대 대기 시간 (초), None이면 무한 대기
+        :param hold: True면 release_segment(last_segment_start)로 반납할 때까지 덮어쓰기를 감시
+        :return: (samples, channels) numpy view, 시간 초과 또는 close() 후 남은 세그먼트가 없으면 None
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._closed or self._ring.write_pos - self._read_pos >= self.segment_frames, timeout)
+            if self._ring.write_pos - self._read_pos < self.segment_frames:
+                return None
+            start = self._read_pos
+            window = self._ring.view(start, self.segment_frames)
+            self._read_pos += self.hop_frames
+            self.last_segment_start = start
+            if hold:
+                self._held[start] = True
+            dropped = self.dropped_frames
+            overwritten = self.overwritten_segments
+
+        if dropped > self._reported_drops:
+            logger.warning("⚠️ 링 버퍼 overrun: 누적 %d프레임 손실 (%d회)", dropped, self.overruns)
+            metrics.inc("capture_dropped_frames", dropped - self._reported_drops)
+            self._reported_drops = dropped
+        if overwritten > self._reported_overwrites:
+            logger.warning("⚠️ 링 버퍼 overrun: 처리 전에 덮어써진 세그먼트 누적 %d개", overwritten)
+            metrics.inc("capture_overwritten_segments", overwritten - self._reported_overwrites)
+            self._reported_overwrites = overwritten
+        return window
+
+    def release_segment(self, start):
+        """
+        read_segment(hold=True)로 받은 윈도우를 다 썼음(복사했음)을 알립니다.
+
+        :param start: 윈도우의 누적 프레임 위치 (read_segment 직후의 last_segment_start)
+        """
+        with self._cond:
+            self._held.pop(start, None)
+
+    def stats(self):
+        """캡처 상태 통계"""
+        with self._cond:
+            return {
+                "frames_written": self._ring.write_pos,
+                "frames_buffered": self._ring.write_pos - self._read_pos,
+                "overruns": self.overruns,
+                "dropped_frames": self.dropped_frames,
+                "overwritten_segments": self.overwritten_segments,
+                "segments_held": len(self._held),
+                "input_overflows": self.input_overflows,
+            }
@@ -3,16 +3,109 @@ import torch
 SAMPLE_RATE = 44100
 MEL_SAMPLE_RATE = 16000
 SEGMENT_DURATION = 10
+SEGMENT_OVERLAP = 0.0  # 연속된 세그먼트 간 겹치는 길이 (초)
+RING_BUFFER_SECONDS = 60  # 연속 녹음 링 버퍼 길이 (초)
+INPUT_DEVICE = None  # None이면 기본 입력 장치
+INPUT_SOURCE = "mic"  # 'mic': 실시간 녹음 | 'file': 녹음 파일 재생 | 'synthetic': 합성 기계음 (inputs.py)
+INPUT_FILE_PATH = "recordings/shift.wav"  # 'file' 입력의 다채널 WAV / FLAC 파일
+INPUT_SPEED = 1.0  # 'file' / 'synthetic' 입력 재생 속도 (1.0 실시간, 10.0 10배속, 0이면 최대 속도)
+INPUT_LOOP = False  # True면 'file' 입력을 끝에서 처음으로 돌아가 계속 재생
+INPUT_SYNTHETIC_SEED = 0  # 'synthetic' 입력 난수 시드 (같으면 같은 입력)
 MEL_SIZE = (240, 240)
+MEL_DIRECT = False  # True면 mel을 240×240 해상도로 직접 계산 (interpolate 생략)
 MODEL_PATH = "model/checkpoint.th"
+MODEL_ARTIFACT_PATH = "model/checkpoint.artifact.pt"  # 체크포인트에서 만든 검증된 가중치 아티팩트 (mmap 로드용)
 NOISE_SAMPLE_PATH = "noise_sample.pt"
+# 'noisereduce': 기존과 같은 채널별 nr.reduce_noise (non-stationary 모드 - y_noise는 사용되지 않음)
+# 'torch': 잡음 샘플 통계로 모든 채널을 배치 STFT 처리하는 stationary gating (빠르지만 결과가 기존과 다름,
+#          python denoise.py로 기존 호출과의 차이를 확인하고 승인된 뒤 전환)
+DENOISE_BACKEND = "noisereduce"
+DENOISE_TOLERANCE_DB = 30.0  # torch 구현이 noisereduce stationary 모드와 일치한다고 볼 최소 SNR (dB)
+LEVEL_TARGET_RMS_DB = -18.0  # 레벨 조정 목표 RMS (조용한 환경 -15dB, 일반 산업 환경 -18dB, 시끄러운 공장 -21dB)
+DSP_BUFFER_POOL = 8  # 전처리 버퍼 개수 (파이프라인에 동시에 떠 있을 수 있는 세그먼트 수 이상)
+DSP_ACQUIRE_TIMEOUT = 30.0  # 빈 전처리 버퍼를 기다리는 최대 시간 (초, 넘으면 버퍼 누수로 보고 해당 세그먼트 실패 처리)
+ACTIVITY_GATE = False  # True면 배경 잡음 수준이거나 변화가 없는 마이크 세그먼트는 분리하지 않음
+ACTIVITY_MIN_RMS_DB = 3.0  # 처리 대상으로 볼 배경 잡음 대비 최소 RMS (dB)
+ACTIVITY_MIN_CHANGE_DB = 1.5  # 처리 대상으로 볼 마지막 처리 세그먼트 대비 최소 스펙트럼 변화 (dB)
+ACTIVITY_MAX_SKIP_SECONDS = 300  # 마이크별로 연속해서 건너뛸 수 있는 최대 시간 (초)
+ACTIVITY_BANDS = 32  # 스펙트럼 변화 비교에 사용할 주파수 대역 수
 OUTPUT_FOLDER = "output"
+OUTPUT_LAYOUT = "segment"  # 'segment': 세그먼트당 통합 파일(segment.pt), 'per_file': mic_N/<source>.pt
+WRITER_QUEUE_SIZE = 8  # 백그라운드 writer에 대기 가능한 최대 세그먼트 수
+SAVE_TO_DISK = True  # False면 디스크에 저장하지 않음 (공유 메모리 전달만)
+PUBLISH_SHM = False  # True면 분류기에 공유 메모리 + Unix 소켓으로 실시간 전달
+SHM_NAME = "audix_mels"  # 공유 메모리 이름
+SHM_SOCKET_PATH = "/tmp/audix_mels.sock"  # 알림용 Unix 소켓 경로
+SHM_SLOTS = 8  # 공유 메모리 링 버퍼 슬롯 수
+SHM_MAX_MELS = 32  # 세그먼트당 최대 mel 개수 (마이크 수 × 부품 수)
 DEVICE = torch.device("cpu")
 #DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 SOURCES = ["fan", "pump", "slider", "bearing", "gearbox"]  # 모델에 따라 조정
 FORCE_STEREO_INPUT = True  # 모델이 2채널 입력을 요구함
+MONO_INFERENCE = False  # True면 첫 레이어 가중치를 합쳐 모노로 직접 추론 (복제 없음)
+MONO_CHECK_MIN_SISDR = 40.0  # 모노 경로가 스테레오 복제 경로와 일치한다고 볼 최소 SI-SDR (dB)
 CHANNELS = 2
-CHANNEL_PARTS = [
-    ['fan', 'pump'],              # 채널 0
-    ['bearing', 'gearbox', 'slider']  # 채널 1
-]
\ No newline at end of file
+SEPARATION_MAX_BATCH = 4  # 한 번의 모델 호출에 넣을 최대 구간 수 (메모리 예산이 있으면 그 안에서 자동으로 줄어듦)
+SEPARATION_CHUNK_SECONDS = None  # 모델에 한 번에 넣는 구간 길이 (초, None이면 모델 훈련 세그먼트 길이)
+SEPARATION_CHUNK_OVERLAP = 0.25  # 이웃 구간 겹침 비율 (겹친 부분은 삼각 가중치로 합침)
+SEPARATION_SHIFTS = 1  # 무작위 시간 이동 후 평균 낼 횟수 (0이면 이동 없음, 클수록 품질↑ 속도↓)
+SEPARATION_MEMORY_BUDGET_MB = None  # 분리 1회 추론 메모리 상한 (MB, None이면 제한 없음) → 구간 수/길이 자동 선택
+SEPARATION_BYTES_PER_SAMPLE = 2000  # 모델 입력 샘플 하나당 추론 메모리 추정치 (바이트, python separator.py로 측정)
+SEPARATION_OUTPUT_POOL = 4  # 재사용하는 분리 결과 버퍼 수 (파이프라인에 동시에 떠 있는 세그먼트 수 이상)
+SEPARATION_ACQUIRE_TIMEOUT = 30.0  # 빈 분리 결과 버퍼를 기다리는 최대 시간 (초, 넘으면 버퍼 누수로 보고 해당 세그먼트 실패 처리)
+SEPARATION_TRACK_PEAK_RSS = True  # True면 분리 호출마다 최대 RSS 측정 (Linux)
+INFERENCE_MODE = "fp32"  # 'fp32' | 'int8' (동적 양자화) | 'bf16' (autocast) | 'compile' (torch.compile)
+INTRA_OP_THREADS = None  # 연산 내부 스레드 수 (None이면 PyTorch 기본값)
+INTER_OP_THREADS = None  # 연산 간 스레드 수 (None이면 PyTorch 기본값)
+INFERENCE_MAX_SISDR_DROP = 0.5  # fp32 대비 허용하는 평균 SI-SDR 감소량 (dB)
+EVAL_BATCH_SIZE = 8  # 배치 평가에서 한 번에 분리할 클립 수
+EVAL_IO_WORKERS = 4  # 배치 평가에서 오디오를 미리 읽는 스레드 수
+EVAL_REPORT_PATH = "reports/separation_eval"  # 배치 평가 리포트 경로 (.csv / .json)
+USE_MODEL_SERVER = False  # True면 모델을 직접 로드하지 않고 model_server.py에 분리를 요청
+MODEL_SERVER_SOCKET = "/tmp/audix_model.sock"  # 모델 서버 Unix 소켓 경로
+MODEL_SERVER_MAX_BATCH = 8  # 모델 서버가 한 번에 모아 처리할 최대 마이크 수 (모델 호출당 구간 수는 SEPARATION_MAX_BATCH)
+MODEL_SERVER_MAX_WAIT = 0.05  # 모델 서버가 요청을 모으기 위해 기다리는 최대 시간 (초)
+
+# 스트리밍 분리 설정 (streaming.py, 평가용 - 파이프라인에는 연결하지 않음)
+# hop마다 context + hop + crossfade + lookahead를 다시 분리 → 기본값에서 입력 1초당 5.75초 분량 연산
+STREAM_HOP_SECONDS = 1.0  # 한 번에 내보내는 조각 길이 (초)
+STREAM_CONTEXT_SECONDS = 4.0  # 함께 분리하는 과거 문맥 길이 (초)
+STREAM_LOOKAHEAD_SECONDS = 0.5  # 기다렸다가 함께 분리하는 미래 문맥 길이 (초, 지연 시간에 포함)
+STREAM_CROSSFADE_SECONDS = 0.25  # 이전 조각과 섞는 구간 길이 (초, 지연 시간에 포함)
+
+# 빠른 시작 (cold start)
+FAST_START = True  # True면 가중치 아티팩트를 mmap으로 로드하고 Resample / mel 필터 커널을 캐시에서 읽음
+KERNEL_CACHE_PATH = "cache/dsp_kernels.pt"  # Resample / mel 필터 커널 캐시 파일
+WARM_UP = True  # True면 녹음 시작 전에 무음에 가까운 세그먼트로 전처리 → 분리 → mel 경로를 한 번 실행
+
+# 로그 / 지표
+LOG_LEVEL = "INFO"  # 세그먼트별 상세 로그는 "DEBUG"
+METRICS_ENABLED = True  # False면 지표 기록 비용이 거의 0
+METRICS_PATH = "metrics.prom"  # 지표 스냅샷 파일
+METRICS_FORMAT = "prometheus"  # 'prometheus' 또는 'json'
+METRICS_INTERVAL = 10  # 지표 파일 갱신 주기 (초)
+# 마이크 구성 (채널 순서가 아니라 id로 부품을 찾음)
+#   id: 마이크 번호 (출력 mic 인덱스), device: 입력 장치 (None이면 기본 장치),
+#   channel: 장치 안의 채널 번호, parts: 저장할 부품 (None이면 전체)
+MICROPHONES = [
+    {"id": 0, "device": None, "channel": 0, "parts": ['fan', 'pump']},
+    {"id": 1, "device": None, "channel": 1, "parts": ['bearing', 'gearbox', 'slider']},
+]
+
+# 멀티 프로세스 슈퍼바이저 (supervisor.py)
+# 워커 프로세스는 입력 장치마다 하나 (장치는 한 프로세스만 열 수 있는 경우가 많아 채널을 나눠 녹음하지 않음)
+SUPERVISOR_THREADS_PER_WORKER = None  # 워커별 연산 스레드 수 (None이면 CPU 코어를 워커별 마이크 수에 비례해 나눔)
+SUPERVISOR_PIN_CPUS = True  # 워커마다 서로 다른 CPU 코어에 고정 (Linux)
+SUPERVISOR_RESTART_DELAY = 5  # 비정상 종료된 워커를 다시 시작하기 전 대기 시간 (초)
+
+# 파이프라인 설정
+PIPELINE_WORKERS = {  # 단계별 워커 스레드 수
+    "activity": 1,  # 마이크별 이전 세그먼트 상태를 사용하므로 항상 1
+    "denoise": 1,
+    "level": 1,
+    "separate": 1,
+    "mel": 1,
+    "save": 1,
+}
+PIPELINE_QUEUE_SIZE = 2  # 단계별 입력 큐 최대 길이
+PIPELINE_DROP_POLICY = "block"  # 'block' | 'drop_newest' | 'drop_oldest'
@@ -1,15 +1,25 @@
 import os
+import json
 import torchaudio
 import torch
 import random
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from mel import save_mel_tensor
-from config import SAMPLE_RATE, OUTPUT_FOLDER
+from resample import get_resampler
+from config import SAMPLE_RATE, OUTPUT_FOLDER, SEGMENT_DURATION
 
 # === 사용자 설정 ===
 INPUT_FOLDER = "D:/machine_sounds"
 MIC_IDX = 0
 TIMESTAMP_STR = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+RESUME_TIMESTAMP = None  # 이전 실행의 폴더명(예: '2025-07-16_15-03-20')을 지정하면 이어서 변환
+NUM_WORKERS = os.cpu_count() or 1  # 변환 워커 프로세스 수 (워커마다 torch 스레드 1개)
+MAX_IN_FLIGHT_PER_WORKER = 2  # 워커당 동시에 제출해 둘 최대 작업 수
+MANIFEST_NAME = "manifest.json"
+MANIFEST_SAVE_EVERY = 100  # 이 개수만큼 처리할 때마다 manifest 저장
+STREAM_WINDOWS = False  # True면 긴 파일을 SEGMENT_DURATION 윈도우로 나누어 윈도우마다 mel 저장
+WINDOW_HOP = None  # 스트리밍 윈도우 시작 간격 (초), None이면 SEGMENT_DURATION (겹침 없음)
 
 # === 증폭 설정 ===
 TARGET_RMS_DB = -12.0  # 고정된 목표 레벨 (일관성을 위해)
@@ -61,11 +71,52 @@ def amplify_audio(waveform):
     
     return amplified_audio
 
-def convert_all_audio_recursively(input_folder):
-    folder_counts = {}  # 각 폴더 이름별 카운터
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac')
 
-    for root, _, files in os.walk(input_folder):
-        files = sorted([f for f in files if f.lower().endswith(('.wav', '.mp3', '.flac'))])
+
+def _get_resampler(sr):
+    # 워커 프로세스별로 원본 샘플레이트마다 같은 Resample 모듈 재사용
+    return get_resampler(sr, SAMPLE_RATE, device="cpu")
+
+
+def load_manifest(path):
+    """
+    변환 manifest를 읽습니다. 없으면 빈 manifest를 반환합니다.
+
+    형식: {"files": {원본 경로: {"size", "mtime", "name", "status", "error"}}}
+    """
+    if not os.path.exists(path):
+        return {"files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path):
+    """manifest를 임시 파일에 쓴 뒤 rename하여 원자적으로 저장합니다."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def plan_conversion(input_folder, manifest):
+    """
+    변환할 파일 목록과 출력 이름을 미리 결정합니다.
+
+    폴더/파일을 정렬된 순서로 순회하므로 이름은 실행마다 같으며,
+    manifest에 이미 있는 파일은 기존 이름을 유지합니다.
+
+    :param input_folder: 입력 최상위 폴더
+    :param manifest: load_manifest() 결과
+    :return: [(file_path, numbered_name, size, mtime), ...]
+    """
+    entries = manifest["files"]
+    used_names = {entry["name"] for entry in entries.values()}
+    plan = []
+
+    for root, dirs, files in os.walk(input_folder):
+        dirs.sort()
+        files = sorted([f for f in files if f.lower().endswith(AUDIO_EXTENSIONS)])
         if not files:
             continue
 
@@ -75,42 +126,202 @@ def convert_all_audio_recursively(input_folder):
             # 최상위 폴더면 스킵 (파일이 있을 경우에만 해당됨)
             continue
 
-        folder_counts.setdefault(folder_name, 1)
-
+        count = 1
         for file_name in files:
             file_path = os.path.join(root, file_name)
-            try:
-                waveform, sr = torchaudio.load(file_path)
+            stat = os.stat(file_path)
 
-                # 모노 처리
-                if waveform.shape[0] > 1:
-                    waveform = waveform.mean(dim=0, keepdim=True)
+            if file_path in entries:
+                numbered_name = entries[file_path]["name"]
+            else:
+                # 파일 이름: foldername001.pt, foldername002.pt, ...
+                while f"{folder_name}{count:03d}" in used_names:
+                    count += 1
+                numbered_name = f"{folder_name}{count:03d}"
+                used_names.add(numbered_name)
 
-                # 리샘플링
-                if sr != SAMPLE_RATE:
-                    resampler = torchaudio.transforms.Resample(orig_freq=sr, new_freq=SAMPLE_RATE)
-                    waveform = resampler(waveform)
+            plan.append((file_path, numbered_name, stat.st_size, stat.st_mtime))
 
-                # 🔊 오디오 증폭 (-12dB ~ -6dB 범위로)
-                waveform = amplify_audio(waveform)
+    return plan
 
-                # 파일 이름: foldername001.pt, foldername002.pt, ...
-                count = folder_counts[folder_name]
-                numbered_name = f"{folder_name}{count:03d}"
-                folder_counts[folder_name] += 1
 
+def iter_audio_windows(file_path, window_seconds=SEGMENT_DURATION, hop_seconds=None):
+    """
+    파일을 window_seconds 길이씩 나누어 디코딩합니다 (메모리는 윈도우 하나 크기로 제한).
+
+    마지막 윈도우가 절반보다 짧으면 버립니다 (파일 전체가 한 윈도우보다 짧은 경우 제외).
+
+    :param file_path: 오디오 파일 경로
+    :param window_seconds: 윈도우 길이 (초)
+    :param hop_seconds: 윈도우 시작 간격 (초), None이면 window_seconds (겹침 없음)
+    :return: (SAMPLE_RATE로 리샘플링된 [1, time] 모노 텐서) generator
+    """
+    sr = torchaudio.info(file_path).sample_rate
+    window_frames = int(sr * window_seconds)
+    hop_frames = int(sr * (hop_seconds or window_seconds))
+    resampler = _get_resampler(sr) if sr != SAMPLE_RATE else None
+
+    offset = 0
+    while True:
+        waveform, _ = torchaudio.load(file_path, frame_offset=offset, num_frames=window_frames)
+        length = waveform.shape[1]
+        if length == 0 or (offset > 0 and length < window_frames // 2):
+            break
+
+        # 모노 처리
+        if waveform.shape[0] > 1:
+            waveform = waveform.mean(dim=0, keepdim=True)
+
+        # 리샘플링 (원본 샘플레이트별로 같은 Resample 모듈 재사용)
+        if resampler is not None:
+            waveform = resampler(waveform)
+
+        yield waveform
+
+        if length < window_frames:
+            break
+        offset += hop_frames
+
+
+def window_name(numbered_name, window_idx):
+    """스트리밍 모드의 윈도우별 출력 이름 (예: fan001_w0003)"""
+    return f"{numbered_name}_w{window_idx:04d}"
+
+
+def convert_file(file_path, numbered_name, timestamp_str, stream=STREAM_WINDOWS, hop_seconds=WINDOW_HOP):
+    """
+    오디오 파일 하나를 mel 텐서로 변환해 저장합니다 (워커 프로세스에서 실행).
+
+    stream=True이면 SEGMENT_DURATION 윈도우마다 따로 증폭하고 mel을 저장합니다.
+
+    :return: (file_path, numbered_name, 오류 메시지 또는 None, 저장한 윈도우 수)
+    """
+    try:
+        if stream:
+            windows = 0
+            for window_idx, waveform in enumerate(iter_audio_windows(file_path, hop_seconds=hop_seconds)):
                 save_mel_tensor(
-                    source_tensor=waveform,
+                    source_tensor=amplify_audio(waveform),
                     mic_idx=MIC_IDX,
-                    source_name=numbered_name,
-                    timestamp_str=TIMESTAMP_STR,
+                    source_name=window_name(numbered_name, window_idx),
+                    timestamp_str=timestamp_str,
                     parts_to_save=None
                 )
+                windows += 1
+            return file_path, numbered_name, None, windows
+
+        waveform, sr = torchaudio.load(file_path)
+
+        # 모노 처리
+        if waveform.shape[0] > 1:
+            waveform = waveform.mean(dim=0, keepdim=True)
+
+        # 리샘플링
+        if sr != SAMPLE_RATE:
+            waveform = _get_resampler(sr)(waveform)
+
+        # 🔊 오디오 증폭 (-12dB ~ -6dB 범위로)
+        waveform = amplify_audio(waveform)
+
+        save_mel_tensor(
+            source_tensor=waveform,
+            mic_idx=MIC_IDX,
+            source_name=numbered_name,
+            timestamp_str=timestamp_str,
+            parts_to_save=None
+        )
+        return file_path, numbered_name, None, 1
+
+    except Exception as e:
+        return file_path, numbered_name, f"{type(e).__name__}: {e}", 0
+
+
+def _init_worker():
+    # 프로세스 N개가 각각 코어 수만큼 torch 스레드를 만들면 N² 스레드로 과다 사용(oversubscription)되므로 1개로 제한
+    torch.set_num_threads(1)
+
+
+def convert_all_audio_recursively(input_folder, num_workers=NUM_WORKERS, timestamp_str=None):
+    """
+    입력 폴더의 모든 오디오 파일을 병렬로 mel 텐서로 변환합니다.
+
+    변환 결과는 output/<timestamp>/manifest.json에 기록되며, 같은 timestamp로 다시 실행하면
+    크기/수정 시각이 같고 출력 파일이 있는 파일은 건너뜁니다.
+
+    :param input_folder: 입력 최상위 폴더
+    :param num_workers: 워커 프로세스 수 (1이면 현재 프로세스에서 순차 실행)
+    :param timestamp_str: 출력 폴더명 (None이면 RESUME_TIMESTAMP 또는 새 TIMESTAMP_STR)
+    :return: 요약 딕셔너리 {"converted", "skipped", "failed": [(경로, 오류)]}
+    """
+    timestamp_str = timestamp_str or RESUME_TIMESTAMP or TIMESTAMP_STR
+    output_dir = os.path.join(OUTPUT_FOLDER, timestamp_str)
+    mel_dir = os.path.join(output_dir, f"mic_{MIC_IDX + 1}")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    todo = []
+    skipped = 0
+    for file_path, numbered_name, size, mtime in plan_conversion(input_folder, manifest):
+        entry = manifest["files"].get(file_path)
+        first_output = window_name(numbered_name, 0) if STREAM_WINDOWS else numbered_name
+        if (entry is not None and entry["status"] == "done"
+                and entry["size"] == size and entry["mtime"] == mtime
+                and entry.get("stream", False) == STREAM_WINDOWS
+                and os.path.exists(os.path.join(mel_dir, f"{first_output}.pt"))):
+            skipped += 1
+            continue
+        manifest["files"][file_path] = {"size": size, "mtime": mtime, "name": numbered_name,
+                                        "stream": STREAM_WINDOWS, "windows": 0,
+                                        "status": "pending", "error": None}
+        todo.append((file_path, numbered_name))
+
+    save_manifest(manifest, manifest_path)
+    print(f"📋 변환 대상 {len(todo)}개, 건너뜀 {skipped}개 (워커 {num_workers}개, 출력: {output_dir})")
+
+    converted = 0
+    failed = []
+
+    def record(result):
+        nonlocal converted
+        file_path, numbered_name, error, windows = result
+        entry = manifest["files"][file_path]
+        entry["status"] = "failed" if error else "done"
+        entry["error"] = error
+        entry["windows"] = windows
+        if error:
+            failed.append((file_path, error))
+        else:
+            converted += 1
+        done = converted + len(failed)
+        if done % MANIFEST_SAVE_EVERY == 0:
+            save_manifest(manifest, manifest_path)
+            print(f"⏳ 진행: {done}/{len(todo)}")
+
+    try:
+        if num_workers <= 1:
+            for file_path, numbered_name in todo:
+                record(convert_file(file_path, numbered_name, timestamp_str))
+        else:
+            # 제출해 둔 작업 수를 제한해 대기 중인 future/인자가 파일 수만큼 쌓이지 않도록 함
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker) as executor:
+                pending = set()
+                for file_path, numbered_name in todo:
+                    if len(pending) >= num_workers * MAX_IN_FLIGHT_PER_WORKER:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            record(future.result())
+                    pending.add(executor.submit(convert_file, file_path, numbered_name, timestamp_str))
+                for future in wait(pending).done:
+                    record(future.result())
+    finally:
+        save_manifest(manifest, manifest_path)
 
-                print(f"✅ Processed: {file_path} → {numbered_name}")
+    print(f"\n📊 변환 요약: 완료 {converted}개, 건너뜀 {skipped}개, 실패 {len(failed)}개")
+    for file_path, error in failed:
+        print(f"❌ {file_path}: {error}")
 
-            except Exception as e:
-                print(f"❌ Failed to process {file_path}: {e}")
+    return {"converted": converted, "skipped": skipped, "failed": failed}
 
 if __name__ == "__main__":
     convert_all_audio_recursively(INPUT_FOLDER)
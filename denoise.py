@@ -1,6 +1,11 @@
+import os
+import time
+import logging
+import metrics
 import torch
-import noisereduce as nr
-from config import SAMPLE_RATE, NOISE_SAMPLE_PATH
+from config import SAMPLE_RATE, NOISE_SAMPLE_PATH, DENOISE_TOLERANCE_DB
+
+logger = logging.getLogger(__name__)
 
 def load_noise_clip():
     """
@@ -16,6 +21,198 @@ def denoise(audio_np, noise_clip=None):
     :param noise_clip: 배경 잡음 샘플 (numpy 배열), None이면 기본 잡음 제거
     :return: 잡음 제거된 오디오 데이터 (numpy 배열)
     """
+    import noisereduce as nr  # noisereduce 백엔드를 쓸 때만 import (시작 시간 단축)
+
     if noise_clip is None:
         return nr.reduce_noise(y=audio_np, sr=SAMPLE_RATE)
     return nr.reduce_noise(y=audio_np, y_noise=noise_clip, sr=SAMPLE_RATE)
+
+
+def noise_profile_path(noise_path=NOISE_SAMPLE_PATH):
+    """잡음 샘플 옆에 저장되는 잡음 통계 캐시 경로 (예: noise_sample.profile.pt)"""
+    return os.path.splitext(noise_path)[0] + ".profile.pt"
+
+
+class SpectralGate:
+    """
+    미리 계산한 잡음 통계로 모든 마이크 채널을 한 번의 torch STFT로 처리하는 spectral gating
+
+    noisereduce의 stationary 모드(SpectralGateStationary)와 같은 알고리즘:
+    주파수별 잡음 dB 평균 + n_std_thresh × 표준편차를 임계값으로 마스크를 만들고,
+    주파수/시간 방향으로 부드럽게 한 뒤 STFT에 곱한다.
+    """
+
+    def __init__(self, noise_thresh, sr=SAMPLE_RATE, n_fft=1024, hop_length=None,
+                 prop_decrease=1.0, freq_mask_smooth_hz=500, time_mask_smooth_ms=50):
+        """
+        :param noise_thresh: 주파수별 dB 임계값 (n_fft // 2 + 1,)
+        :param sr: 샘플링 주파수
+        :param n_fft: STFT 크기 (win_length와 동일)
+        :param hop_length: STFT hop (None이면 n_fft // 4)
+        :param prop_decrease: 잡음 감쇠 비율 (1.0이면 완전 제거)
+        :param freq_mask_smooth_hz: 마스크 주파수 방향 스무딩 폭 (Hz)
+        :param time_mask_smooth_ms: 마스크 시간 방향 스무딩 폭 (ms)
+        """
+        self.noise_thresh = noise_thresh.float()
+        self.n_fft = n_fft
+        self.hop_length = hop_length or n_fft // 4
+        self.prop_decrease = prop_decrease
+        self.window = torch.hann_window(n_fft)
+
+        n_grad_freq = int(freq_mask_smooth_hz / (sr / (n_fft / 2)))
+        n_grad_time = int(time_mask_smooth_ms / ((self.hop_length / sr) * 1000))
+        self.smoothing_filter = _smoothing_filter(n_grad_freq, n_grad_time)
+        self.last_elapsed = 0.0  # 마지막 호출의 처리 시간 (초)
+
+    @staticmethod
+    def _stft(x, n_fft, hop_length, window):
+        # librosa.stft 기본값과 동일하게 center=True, zero padding
+        return torch.stft(x, n_fft=n_fft, hop_length=hop_length, win_length=n_fft, window=window,
+                          center=True, pad_mode="constant", return_complex=True)
+
+    @staticmethod
+    def _amp_to_db(magnitude, top_db=80.0):
+        # librosa.amplitude_to_db(ref=1.0, amin=1e-20, top_db=80), 최대값 기준은 채널별
+        db = 20.0 * torch.log10(magnitude.clamp(min=1e-20))
+        peak = db.amax(dim=(-2, -1), keepdim=True)
+        return torch.maximum(db, peak - top_db)
+
+    @classmethod
+    def from_noise_clip(cls, noise_clip, n_std_thresh=1.5, n_fft=1024, hop_length=None, **kwargs):
+        """
+        잡음 샘플로부터 주파수별 임계값을 계산합니다.
+
+        :param noise_clip: 배경 잡음 샘플 (numpy 배열 또는 torch.Tensor, 1차원)
+        :param n_std_thresh: 임계값에 더할 표준편차 배수
+        """
+        noise = torch.as_tensor(noise_clip, dtype=torch.float32).reshape(-1)
+        hop_length = hop_length or n_fft // 4
+        spec = cls._stft(noise, n_fft, hop_length, torch.hann_window(n_fft))
+        noise_db = cls._amp_to_db(spec.abs())
+        noise_thresh = noise_db.mean(dim=-1) + noise_db.std(dim=-1, unbiased=False) * n_std_thresh
+        return cls(noise_thresh, n_fft=n_fft, hop_length=hop_length, **kwargs)
+
+    @classmethod
+    def load(cls, noise_path=NOISE_SAMPLE_PATH, use_cache=True, **kwargs):
+        """
+        잡음 통계를 캐시에서 읽거나, 없으면 계산해서 잡음 샘플 옆에 저장합니다.
+
+        캐시는 잡음 샘플 파일의 크기/수정 시각과 STFT 설정(n_fft, hop_length, sr, n_std_thresh)이 같을 때만 사용됩니다.
+
+        :param noise_path: 잡음 샘플 경로
+        :param use_cache: False면 항상 새로 계산
+        """
+        stat = os.stat(noise_path)
+        n_fft = kwargs.get("n_fft", 1024)
+        key = {"size": stat.st_size, "mtime": stat.st_mtime, "n_fft": n_fft,
+               "hop_length": kwargs.get("hop_length") or n_fft // 4, "sr": kwargs.get("sr", SAMPLE_RATE),
+               "n_std_thresh": kwargs.get("n_std_thresh", 1.5)}
+        cache_path = noise_profile_path(noise_path)
+
+        if use_cache and os.path.exists(cache_path):
+            try:
+                cached = torch.load(cache_path, weights_only=True)  # 텐서와 숫자만 저장하므로 weights_only
+            except Exception as e:
+                logger.warning("⚠️ 잡음 통계 캐시를 읽지 못해 다시 계산합니다: %s", e)
+                cached = {}
+            if cached.get("key") == key:
+                params = {k: v for k, v in kwargs.items() if k != "n_std_thresh"}
+                logger.info("📂 잡음 통계 캐시 사용: %s", cache_path)
+                return cls(cached["noise_thresh"], **params)
+
+        noise_clip = torch.load(noise_path, weights_only=True)
+        gate = cls.from_noise_clip(noise_clip, **kwargs)
+        if use_cache:
+            torch.save({"key": key, "noise_thresh": gate.noise_thresh}, cache_path)
+            logger.info("💾 잡음 통계 캐시 저장: %s", cache_path)
+        return gate
+
+    def __call__(self, audio):
+        """
+        모든 채널을 한 번에 잡음 제거합니다.
+
+        :param audio: (mics, samples) 또는 (samples,) torch.Tensor
+        :return: 같은 shape의 잡음 제거된 torch.Tensor
+        """
+        start = time.perf_counter()
+        squeeze = audio.dim() == 1
+        x = audio.unsqueeze(0) if squeeze else audio
+        length = x.shape[-1]
+
+        with torch.no_grad():
+            spec = self._stft(x, self.n_fft, self.hop_length, self.window)  # (mics, freq, frames)
+            spec_db = self._amp_to_db(spec.abs())
+
+            mask = (spec_db > self.noise_thresh[:, None]).float()
+            mask = mask * self.prop_decrease + (1.0 - self.prop_decrease)
+
+            kernel = self.smoothing_filter
+            mask = torch.nn.functional.conv2d(
+                mask.unsqueeze(1), kernel[None, None],
+                padding=(kernel.shape[0] // 2, kernel.shape[1] // 2)
+            ).squeeze(1)
+
+            out = torch.istft(spec * mask, n_fft=self.n_fft, hop_length=self.hop_length,
+                              win_length=self.n_fft, window=self.window, center=True, length=length)
+
+        self.last_elapsed = time.perf_counter() - start
+        metrics.observe("denoise_seconds", self.last_elapsed)
+        return out.squeeze(0) if squeeze else out
+
+
+def _smoothing_filter(n_grad_freq, n_grad_time):
+    # noisereduce와 동일한 삼각형 스무딩 필터 (합이 1)
+    def ramp(n):
+        up = torch.linspace(0, 1, n + 2)[:-1]      # linspace(0, 1, n + 1, endpoint=False)
+        down = torch.linspace(1, 0, n + 2)
+        return torch.cat([up, down])[1:-1]
+
+    kernel = torch.outer(ramp(n_grad_freq), ramp(n_grad_time))
+    return kernel / kernel.sum()
+
+
+def _snr_db(result, reference):
+    error = (result - reference).pow(2).sum()
+    return 10 * torch.log10(reference.pow(2).sum() / (error + 1e-12)).item()
+
+
+def compare_with_noisereduce(audio_np, noise_clip, gate=None, tolerance_db=DENOISE_TOLERANCE_DB):
+    """
+    SpectralGate 결과를 noisereduce와 비교합니다.
+
+    - 구현 검증: 같은 알고리즘인 stationary 모드(y_noise 사용)와 tolerance_db 이상 일치해야 통과
+    - 동작 변화: 기존 운영 경로인 denoise()의 호출(non-stationary 모드, y_noise 무시)과의 차이를 함께 출력
+      (알고리즘이 달라 일치하지 않으므로, 'torch' 백엔드로 바꾸기 전에 이 차이를 확인해야 함)
+
+    :param audio_np: 입력 오디오 (1차원 numpy 배열)
+    :param noise_clip: 배경 잡음 샘플 (numpy 배열)
+    :param gate: SpectralGate (None이면 noise_clip으로 생성)
+    :param tolerance_db: 통과 기준 - stationary 결과 대비 오차의 SNR (dB)
+    :return: (통과 여부, stationary 대비 SNR dB, 기존 호출 대비 SNR dB, 기존 호출 시간, SpectralGate 시간)
+    """
+    import noisereduce as nr
+
+    if gate is None:
+        gate = SpectralGate.from_noise_clip(noise_clip)
+
+    reference = nr.reduce_noise(y=audio_np, y_noise=noise_clip, sr=SAMPLE_RATE, stationary=True)
+    start = time.perf_counter()
+    baseline = denoise(audio_np, noise_clip)  # 운영 경로의 실제 호출
+    nr_time = time.perf_counter() - start
+
+    result = gate(torch.from_numpy(audio_np).float())
+    snr_db = _snr_db(result, torch.from_numpy(reference).float())
+    baseline_snr_db = _snr_db(result, torch.from_numpy(baseline).float())
+    passed = snr_db >= tolerance_db
+    print(f"{'✅' if passed else '❌'} SpectralGate vs noisereduce(stationary): SNR {snr_db:.1f} dB "
+          f"(기준 {tolerance_db:.1f} dB)")
+    print(f"⚠️ SpectralGate vs 기존 denoise()(non-stationary): SNR {baseline_snr_db:.1f} dB "
+          f"(동작 변화), 시간 {nr_time:.3f}초 → {gate.last_elapsed:.3f}초")
+    return passed, snr_db, baseline_snr_db, nr_time, gate.last_elapsed
+
+if __name__ == "__main__":
+    noise_clip = load_noise_clip()
+    gate = SpectralGate.load()
+    test_audio = noise_clip + 0.1 * torch.sin(
+        2 * torch.pi * 440 * torch.arange(len(noise_clip)) / SAMPLE_RATE).numpy()
+    compare_with_noisereduce(test_audio.astype("float32"), noise_clip, gate)
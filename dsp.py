@@ -0,0 +1,124 @@
+# === dsp.py ===
+import math
+import queue
+import logging
+import torch
+from config import LEVEL_TARGET_RMS_DB, DSP_BUFFER_POOL, DSP_ACQUIRE_TIMEOUT
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def level_adjust_(audio, target_rms_db=LEVEL_TARGET_RMS_DB, max_gain_db=20.0, compression_threshold=0.7,
+                  ratio=3.0, scratch=None):
+    """
+    main.adaptive_level_adjust와 같은 레벨 조정을 모든 마이크에 대해 한 번에, 제자리(in-place)에서 수행합니다.
+
+    마이크별로 작은 소리는 증폭(최대 max_gain_db, 피크 0.95 제한), 임계값을 넘는 큰 소리는
+    소프트 압축 후 목표 RMS로 정규화, 그 외에는 ±3dB 안에서만 조정한다.
+
+    :param audio: (mics, samples) float32 텐서 (제자리에서 수정됨)
+    :param target_rms_db: 목표 RMS 레벨 (dB)
+    :param max_gain_db: 최대 증폭 게인 (dB)
+    :param compression_threshold: 압축 시작 임계값 (0~1)
+    :param ratio: 압축 비율
+    :param scratch: audio와 같은 크기의 작업 버퍼 (None이면 새로 할당)
+    :return: audio
+    """
+    if scratch is None:
+        scratch = torch.empty_like(audio)
+    target = 10 ** (target_rms_db / 20.0)
+    norm = math.sqrt(audio.shape[-1])
+
+    rms = torch.linalg.vector_norm(audio, dim=-1) / norm           # (mics,)
+    peak = torch.abs(audio, out=scratch).amax(dim=-1)              # (mics,), scratch = |audio|
+    safe_rms = rms.clamp_min(1e-8)
+
+    quiet = rms < target
+    loud = ~quiet & (peak > compression_threshold)
+
+    # 🔊 작은 소리: 증폭 (최대 게인 제한 후, 피크가 0.95를 넘으면 0.95에 맞춤)
+    boost = torch.minimum((target / safe_rms).clamp_max(10 ** (max_gain_db / 20.0)), 0.95 / peak.clamp_min(1e-12))
+    # 📊 적절한 범위: ±3dB 안에서만 조정
+    gain = torch.where(quiet, boost, (target / safe_rms).clamp(10 ** (-3 / 20), 10 ** (3 / 20)))
+
+    if loud.any():
+        # 🔇 큰 소리: 임계값을 넘는 부분을 1/ratio로 압축 (부호 유지) 후 목표 RMS로
+        excess = scratch.sub_(compression_threshold).clamp_min_(0)
+        excess.mul_(loud.to(audio.dtype).unsqueeze(-1) * (1 - 1 / ratio))
+        audio.sub_(torch.copysign(excess, audio, out=excess))
+        compressed_rms = torch.linalg.vector_norm(audio, dim=-1) / norm
+        loud_gain = torch.where(compressed_rms > 1e-8, target / compressed_rms.clamp_min(1e-8), torch.ones_like(rms))
+        gain = torch.where(loud, loud_gain, gain)
+
+    gain = torch.where(rms < 1e-8, torch.ones_like(gain), gain)  # 무음에 가까우면 그대로
+    audio.mul_(gain.unsqueeze(-1))
+    return audio
+
+
+class DSPChain:
+    """
+    녹음 윈도우 → 잡음 제거 → 레벨 조정을 미리 할당한 float32 (mics, T) 버퍼 위에서 수행하는 전처리 체인
+
+    녹음 윈도우(numpy view)는 버퍼로 한 번만 복사되고, 이후 단계는 같은 버퍼를 제자리에서 수정한다.
+    파이프라인에는 여러 세그먼트가 동시에 떠 있으므로 버퍼를 pool_size개 만들어 두고,
+    분리가 끝나면 release()로 돌려준다 (빈 버퍼가 없으면 acquire()가 대기 → backpressure).
+    """
+
+    def __init__(self, mics, samples, gate=None, pool_size=DSP_BUFFER_POOL, target_rms_db=LEVEL_TARGET_RMS_DB,
+                 acquire_timeout=DSP_ACQUIRE_TIMEOUT):
+        """
+        :param mics: 최대 마이크 수
+        :param samples: 세그먼트 샘플 수
+        :param gate: SpectralGate (None이면 잡음 제거 생략)
+        :param pool_size: 버퍼 개수
+        :param target_rms_db: 레벨 조정 목표 RMS (dB)
+        :param acquire_timeout: 빈 버퍼를 기다리는 최대 시간 (초, None이면 무한 대기)
+        """
+        self.gate = gate
+        self.acquire_timeout = acquire_timeout
+        self.target_rms_db = target_rms_db
+        self.capacity = mics * samples
+        self._pool = queue.Queue()
+        self._scratch = {}  # 버퍼 주소 → (버퍼, 작업 버퍼)
+        for _ in range(pool_size):
+            buffer, scratch = torch.empty(self.capacity), torch.empty(self.capacity)
+            self._scratch[buffer.data_ptr()] = (buffer, scratch)
+            self._pool.put(buffer)
+
+    def acquire(self, audio_np):
+        """
+        [samples, channels] 녹음 윈도우를 빈 버퍼에 복사합니다.
+        acquire_timeout 안에 빈 버퍼가 생기지 않으면 RuntimeError를 발생시킵니다.
+
+        :return: (mics, samples) 텐서 (버퍼의 view)
+        """
+        samples, mics = audio_np.shape
+        if mics * samples > self.capacity:
+            raise ValueError(f"세그먼트({mics}×{samples})가 버퍼 크기({self.capacity})보다 큽니다")
+        try:
+            with metrics.timer("dsp_buffer_wait_seconds"):
+                buffer = self._pool.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise RuntimeError(f"{self.acquire_timeout}초 동안 반납된 전처리 버퍼가 없습니다 (버퍼 누수 의심)") from None
+        audio = buffer[:mics * samples].view(mics, samples)
+        audio.copy_(torch.from_numpy(audio_np).T)  # 전치 복사 한 번 (dtype 변환 포함)
+        return audio
+
+    def release(self, audio):
+        """acquire()로 받은 버퍼를 돌려줍니다."""
+        buffer, _ = self._scratch[audio.data_ptr()]
+        self._pool.put(buffer)
+
+    def denoise_(self, audio):
+        if self.gate is not None:
+            audio.copy_(self.gate(audio))
+        return audio
+
+    def level_(self, audio):
+        _, scratch = self._scratch[audio.data_ptr()]
+        return level_adjust_(audio, self.target_rms_db, scratch=scratch[:audio.numel()].view_as(audio))
+
+    def process(self, audio_np):
+        """acquire → 잡음 제거 → 레벨 조정을 한 번에 수행합니다 (사용 후 release 필요)."""
+        return self.level_(self.denoise_(self.acquire(audio_np)))
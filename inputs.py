@@ -0,0 +1,222 @@
+# === inputs.py ===
+import time
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+from config import (SAMPLE_RATE, SEGMENT_DURATION, SEGMENT_OVERLAP, INPUT_DEVICE, INPUT_SOURCE, INPUT_FILE_PATH,
+                    INPUT_SPEED, INPUT_LOOP, INPUT_SYNTHETIC_SEED)
+import metrics
+
+logger = logging.getLogger(__name__)
+
+INPUT_SOURCES = ("mic", "file", "synthetic")
+
+
+class ReplaySource:
+    """
+    실시간 녹음이 아닌 오디오를 ContinuousRecorder와 같은 인터페이스(start / close / read_segment / release_segment / channels)로
+    내보내는 입력 소스의 기본 클래스
+
+    speed배 속도로 세그먼트를 내보낸다: 세그먼트는 실제 녹음이었다면 마지막 샘플이 들어왔을 시점의
+    1/speed에 준비되며, speed가 0 또는 None이면 기다리지 않고 최대 속도로 내보낸다.
+    하위 클래스는 _read(start, frames)에서 [frames, channels] float32 배열 (끝이면 None)을 반환한다.
+    """
+
+    def __init__(self, channels, samplerate=SAMPLE_RATE, segment_duration=SEGMENT_DURATION,
+                 overlap=SEGMENT_OVERLAP, speed=INPUT_SPEED, start_time=None):
+        """
+        :param channels: 채널 수
+        :param samplerate: 샘플링 주파수
+        :param segment_duration: 세그먼트 길이 (초)
+        :param overlap: 연속된 세그먼트 간 겹치는 길이 (초)
+        :param speed: 재생 속도 (1.0 실시간, 10.0 10배속, 0 또는 None이면 최대 속도)
+        :param start_time: 입력 첫 샘플의 시각 (datetime, None이면 start() 시점) - 현장 녹음 재현 시 녹음 시각
+        """
+        self.channels = int(channels)
+        self.samplerate = samplerate
+        self.segment_frames = int(samplerate * segment_duration)
+        self.hop_frames = self.segment_frames - int(samplerate * overlap)
+        if self.hop_frames <= 0:
+            raise ValueError(f"overlap({overlap}초)은 segment_duration({segment_duration}초)보다 작아야 합니다")
+        self.speed = speed or None
+        self.start_time = start_time
+        self.last_segment_start = 0
+        self.segments = 0
+        self._started_at = None
+
+    def _read(self, start, frames):
+        raise NotImplementedError
+
+    def start(self):
+        self._started_at = time.monotonic()
+        if self.start_time is None:
+            self.start_time = datetime.now()
+        logger.info("▶️ %s 시작 (채널: %d, 속도: %s)", type(self).__name__, self.channels,
+                    f"{self.speed:g}배" if self.speed else "최대")
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def read_segment(self, timeout=None, hold=False):
+        """
+        다음 세그먼트를 재생 속도에 맞춰 반환합니다.
+
+        :param timeout: 최대 대기 시간 (초), None이면 준비될 때까지 대기
+        :param hold: ContinuousRecorder와 같은 인터페이스용 (세그먼트마다 새 배열이므로 무시)
+        :return: (samples, channels) numpy 배열, 시간 초과 또는 입력이 끝나면 None
+        """
+        start = self.segments * self.hop_frames
+        if self.speed is not None:
+            ready_at = self._started_at + (start + self.segment_frames) / self.samplerate / self.speed
+            delay = ready_at - time.monotonic()
+            if timeout is not None and delay > timeout:
+                time.sleep(max(timeout, 0))
+                return None
+            if delay > 0:
+                time.sleep(delay)
+
+        window = self._read(start, self.segment_frames)
+        if window is None:
+            logger.info("⏹️ 입력 끝: 세그먼트 %d개", self.segments)
+            return None
+        self.last_segment_start = start
+        self.segments += 1
+        metrics.inc("input_segments", source=type(self).__name__)
+        return window
+
+    def release_segment(self, start):
+        """세그먼트마다 새 배열을 반환하므로 반납할 것이 없습니다 (ContinuousRecorder와 같은 인터페이스)."""
+
+    def segment_time(self):
+        """마지막으로 반환한 세그먼트의 녹음 시각 (start_time + 녹음 위치)"""
+        return self.start_time + timedelta(seconds=self.last_segment_start / self.samplerate)
+
+    def stats(self):
+        """재생 통계 (실제 재생 배속 포함)"""
+        elapsed = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+        audio_seconds = self.segments * self.hop_frames / self.samplerate
+        return {
+            "segments": self.segments,
+            "audio_seconds": audio_seconds,
+            "elapsed_seconds": elapsed,
+            "realtime_factor": audio_seconds / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+class FileSource(ReplaySource):
+    """
+    다채널 WAV / FLAC 녹음 파일을 세그먼트 단위로 읽어 재생하는 입력 소스
+
+    파일 전체를 메모리에 올리지 않고 세그먼트마다 필요한 구간만 읽으며,
+    샘플레이트가 다르면 SAMPLE_RATE로 리샘플링한다.
+    """
+
+    def __init__(self, path=INPUT_FILE_PATH, loop=INPUT_LOOP, **kwargs):
+        """
+        :param path: 녹음 파일 경로
+        :param loop: True면 파일 끝에서 처음으로 돌아가 계속 재생
+        :param kwargs: ReplaySource 인자 (samplerate, segment_duration, overlap, speed, start_time)
+        """
+        import torchaudio
+
+        info = torchaudio.info(path)
+        super().__init__(info.num_channels, **kwargs)
+        self.path = path
+        self.loop = loop
+        self.file_samplerate = info.sample_rate
+        self.file_frames = info.num_frames
+        self._resampler = None
+        if self.file_samplerate != self.samplerate:
+            from resample import get_resampler
+
+            self._resampler = get_resampler(self.file_samplerate, self.samplerate, device="cpu")
+        self.duration = self.file_frames / self.file_samplerate
+        logger.info("📂 입력 파일: %s (%d채널, %dHz, %.1f초)", path, self.channels, self.file_samplerate, self.duration)
+
+    def _load(self, start, frames):
+        # 출력 샘플레이트 기준 구간 → 파일 샘플레이트 기준으로 읽고 리샘플링
+        import torchaudio
+
+        file_start = int(start * self.file_samplerate / self.samplerate)
+        file_frames = int(np.ceil(frames * self.file_samplerate / self.samplerate))
+        audio, _ = torchaudio.load(self.path, frame_offset=file_start, num_frames=file_frames)  # (channels, frames)
+        if self._resampler is not None:
+            audio = self._resampler(audio)
+        return audio[:, :frames].T.numpy()
+
+    def _read(self, start, frames):
+        total = int(self.file_frames * self.samplerate / self.file_samplerate)
+        if total < frames:
+            return None
+        if self.loop:
+            per_pass = (total - frames) // self.hop_frames + 1  # 한 바퀴에 들어가는 온전한 세그먼트 수
+            start = start // self.hop_frames % per_pass * self.hop_frames
+        elif start + frames > total:
+            return None  # 마지막 온전한 세그먼트까지만 (실시간 녹음과 같은 길이)
+        return np.ascontiguousarray(self._load(start, frames), dtype=np.float32)
+
+
+class SyntheticSource(ReplaySource):
+    """
+    benchmarks.synthetic의 합성 기계음을 세그먼트마다 생성하는 결정적 입력 소스
+
+    세그먼트 i는 seed + i로 생성하므로 같은 seed면 항상 같은 입력이 나온다.
+    """
+
+    def __init__(self, channels, seed=INPUT_SYNTHETIC_SEED, segments=None, **kwargs):
+        """
+        :param channels: 채널(마이크) 수
+        :param seed: 난수 시드
+        :param segments: 생성할 세그먼트 수 (None이면 무한)
+        :param kwargs: ReplaySource 인자 (samplerate, segment_duration, overlap, speed, start_time)
+        """
+        super().__init__(channels, **kwargs)
+        self.seed = seed
+        self.max_segments = segments
+
+    def _read(self, start, frames):
+        from benchmarks.synthetic import generate_machine_audio
+
+        if self.max_segments is not None and self.segments >= self.max_segments:
+            return None
+        return generate_machine_audio(mics=self.channels, seconds=frames / self.samplerate,
+                                      sr=self.samplerate, seed=self.seed + self.segments)
+
+
+def open_input(channels, kind=INPUT_SOURCE, device=INPUT_DEVICE, **kwargs):
+    """
+    설정에 맞는 입력 소스를 만듭니다 (시작 전, with 문으로 사용).
+
+    :param channels: 필요한 채널 수 (처리할 마이크 채널 번호의 최댓값 + 1)
+    :param kind: 'mic' (ContinuousRecorder), 'file' (FileSource) 또는 'synthetic' (SyntheticSource)
+    :param device: 'mic'일 때 입력 장치
+    :param kwargs: 각 입력 소스의 추가 인자
+    :return: 입력 소스
+    """
+    if kind == "mic":
+        from capture import ContinuousRecorder
+
+        return ContinuousRecorder(device=device, channels=channels, **kwargs)
+    if kind == "file":
+        source = FileSource(**kwargs)
+        if source.channels < channels:
+            raise ValueError(f"입력 파일 채널 수({source.channels})가 필요한 채널 수({channels})보다 적습니다")
+        return source
+    if kind == "synthetic":
+        return SyntheticSource(channels, **kwargs)
+    raise ValueError(f"알 수 없는 입력 소스: {kind} (가능: {INPUT_SOURCES})")
+
+
+if __name__ == "__main__":
+    # 합성 입력을 10배속으로 재생해 실제 재생 배속 확인 (파이프라인 처리량은 main.py에서 INPUT_SPEED = 0으로 측정)
+    with SyntheticSource(channels=2, segments=3, speed=10.0) as source:
+        while source.read_segment() is not None:
+            print(f"🎞️ 세그먼트 {source.segments}: {source.segment_time():%H:%M:%S}")
+    print(f"📊 {source.stats()}")
@@ -0,0 +1,139 @@
+# === kernel_cache.py ===
+import os
+import tempfile
+import threading
+import logging
+import torch
+from config import KERNEL_CACHE_PATH, FAST_START
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_cache = None  # 키 → 풀어낸 변환 (파라미터, 필터 커널 텐서, 하위 변환)
+_TRANSFORMS = ("Resample", "Spectrogram", "MelScale", "MelSpectrogram")  # 캐시에서 다시 만들 수 있는 torchaudio 변환
+_PLAIN = (bool, int, float, str, type(None))
+
+
+def _torchaudio_version():
+    import torchaudio
+
+    return torchaudio.__version__
+
+
+def _load(path):
+    global _cache
+    if _cache is None:
+        _cache = {}
+        if os.path.exists(path):
+            try:
+                # 텐서와 단순 값만 저장하므로 weights_only (파일이 바뀌어도 코드가 실행되지 않음)
+                _cache = torch.load(path, map_location="cpu", weights_only=True)
+            except Exception as e:
+                logger.warning("⚠️ 커널 캐시를 읽지 못해 다시 만듭니다: %s", e)
+            if not isinstance(_cache, dict):
+                logger.warning("⚠️ 커널 캐시 형식이 달라 다시 만듭니다: %s", path)
+                _cache = {}
+    return _cache
+
+
+def _save(path):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    # 여러 프로세스가 동시에 저장해도 임시 파일이 겹치지 않도록 고유한 이름 사용 (마지막 os.replace가 남음)
+    fd, tmp_path = tempfile.mkstemp(dir=folder or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        torch.save(_cache, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _pack(module):
+    """
+    변환 모듈을 파라미터(단순 값), 버퍼 텐서(필터 커널, 필터뱅크, 창 함수), 하위 변환으로 풀어냅니다.
+
+    :param module: torchaudio 변환 모듈 (_TRANSFORMS)
+    :return: weights_only로 읽을 수 있는 딕셔너리
+    """
+    kind = type(module).__name__
+    if kind not in _TRANSFORMS:
+        raise TypeError(f"캐시할 수 없는 변환: {kind}")
+    params = {}
+    for name, value in vars(module).items():
+        if name.startswith("_") or name == "training":
+            continue
+        if not isinstance(value, _PLAIN):
+            raise TypeError(f"캐시할 수 없는 파라미터: {kind}.{name}")
+        params[name] = value
+    return {
+        "type": kind,
+        "params": params,
+        "buffers": {name: tensor for name, tensor in module._buffers.items() if tensor is not None},
+        "children": {name: _pack(child) for name, child in module.named_children()},
+    }
+
+
+def _unpack(entry):
+    """
+    _pack으로 풀어낸 변환을 생성자(커널 계산) 없이 저장된 텐서와 파라미터로 다시 만듭니다.
+
+    :param entry: _pack이 반환한 딕셔너리
+    :return: torch.nn.Module
+    """
+    import torchaudio.transforms
+
+    if entry["type"] not in _TRANSFORMS:
+        raise TypeError(f"캐시할 수 없는 변환: {entry['type']}")
+    cls = getattr(torchaudio.transforms, entry["type"])
+    module = cls.__new__(cls)
+    torch.nn.Module.__init__(module)
+    module.__dict__.update(entry["params"])
+    for name, tensor in entry["buffers"].items():
+        module.register_buffer(name, tensor)
+    for name, child in entry["children"].items():
+        module.add_module(name, _unpack(child))
+    return module
+
+
+def cached_transform(key, factory, enabled=FAST_START, path=KERNEL_CACHE_PATH):
+    """
+    Resample / MelSpectrogram처럼 생성 시 필터 커널을 계산하는 torchaudio 변환을 캐시에서 가져옵니다.
+
+    캐시에는 모듈 대신 계산된 커널 / 필터뱅크 텐서와 파라미터만 저장하고 (weights_only로 읽음),
+    다음 시작부터는 생성자(커널 계산)를 거치지 않고 그 텐서로 모듈을 다시 만든다.
+    키에 torchaudio 버전을 붙여 버전이 바뀌면 다시 계산한다.
+
+    :param key: 변환 종류와 파라미터를 나타내는 문자열 (예: "resample:44100:16000")
+    :param factory: 캐시에 없을 때 모듈을 만드는 함수
+    :param enabled: False면 캐시 없이 factory()를 그대로 호출
+    :param path: 캐시 파일 경로
+    :return: torch.nn.Module
+    """
+    if not enabled:
+        return factory()
+
+    key = f"{key}|torchaudio={_torchaudio_version()}"
+    with _lock:
+        cache = _load(path)
+        entry = cache.get(key)
+        if entry is not None:
+            try:
+                return _unpack(entry)
+            except Exception as e:
+                logger.warning("⚠️ 커널 캐시 항목을 읽지 못해 다시 만듭니다: %s (%s)", key, e)
+
+        module = factory()
+        try:
+            cache[key] = _pack(module)
+        except TypeError as e:
+            logger.warning("⚠️ %s", e)
+            return module
+        try:
+            _save(path)
+            logger.debug("💾 커널 캐시 저장: %s", key)
+        except OSError as e:
+            logger.warning("⚠️ 커널 캐시 저장 실패: %s", e)
+    return module
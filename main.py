@@ -1,14 +1,33 @@
-from config import NOISE_SAMPLE_PATH, CHANNEL_PARTS
-from record import record_segment
-from denoise import load_noise_clip, denoise
-from model import load_model, separate
-from mel import save_mel_tensor
+import time
+STARTED_AT = time.monotonic()  # 프로세스 시작 시점 (첫 세그먼트까지 걸린 시간 측정 기준, import 전에 기록)
+
+from config import NOISE_SAMPLE_PATH, MICROPHONES, PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE, PIPELINE_DROP_POLICY, DENOISE_BACKEND, SAVE_TO_DISK, PUBLISH_SHM
+from config import SAMPLE_RATE, SEGMENT_DURATION, LEVEL_TARGET_RMS_DB, LOG_LEVEL, ACTIVITY_GATE, MEL_SIZE, USE_MODEL_SERVER
+from config import WARM_UP, INPUT_SOURCE, SEGMENT_OVERLAP, SHM_NAME, SHM_SOCKET_PATH
+from activity import ActivityGate, ACTIVE
+from inputs import open_input
+from denoise import load_noise_clip, denoise, SpectralGate
+from dsp import DSPChain, level_adjust_
+from model import load_model, separate_batch, to_audio_tensor
+from separator import get_separator
+from model_server import SeparationClient
+from mel import get_mel_extractor
+from writer import AsyncMelWriter, SEGMENT_FILE_NAME
+from mel_publisher import MelPublisher
+from pipeline import Pipeline, Stage
 from datetime import datetime
+from contextlib import ExitStack
+from functools import partial
 from resample import init_resampler
-import time
+import itertools
+import threading
+import logging
+import metrics
 import torch
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
 def adaptive_level_adjust(audio_np, target_rms_db=-12.0, max_gain_db=20.0, compression_threshold=0.7):
     """
     적응적 레벨 조정: 작은 소리는 증폭, 큰 소리는 압축
@@ -26,7 +45,7 @@ def adaptive_level_adjust(audio_np, target_rms_db=-12.0, max_gain_db=20.0, compr
     current_rms = np.sqrt(np.mean(audio_np ** 2))
     
     if current_rms < 1e-8:  # 무음에 가까운 경우
-        print(f"⚠️ Nearly silent audio (RMS: {current_rms:.8f}), skipping adjustment")
+        logger.debug("⚠️ Nearly silent audio (RMS: %.8f), skipping adjustment", current_rms)
         return audio_np
     
     # 목표 RMS 레벨
@@ -54,7 +73,7 @@ def adaptive_level_adjust(audio_np, target_rms_db=-12.0, max_gain_db=20.0, compr
         else:
             actual_gain = 20 * np.log10(gain_factor)
             
-        print(f"🔊 Amplified: {current_rms_db:.1f}dB → {target_rms_db:.1f}dB (+{actual_gain:.1f}dB)")
+        logger.debug("🔊 Amplified: %.1fdB → %.1fdB (+%.1fdB)", current_rms_db, target_rms_db, actual_gain)
         
     elif max_val > compression_threshold:
         # 🔇 큰 소리: 소프트 압축 (리미팅)
@@ -80,7 +99,7 @@ def adaptive_level_adjust(audio_np, target_rms_db=-12.0, max_gain_db=20.0, compr
             adjusted_audio = adjusted_audio * rms_adjust
         
         final_rms_db = 20 * np.log10(np.sqrt(np.mean(adjusted_audio ** 2)) + 1e-8)
-        print(f"🔇 Compressed & normalized: {current_rms_db:.1f}dB → {final_rms_db:.1f}dB")
+        logger.debug("🔇 Compressed & normalized: %.1fdB → %.1fdB", current_rms_db, final_rms_db)
         
     else:
         # 📊 적절한 범위: 약간의 조정만
@@ -90,72 +109,285 @@ def adaptive_level_adjust(audio_np, target_rms_db=-12.0, max_gain_db=20.0, compr
         
         adjusted_audio = audio_np * gain_factor
         final_rms_db = 20 * np.log10(np.sqrt(np.mean(adjusted_audio ** 2)) + 1e-8)
-        print(f"📊 Minor adjustment: {current_rms_db:.1f}dB → {final_rms_db:.1f}dB")
+        logger.debug("📊 Minor adjustment: %.1fdB → %.1fdB", current_rms_db, final_rms_db)
     
     return adjusted_audio
 
-def process_stream(model, source_names, repeat=5):
+def separation_fn(model):
+    """모델 또는 SeparationClient에 맞는 separate_batch(audio) 함수를 반환합니다."""
+    return model.separate_batch if isinstance(model, SeparationClient) else partial(separate_batch, model)
+
+
+def warm_up(model, source_names, mics=MICROPHONES):
+    """
+    녹음을 시작하기 전에 무음에 가까운 세그먼트 하나로 잡음 제거 → 레벨 조정 → 분리 → mel 경로를 실행합니다.
+
+    잡음 통계/커널 캐시 로드, torch 스레드 풀 생성, 연산 커널 선택 같은 첫 호출 비용을
+    첫 세그먼트가 아니라 시작 단계에서 치르도록 한다.
+
+    :param model: 분리 모델 또는 SeparationClient
+    :param source_names: 부품 이름 리스트
+    :param mics: 마이크 구성 리스트
+    :return: 걸린 시간 (초)
+    """
+    start = time.perf_counter()
+    audio = torch.randn(len(mics), int(SAMPLE_RATE * SEGMENT_DURATION)) * 1e-3
+    if DENOISE_BACKEND == "torch":
+        audio = SpectralGate.load()(audio)
+    else:
+        denoise(audio[0].numpy(), load_noise_clip())  # noisereduce import 및 첫 호출
+    level_adjust_(audio, LEVEL_TARGET_RMS_DB)
+    sources = separation_fn(model)(audio)
+    get_mel_extractor()(sources, source_names, [mic.get("parts") for mic in mics])
+
+    elapsed = time.perf_counter() - start
+    metrics.set_gauge("warm_up_seconds", elapsed)
+    logger.info("🔥 warm-up 완료 (%.2f초)", elapsed)
+    return elapsed
+
+
+def build_pipeline(model, source_names, noise_clip, writer=None, publisher=None, mics=MICROPHONES):
+    """
+    (활동 게이트 →) 잡음 제거 → 레벨 조정 → 분리 → mel 변환 → 저장 파이프라인을 구성합니다.
+
+    각 항목은 한 세그먼트(모든 마이크)를 담은 딕셔너리이며 단계를 지나며 키가 추가된다.
+    ACTIVITY_GATE가 켜져 있으면 배경 잡음 수준이거나 변화가 없는 마이크는 분리하지 않고
+    출력에 건너뛴 마이크로 표시한다.
+
+    :param model: 분리 모델 또는 SeparationClient (모델 서버 사용 시)
+    :param source_names: 부품 이름 리스트
+    :param noise_clip: 배경 잡음 샘플 (numpy 배열)
+    :param writer: 시작된 AsyncMelWriter (None이면 디스크에 저장하지 않음)
+    :param publisher: MelPublisher (None이면 공유 메모리로 전달하지 않음)
+    :param mics: 마이크 구성 리스트 (config.MICROPHONES 형식, 부품 목록을 마이크 id로 찾음)
+    :return: Pipeline (시작 전)
+    """
+    mic_parts = {mic["id"]: mic.get("parts") for mic in mics}
+    # 잡음 제거 백엔드와 상관없이 녹음 윈도우는 미리 할당된 (mics, samples) 버퍼로 한 번만 복사하고
+    # 레벨 조정까지 그 버퍼 안에서 수행 (torch 백엔드면 잡음 제거도 모든 마이크를 한 번의 STFT로)
+    gate = SpectralGate.load() if DENOISE_BACKEND == "torch" else None
+    chain = DSPChain(len(mics), int(SAMPLE_RATE * SEGMENT_DURATION), gate)
+    # 로컬 모델은 결과 버퍼를 재사용하는 Separator로 분리하고, mel 계산 후 버퍼를 반납
+    separator = None if isinstance(model, SeparationClient) else get_separator(model)
+    run_separation = separator.separate if separator is not None else model.separate_batch
+    activity_gate = ActivityGate(noise_clip) if ACTIVITY_GATE else None
+
+    def release_audio(item):
+        # 녹음 윈도우(링 버퍼 view)를 복사했거나 버렸으면 녹음기에 반납 (반납 전 덮어쓰면 overrun으로 집계됨)
+        release = item.pop("release_audio", None)
+        if release is not None:
+            release()
+
+    def activity_stage(item):
+        audio, mic_ids = item["audio"], item["mics"]
+        decisions = activity_gate(torch.from_numpy(audio).T)  # 복사 없이 (mics, samples) view
+        active = [column for column, decision in enumerate(decisions) if decision == ACTIVE]
+        item["skipped"] = {mic_ids[column]: decision for column, decision in enumerate(decisions) if decision != ACTIVE}
+
+        if not active:
+            # 모든 마이크가 건너뜀 → 빈 세그먼트로 표시하고, 저장/publish 순서가 유지되도록 뒤 단계는 그대로 통과
+            metrics.inc("segments_skipped")
+            logger.debug("⏭️ 세그먼트 %d 건너뜀 (%s)", item["index"] + 1, item["skipped"])
+            item.pop("audio")
+            release_audio(item)
+            item.update(mels=torch.empty(0, 1, *MEL_SIZE), mel_keys=[], t_separated=None, all_skipped=True)
+            return item
+
+        if item["skipped"]:
+            item["audio"] = audio[:, active]  # 복사
+            item["mics"] = [mic_ids[column] for column in active]
+            release_audio(item)
+        return item
+
+    def denoise_stage(item):
+        try:
+            clean = chain.acquire(item.pop("audio"))
+        finally:
+            release_audio(item)  # 버퍼로 복사했으므로 녹음 윈도우는 더 이상 필요 없음
+        try:
+            if gate is None:
+                # noisereduce는 마이크별 numpy 결과를 새로 만들므로 버퍼의 해당 행에 다시 써 넣음
+                for row in clean:
+                    row.copy_(torch.from_numpy(denoise(row.numpy(), noise_clip)))
+            item["clean"] = chain.denoise_(clean)
+        except Exception:
+            chain.release(clean)
+            raise
+        return item
+
+    def level_stage(item):
+        # 적응적 레벨 조정 (RMS를 LEVEL_TARGET_RMS_DB 목표로 - 기계음에 적합)
+        chain.level_(item["clean"])  # 모든 마이크를 한 번에, 버퍼 안에서
+        return item
+
+    def separate_stage(item):
+        clean = item.pop("clean")
+        try:
+            item["sources"] = run_separation(to_audio_tensor(clean))  # (mics, sources, channels, samples)
+        finally:
+            chain.release(clean)  # 분리가 끝나면 버퍼 반납
+        item["t_separated"] = time.time()
+        return item
+
+    mel_extractor = get_mel_extractor()
+    first_saved = threading.Event()
+
+    def mel_stage(item):
+        # 마이크별로 설정된 부품만 모든 마이크에 대해 한 번에 계산
+        mic_ids = item["mics"]  # 오디오 열 순서의 마이크 id
+        parts = [mic_parts.get(mic_id) for mic_id in mic_ids]
+        sources = item.pop("sources")
+        try:
+            mels, keys = mel_extractor(sources, source_names, parts)
+        finally:
+            if separator is not None:
+                separator.release(sources)  # mel 계산이 끝나면 분리 결과 버퍼 반납
+        keys = [(mic_ids[column], source_name) for column, source_name in keys]
+        item["mels"] = mels  # [N, 1, 240, 240]
+        item["mel_keys"] = keys  # [(mic_idx, source_name), ...]
+        return item
+
+    def save_stage(item):
+        mels, keys = item.pop("mels"), item.pop("mel_keys")
+        skipped = item.get("skipped")
+        if publisher is not None:
+            publisher.publish(item["timestamp"], mels, keys, t_separated=item["t_separated"], skipped=skipped)
+        if writer is not None:
+            # 디스크 쓰기는 백그라운드 writer가 담당 (큐가 가득 차면 여기서 대기)
+            writer.submit(item["timestamp"], mels, keys, skipped)
+        if not first_saved.is_set():
+            first_saved.set()
+            elapsed = time.monotonic() - STARTED_AT
+            metrics.set_gauge("time_to_first_segment_seconds", elapsed)
+            logger.info("🏁 첫 세그먼트 처리 완료: 프로세스 시작 후 %.2f초 (녹음 %d초 포함)", elapsed, SEGMENT_DURATION)
+        timings = item.get("timings", {})
+        metrics.inc("segments_processed")
+        metrics.observe("realtime_factor", sum(timings.values()) / SEGMENT_DURATION)
+        if logger.isEnabledFor(logging.DEBUG):
+            summary = ", ".join(f"{name} {elapsed:.2f}초" for name, elapsed in timings.items())
+            logger.debug("⏱️ 세그먼트 %d 처리 완료 (%s)", item["index"] + 1, summary)
+        return None
+
+    def release_buffers(item):
+        # 버려지거나 처리 중 실패한 항목이 들고 있던 녹음 윈도우/전처리/분리 결과 버퍼를 반납 (반납하지 않으면 pool이 고갈됨)
+        release_audio(item)
+        clean = item.pop("clean", None)
+        if clean is not None:
+            chain.release(clean)
+        sources = item.pop("sources", None)
+        if separator is not None and sources is not None:
+            separator.release(sources)
+
+    def unless_skipped(func):
+        # 모든 마이크를 건너뛴 세그먼트는 처리 없이 다음 단계로 전달 (save 워커만 저장/publish)
+        return lambda item: item if item.get("all_skipped") else func(item)
+
+    stage_funcs = [("activity", activity_stage)] if activity_gate is not None else []
+    stage_funcs += [
+        ("denoise", unless_skipped(denoise_stage)),
+        ("level", unless_skipped(level_stage)),
+        ("separate", unless_skipped(separate_stage)),
+        ("mel", unless_skipped(mel_stage)),
+        ("save", save_stage),
+    ]
+    return Pipeline([
+        Stage(name, func,
+              workers=PIPELINE_WORKERS.get(name, 1),
+              queue_size=PIPELINE_QUEUE_SIZE,
+              drop_policy=PIPELINE_DROP_POLICY,
+              on_drop=release_buffers)
+        for name, func in stage_funcs
+    ])
+
+
+def process_stream(model, source_names, repeat=5, recorder=None, mics=MICROPHONES, segment_name=SEGMENT_FILE_NAME,
+                   warm=WARM_UP, input_source=INPUT_SOURCE, shm_name=SHM_NAME, socket_path=SHM_SOCKET_PATH):
     """
     오디오 스트림을 처리하고 저장합니다.
     
     :param model: 분리 모델
     :param source_names: 부품 이름 리스트 (예: ['fan', 'pump', ...])
-    :param repeat: 반복 횟수
+    :param repeat: 반복 횟수 (None이면 입력이 끝날 때까지 계속 처리)
+    :param recorder: 시작된 입력 소스 - ContinuousRecorder 또는 inputs.ReplaySource
+                     (None이면 input_source 종류로 생성)
+    :param mics: 처리할 마이크 구성 리스트 (실시간 녹음이면 모두 같은 입력 장치여야 함)
+    :param segment_name: 세그먼트 통합 파일 이름 (여러 워커가 같은 출력 폴더에 쓸 때 구분용)
+    :param warm: True면 입력 소스를 새로 만들기 전에 warm-up 실행
+    :param input_source: 'mic', 'file' 또는 'synthetic' (inputs.open_input 참고)
+    :param shm_name: mel publisher 공유 메모리 이름 (여러 워커가 동시에 publish할 때 구분용)
+    :param socket_path: mel publisher 알림용 Unix 소켓 경로 (shm_name과 같은 이유로 워커마다 다름)
     """
+    channels = [mic["channel"] for mic in mics]
+
+    if recorder is None:
+        devices = {mic["device"] for mic in mics}
+        if input_source == "mic" and len(devices) > 1:
+            raise ValueError(f"한 프로세스는 하나의 입력 장치만 처리합니다 (장치: {devices}), supervisor.py를 사용하세요")
+        if warm:
+            warm_up(model, source_names, mics)  # 녹음 시작 전에 첫 호출 비용을 미리 치름
+        with open_input(max(channels) + 1, input_source, device=devices.pop()) as recorder:
+            return process_stream(model, source_names, repeat, recorder, mics, segment_name,
+                                  shm_name=shm_name, socket_path=socket_path)
+
     noise_clip = load_noise_clip()
+    mic_ids = [mic["id"] for mic in mics]
+    select_columns = channels != list(range(recorder.channels))
+    segment_time = getattr(recorder, "segment_time", None)  # 재생 입력은 녹음 위치 기준 시각 사용
+    segments = 0
+    started = time.monotonic()
 
-    for i in range(repeat):
-        print(f"\n📡 반복 {i+1}/{repeat}")
+    # 녹음 윈도우는 링 버퍼의 view이므로, 큐에 대기하는 동안 덮어써지지 않도록
+    # RING_BUFFER_SECONDS가 (PIPELINE_QUEUE_SIZE + 1) * SEGMENT_DURATION보다 충분히 커야 한다.
+    # 윈도우는 DSPChain 버퍼로 복사될 때 반납되며, 그 전에 덮어써지면 녹음기가 overrun으로 센다.
+    with ExitStack() as outputs:
+        writer = outputs.enter_context(AsyncMelWriter(segment_name=segment_name)) if SAVE_TO_DISK else None
+        publisher = outputs.enter_context(MelPublisher(shm_name, socket_path)) if PUBLISH_SHM else None
+        pipeline = outputs.enter_context(build_pipeline(model, source_names, noise_clip, writer, publisher, mics))
 
-        start_record = time.time()
-        audio = record_segment()
-        end_record = time.time()
-        print(f"🎙️ 녹음 완료: {(end_record - start_record):.2f}초")
-        print("audio.shape = ", audio.shape)
-        print(f"audio = {audio}, type : {type(audio)}")
+        for i in (range(repeat) if repeat is not None else itertools.count()):
+            logger.debug("📡 반복 %d/%s", i + 1, repeat)
 
-        timestamp_str = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            with metrics.timer("record_wait_seconds"):
+                audio = recorder.read_segment(hold=not select_columns)
+            if audio is None:
+                break  # 파일 / 합성 입력이 끝남
+            release = None
+            if select_columns:
+                audio = audio[:, channels]  # 이 프로세스가 맡은 채널만 (복사)
+            else:
+                release = partial(recorder.release_segment, recorder.last_segment_start)
+            logger.debug("🎙️ audio.shape = %s", audio.shape)
 
-        for mic_idx in range(audio.shape[1]):
-            print(f"\n🎧 마이크 {mic_idx + 1} 처리 중")
-            start_total = time.time()
+            # 재생 입력은 실시간보다 빠를 수 있으므로 벽시계 대신 녹음 위치로 폴더 이름을 정함 (초 단위 중복 방지)
+            timestamp = segment_time() if segment_time is not None else datetime.now()
+            timestamp_str = timestamp.strftime("%Y-%m-%d_%H-%M-%S")
+            item = {"index": i, "timestamp": timestamp_str, "audio": audio, "mics": mic_ids, "release_audio": release}
+            segments += 1
+            if not pipeline.submit(item):
+                logger.warning("⚠️ 세그먼트 %d 버려짐 (파이프라인 포화)", i + 1)
 
-            # 1. 잡음 제거
-            start_denoise = time.time()
-            clean = denoise(audio[:, mic_idx], noise_clip)
-            end_denoise = time.time()
-            print(f"🧹 잡음 제거 시간: {(end_denoise - start_denoise):.2f}초")
-            
-            # 1.5. 적응적 레벨 조정 (RMS를 -18dB 목표로 - 기계음에 적합)
-            # 조용한 환경의 미세한 기계음: -15dB
-            # 시끄러운 공장 환경: -21dB  
-            # 일반적인 산업 환경: -18dB (현재 설정)
-            start_adjust = time.time()
-            clean = adaptive_level_adjust(clean, target_rms_db=-18.0)
-            end_adjust = time.time()
-            print(f"⚖️ 레벨 조정 시간: {(end_adjust - start_adjust):.2f}초")
-
-            # 2. 분리
-            start_sep = time.time()
-            sources = separate(model, clean)
-            end_sep = time.time()
-            print(f"🎛️ 소리 분리 시간: {(end_sep - start_sep):.2f}초")
-
-            # 3. 저장
-            start_save = time.time()
-            parts_for_mic = CHANNEL_PARTS[mic_idx]
-            for src_idx, src in enumerate(sources):
-                src_name = source_names[src_idx]
-                mel_result = save_mel_tensor(src, mic_idx, src_name, timestamp_str, parts_for_mic)
-                print(f"📁 저장 완료: {src_name}")
-            end_save = time.time()
-            print(f"💾 저장 시간: {(end_save - start_save):.2f}초")
-
-            # 총 시간
-            end_total = time.time()
-            print(f"⏱️ 마이크 {mic_idx + 1} 전체 처리 시간: {(end_total - start_total):.2f}초")
+    # 파이프라인이 모두 비워진 뒤 기준 처리량 (재생 입력을 최대 속도로 돌리면 처리 한계)
+    elapsed = time.monotonic() - started
+    audio_seconds = segments * (SEGMENT_DURATION - SEGMENT_OVERLAP)
+    if elapsed > 0 and segments:
+        metrics.set_gauge("stream_realtime_factor", audio_seconds / elapsed)
+        logger.info("🚀 처리량: 세그먼트 %d개 (오디오 %.0f초) / %.1f초 → 실시간의 %.2f배",
+                    segments, audio_seconds, elapsed, audio_seconds / elapsed)
+    for name, stats in pipeline.stats().items():
+        logger.info("📊 %s: 처리 %d, 버림 %d, 실패 %d, 평균 %.2f초",
+                    name, stats['processed'], stats['dropped'], stats['errors'], stats['avg_time'])
 
 if __name__ == "__main__":
-    model, source_names = load_model()
-    init_resampler(model.samplerate)
-    process_stream(model, source_names, repeat=100)
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    metrics.METRICS.start_exporter()
+    metrics.set_gauge("startup_seconds", time.monotonic() - STARTED_AT, phase="imports")
+    if USE_MODEL_SERVER:
+        model = SeparationClient()  # model_server.py가 이미 모델을 로드해 두고 있음
+        source_names = model.sources
+    else:
+        model, source_names = load_model()
+        init_resampler(model.samplerate)
+    try:
+        process_stream(model, source_names, repeat=None if INPUT_SOURCE == "file" else 100)  # 파일은 끝까지
+    finally:
+        metrics.METRICS.stop_exporter()
@@ -1,8 +1,13 @@
 import os
+import logging
 import torch
-from torchaudio.transforms import MelSpectrogram, AmplitudeToDB, Resample
-from config import SAMPLE_RATE, MEL_SIZE, OUTPUT_FOLDER, MEL_SAMPLE_RATE
+from config import SAMPLE_RATE, MEL_SIZE, OUTPUT_FOLDER, MEL_SAMPLE_RATE, MEL_DIRECT, SOURCES
 from datetime import datetime
+from resample import get_resampler
+from kernel_cache import cached_transform
+import metrics
+
+logger = logging.getLogger(__name__)
 
 def save_mel_tensor(source_tensor, mic_idx, source_name, timestamp_str, parts_to_save=None):
     """
@@ -19,46 +24,159 @@ def save_mel_tensor(source_tensor, mic_idx, source_name, timestamp_str, parts_to
     if parts_to_save is not None and source_name not in parts_to_save:
         return
 
+    mel = compute_mel(source_tensor)
+    save_mel(mel, mic_idx, source_name, timestamp_str)
+    
+    return mel  # 반환값 추가 (디버깅 용도)
+
+
+class MelExtractor:
+    """
+    Resample / MelSpectrogram / AmplitudeToDB 모듈을 한 번만 만들어 두고
+    여러 소스(및 여러 마이크)의 mel을 한 번에 계산하는 추출기
+
+    direct=True이면 처음부터 MEL_SIZE 해상도(240 mel × 240 프레임)로 계산하여 interpolate를 생략한다.
+    mel 필터뱅크와 Resample 커널은 커널 캐시(kernel_cache.py)에서 읽는다.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, direct=MEL_DIRECT):
+        """
+        :param sample_rate: 입력 오디오 샘플링 주파수
+        :param direct: True면 목표 해상도로 직접 계산
+        """
+        from torchaudio.transforms import MelSpectrogram, AmplitudeToDB  # torchaudio는 처음 필요할 때 import
+
+        self.direct = direct
+        self.resampler = get_resampler(sample_rate, MEL_SAMPLE_RATE, device="cpu")  # 공유 Resample (같으면 None)
+
+        self.mel_transform = cached_transform(f"mel:{MEL_SAMPLE_RATE}:1024:512:128", lambda: MelSpectrogram(
+            sample_rate=MEL_SAMPLE_RATE,
+            n_fft=1024,
+            hop_length=512,
+            n_mels=128,
+            power=2.0
+        ))
+        self.db_transform = AmplitudeToDB(stype='power', top_db=80.0)
+        self._direct_transforms = {}  # 입력 길이별 직접 계산용 MelSpectrogram
+
+    def _direct_transform(self, length):
+        transform = self._direct_transforms.get(length)
+        if transform is None:
+            # center=True에서 프레임 수 = length // hop + 1 ≥ MEL_SIZE[1]
+            from torchaudio.transforms import MelSpectrogram
+
+            hop = max(1, length // (MEL_SIZE[1] - 1))
+            key = f"mel_direct:{MEL_SAMPLE_RATE}:4096:1024:{hop}:{MEL_SIZE[0]}"
+            transform = cached_transform(key, lambda: MelSpectrogram(
+                sample_rate=MEL_SAMPLE_RATE,
+                n_fft=4096,        # 240개 mel 필터가 비지 않도록 주파수 해상도 확보 (zero padding)
+                win_length=1024,
+                hop_length=hop,
+                n_mels=MEL_SIZE[0],
+                power=2.0
+            ))
+            self._direct_transforms[length] = transform
+        return transform
+
+    def __call__(self, audio, source_names=None, parts=None):
+        """
+        정규화된 [1, 240, 240] mel들을 한 번에 계산합니다.
+
+        :param audio: (sources, T), (mics, sources, T) 또는 (mics, sources, channels, T) 텐서
+                      (4차원이면 첫 번째 채널만 사용)
+        :param source_names: 부품 이름 리스트 (None이면 config.SOURCES)
+        :param parts: 저장할 부품 이름 리스트 ((sources, T) 입력일 때) 또는
+                      마이크별 리스트 (예: config.MICROPHONES의 parts), None이면 모두 계산
+        :return: (mels, keys) - mels는 [N, 1, 240, 240] 텐서, keys는 [(mic_idx, source_name), ...]
+        """
+        if source_names is None:
+            source_names = SOURCES
+        if audio.dim() == 4:
+            audio = audio[:, :, 0]  # 첫 번째 채널만
+        if audio.dim() == 2:
+            audio = audio.unsqueeze(0)
+            parts = [parts]
+
+        # 마이크별 부품 필터링을 계산 전에 적용
+        keys, mic_index, src_index = [], [], []
+        for mic_idx in range(audio.shape[0]):
+            parts_for_mic = parts[mic_idx] if parts is not None and mic_idx < len(parts) else None
+            for src_idx, src_name in enumerate(source_names):
+                if parts_for_mic is None or src_name in parts_for_mic:
+                    keys.append((mic_idx, src_name))
+                    mic_index.append(mic_idx)
+                    src_index.append(src_idx)
+
+        if not keys:
+            return torch.empty(0, 1, *MEL_SIZE), keys
+
+        with torch.no_grad(), metrics.timer("mel_seconds"):
+            x = audio[mic_index, src_index].float()      # [N, time]
+            if self.resampler is not None:
+                x = self.resampler(x)
+
+            transform = self._direct_transform(x.shape[-1]) if self.direct else self.mel_transform
+            mel = transform(x).unsqueeze(1)               # [N, 1, n_mels, time]
+            mel = self.db_transform(mel)                  # dB 변환 (top_db는 항목별로 적용)
+
+            if self.direct:
+                mel = torch.nn.functional.pad(mel, (0, max(0, MEL_SIZE[1] - mel.shape[-1])))
+                mel = mel[..., :MEL_SIZE[0], :MEL_SIZE[1]]
+
+            # 항목별 z-score 정규화
+            mean = mel.mean(dim=(-2, -1), keepdim=True)
+            std = mel.std(dim=(-2, -1), keepdim=True)
+            mel = (mel - mean) / (std + 1e-9)
+
+            if not self.direct:
+                mel = torch.nn.functional.interpolate(
+                    mel, size=MEL_SIZE, mode='bilinear', align_corners=False
+                )                                         # [N, 1, 240, 240]
+
+        return mel, keys
+
+
+_default_extractor = None
+
+
+def get_mel_extractor():
+    """프로세스 전체에서 공유하는 기본 MelExtractor를 반환합니다."""
+    global _default_extractor
+    if _default_extractor is None:
+        _default_extractor = MelExtractor()
+    return _default_extractor
+
+
+def compute_mel(source_tensor):
+    """
+    정규화된 MelSpectrogram을 계산합니다.
+
+    :param source_tensor: 입력 오디오 텐서 (shape: [1, time] 또는 [2, time])
+    :return: [1, 240, 240] mel 텐서
+    """
     # ✅ 멀티채널일 경우 첫 번째 채널만 선택
     if source_tensor.dim() == 2 and source_tensor.size(0) > 1:
         source_tensor = source_tensor[0:1]  # [1, time] - 더 효율적
+    if source_tensor.dim() == 1:
+        source_tensor = source_tensor.unsqueeze(0)
 
-    # 샘플링 주파수가 다르면 Resample
-    if SAMPLE_RATE != MEL_SAMPLE_RATE:
-        resampler = Resample(orig_freq=SAMPLE_RATE, new_freq=MEL_SAMPLE_RATE)
-        source_tensor = resampler(source_tensor)
-
-    # Mel 변환기
-    mel_transform = MelSpectrogram(
-        sample_rate=MEL_SAMPLE_RATE,
-        n_fft=1024,
-        hop_length=512,
-        n_mels=128,
-        power=2.0
-    )
-    db_transform = AmplitudeToDB(stype='power', top_db=80.0)
-
-    with torch.no_grad():
-        mel = mel_transform(source_tensor)           # [1, 128, time]
-        mel = db_transform(mel)                      # dB 변환
-        
-        # 한 번만 정규화 적용
-        mel = (mel - mel.mean()) / (mel.std() + 1e-9)  # z-score 정규화
-        
-        # 크기 조정
-        mel = torch.nn.functional.interpolate(
-            mel.unsqueeze(0), size=MEL_SIZE, mode='bilinear', align_corners=False
-        ).squeeze(0)                                 # [1, 240, 240]
-
-    # 패딩 및 크롭 (이미 정규화된 데이터에 대해)
-    mel = torch.nn.functional.pad(mel, (0, max(0, MEL_SIZE[1] - mel.shape[-1])))
-    mel = mel[:, :MEL_SIZE[0], :MEL_SIZE[1]]
-    
-    # 저장
+    mels, _ = get_mel_extractor()(source_tensor, source_names=["source"])
+    return mels[0]
+
+
+def save_mel(mel, mic_idx, source_name, timestamp_str):
+    """
+    계산된 mel 텐서를 output/<timestamp>/mic_N/<source>.pt로 저장합니다.
+
+    :param mel: [1, 240, 240] mel 텐서
+    :param mic_idx: 마이크 인덱스
+    :param source_name: 부품 이름
+    :param timestamp_str: 세그먼트 폴더명
+    :return: 저장 경로
+    """
     folder = os.path.join(OUTPUT_FOLDER, timestamp_str, f"mic_{mic_idx + 1}")
     os.makedirs(folder, exist_ok=True)
     path = os.path.join(folder, f"{source_name}.pt")
     torch.save(mel, path)
-    print(f"✅ 저장 완료: {path}")
-    
-    return mel  # 반환값 추가 (디버깅 용도)
+    logger.debug("✅ 저장 완료: %s", path)
+    return path
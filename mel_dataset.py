@@ -0,0 +1,266 @@
+import os
+import re
+import json
+import time
+import random
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+from config import MEL_SIZE, OUTPUT_FOLDER
+from writer import SEGMENT_FILE_NAME, load_segment
+
+# === 사용자 설정 ===
+PACK_ROOT = OUTPUT_FOLDER           # 묶을 output/ 트리
+SHARD_PATH = "shards/mels"          # shards/mels.bin + shards/mels.index.json 생성
+BENCHMARK_SAMPLES = 1000            # 랜덤 접근 벤치마크 샘플 수
+
+MEL_SHAPE = (1, *MEL_SIZE)
+MEL_DTYPE = np.float32
+
+
+def shard_files(path):
+    """shard 경로로부터 (데이터 파일, 인덱스 파일) 경로를 반환합니다."""
+    return path + ".bin", path + ".index.json"
+
+
+class MelShardWriter:
+    """
+    mel 텐서들을 하나의 연속된 float32 파일(N×1×240×240)과 JSON 인덱스로 묶어 저장합니다.
+
+    인덱스 항목: {"source": 부품 이름, "mic": 마이크 인덱스, "timestamp": 세그먼트 폴더명, "path": 원본 경로}
+    """
+
+    def __init__(self, path):
+        """
+        :param path: 확장자 없는 shard 경로 (예: 'shards/mels')
+        """
+        self.path = path
+        self.data_path, self.index_path = shard_files(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(self.data_path, "wb")
+        self.entries = []
+
+    def append(self, mel, source, mic, timestamp, path=None):
+        """
+        mel 하나를 추가합니다.
+
+        :param mel: [1, 240, 240] 텐서
+        :param source: 부품 이름
+        :param mic: 마이크 인덱스
+        :param timestamp: 세그먼트 폴더명
+        :param path: 원본 파일 경로 (선택)
+        """
+        array = mel.detach().cpu().to(torch.float32).contiguous().numpy()
+        if array.shape != MEL_SHAPE:
+            raise ValueError(f"mel shape이 {MEL_SHAPE}가 아닙니다: {array.shape}")
+        self._file.write(array.tobytes())
+        self.entries.append({"source": source, "mic": mic, "timestamp": timestamp, "path": path})
+
+    def close(self):
+        """데이터를 flush하고 인덱스를 원자적으로 기록합니다."""
+        if self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+        index = {"shape": list(MEL_SHAPE), "dtype": "float32",
+                 "count": len(self.entries), "entries": self.entries}
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class MelShardDataset(Dataset):
+    """
+    shard 파일을 memory-map하여 복사 없이 텐서 view를 반환하는 Dataset
+
+    __getitem__은 (mel [1, 240, 240] 텐서, 인덱스 항목 딕셔너리)를 반환합니다.
+    반환된 텐서는 memory-map의 view이므로 수정해도 파일에는 반영되지 않습니다 (copy-on-write).
+    """
+
+    def __init__(self, path):
+        """
+        :param path: 확장자 없는 shard 경로
+        """
+        self.path = path
+        self.data_path, self.index_path = shard_files(path)
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.shape = tuple(index["shape"])
+        self.entries = index["entries"]
+        self._tensor = None
+
+    def _ensure_open(self):
+        # DataLoader 워커에서는 각자 다시 map하도록 지연 생성
+        if self._tensor is None and not self.entries:
+            self._tensor = torch.empty((0, *self.shape), dtype=torch.float32)  # 빈 파일은 memory-map할 수 없음
+        elif self._tensor is None:
+            data = np.memmap(self.data_path, dtype=MEL_DTYPE, mode="c",
+                             shape=(len(self.entries), *self.shape))
+            self._tensor = torch.from_numpy(data)
+        return self._tensor
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_tensor"] = None
+        return state
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, idx):
+        return self._ensure_open()[idx], self.entries[idx]
+
+    def tensor(self):
+        """전체 shard를 [N, 1, 240, 240] 텐서 view로 반환합니다."""
+        return self._ensure_open()
+
+
+def _load_manifest_paths(timestamp_dir):
+    # convert_folder_to_mel의 manifest가 있으면 출력 이름 → 원본 오디오 경로
+    manifest_path = os.path.join(timestamp_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        files = json.load(f)["files"]
+    return {entry["name"]: path for path, entry in files.items()}
+
+
+def iter_output_tree(root=OUTPUT_FOLDER):
+    """
+    output/<timestamp>/mic_N/<source>.pt 구조의 파일을 정렬된 순서로 순회합니다.
+
+    세그먼트 통합 파일(output/<timestamp>/segment.pt)은 iter_output_mels에서 처리합니다.
+
+    :return: (pt 경로, source, mic 인덱스, timestamp, 원본 경로) generator
+    """
+    for timestamp in sorted(os.listdir(root)):
+        timestamp_dir = os.path.join(root, timestamp)
+        if not os.path.isdir(timestamp_dir):
+            continue
+        original_paths = _load_manifest_paths(timestamp_dir)
+
+        for mic_dir in sorted(os.listdir(timestamp_dir)):
+            if not mic_dir.startswith("mic_"):
+                continue
+            mic_idx = int(mic_dir[len("mic_"):]) - 1
+            folder = os.path.join(timestamp_dir, mic_dir)
+            for file_name in sorted(os.listdir(folder)):
+                if not file_name.endswith(".pt"):
+                    continue
+                source = file_name[:-len(".pt")]
+                pt_path = os.path.join(folder, file_name)
+                base_name = re.sub(r"_w\d{4}$", "", source)  # 스트리밍 변환 윈도우 접미사 제거
+                yield pt_path, source, mic_idx, timestamp, original_paths.get(base_name, pt_path)
+
+
+def iter_output_mels(root=OUTPUT_FOLDER):
+    """
+    output/ 트리의 모든 mel을 파일별 레이아웃과 세그먼트 통합 레이아웃 구분 없이 순회합니다.
+
+    :return: (mel 텐서, source, mic 인덱스, timestamp, 원본 경로) generator
+    """
+    for pt_path, source, mic_idx, timestamp, original_path in iter_output_tree(root):
+        yield torch.load(pt_path, weights_only=True), source, mic_idx, timestamp, original_path
+
+    for path, timestamp in iter_segment_files(root):
+        segment = load_segment(path)
+        for mel, mic_idx, source in zip(segment["mels"], segment["mics"], segment["sources"]):
+            yield mel, source, mic_idx, timestamp, path
+
+
+def iter_segment_files(root=OUTPUT_FOLDER):
+    """
+    output/<timestamp>/segment.pt (및 워커별 segment_<워커>.pt) 세그먼트 통합 파일을 정렬된 순서로 순회합니다.
+
+    :return: (세그먼트 파일 경로, timestamp) generator
+    """
+    segment_prefix, segment_ext = os.path.splitext(SEGMENT_FILE_NAME)
+    for timestamp in sorted(os.listdir(root)):
+        timestamp_dir = os.path.join(root, timestamp)
+        if not os.path.isdir(timestamp_dir):
+            continue
+        for file_name in sorted(os.listdir(timestamp_dir)):
+            if file_name.startswith(segment_prefix) and file_name.endswith(segment_ext):
+                yield os.path.join(timestamp_dir, file_name), timestamp
+
+
+def pack_output_tree(root=OUTPUT_FOLDER, shard_path=SHARD_PATH):
+    """
+    기존 output/ 트리의 mel들(.pt 파일별 및 segment.pt)을 하나의 shard로 묶습니다.
+
+    :param root: output 폴더
+    :param shard_path: 확장자 없는 shard 경로
+    :return: 묶은 mel 개수
+    """
+    count = 0
+    with MelShardWriter(shard_path) as writer:
+        for mel, source, mic_idx, timestamp, original_path in iter_output_mels(root):
+            writer.append(mel, source, mic_idx, timestamp, original_path)
+            count += 1
+            if count % 1000 == 0:
+                print(f"⏳ {count}개 묶음")
+    print(f"📦 shard 저장 완료: {writer.data_path} ({count}개)")
+    return count
+
+
+def _throughput(sample, read):
+    # sample의 각 항목을 read로 읽는 초당 처리량 (항목이 없으면 None)
+    if not sample:
+        return None
+    start = time.perf_counter()
+    for item in sample:
+        read(item)
+    return len(sample) / (time.perf_counter() - start)
+
+
+def benchmark_random_access(root=OUTPUT_FOLDER, shard_path=SHARD_PATH, samples=BENCHMARK_SAMPLES, seed=0):
+    """
+    파일별 레이아웃(mic_N/<source>.pt, 세그먼트 통합 segment.pt)과 shard memory-map의 랜덤 접근 처리량을 비교합니다.
+
+    파일이 하나도 없는 레이아웃이나 빈 shard는 측정하지 않고 None으로 표시한다.
+
+    :return: {"pt_per_sec": ..., "segment_per_sec": ..., "shard_per_sec": ...} (초당 mel 개수 또는 None)
+    """
+    rng = random.Random(seed)
+    pt_paths = [entry[0] for entry in iter_output_tree(root)]
+    segment_paths = [entry[0] for entry in iter_segment_files(root)]
+    dataset = MelShardDataset(shard_path)
+
+    def read_segment_mel(path):
+        mels = load_segment(path)["mels"]
+        if len(mels):  # 모든 마이크를 건너뛴 세그먼트는 mel이 없음
+            mels[rng.randrange(len(mels))].sum()
+
+    result = {
+        "pt_per_sec": _throughput([rng.choice(pt_paths) for _ in range(samples)] if pt_paths else [],
+                                  lambda path: torch.load(path, weights_only=True).sum()),
+        "segment_per_sec": _throughput([rng.choice(segment_paths) for _ in range(samples)] if segment_paths else [],
+                                       read_segment_mel),
+        "shard_per_sec": _throughput([rng.randrange(len(dataset)) for _ in range(samples)] if len(dataset) else [],
+                                     lambda idx: dataset[idx][0].sum()),  # 페이지를 실제로 읽도록 접근
+    }
+
+    shard_rate = result["shard_per_sec"]
+    for name, label in (("pt", ".pt 파일별"), ("segment", "segment.pt"), ("shard", "shard mmap")):
+        rate = result[f"{name}_per_sec"]
+        if rate is None:
+            print(f"⚠️ {label}: 측정할 mel 없음")
+        elif name != "shard" and shard_rate is not None:
+            print(f"📊 {label}: 랜덤 접근 {samples}회, {rate:.0f}개/초 (shard가 {shard_rate / rate:.1f}배)")
+        else:
+            print(f"📊 {label}: 랜덤 접근 {samples}회, {rate:.0f}개/초")
+    return result
+
+
+if __name__ == "__main__":
+    pack_output_tree(PACK_ROOT, SHARD_PATH)
+    benchmark_random_access(PACK_ROOT, SHARD_PATH)
@@ -0,0 +1,284 @@
+# === mel_publisher.py ===
+import os
+import json
+import socket
+import threading
+import time
+import logging
+import numpy as np
+import torch
+from multiprocessing import shared_memory
+from config import MEL_SIZE, SHM_NAME, SHM_SOCKET_PATH, SHM_SLOTS, SHM_MAX_MELS
+
+logger = logging.getLogger(__name__)
+
+MEL_SHAPE = (1, *MEL_SIZE)
+MEL_BYTES = int(np.prod(MEL_SHAPE)) * 4  # float32
+HEADER_BYTES = 8  # 슬롯 앞의 int64 시퀀스 번호 (기록 중이면 -1)
+
+
+def _slot_bytes(max_mels):
+    return HEADER_BYTES + max_mels * MEL_BYTES
+
+
+class MelPublisher:
+    """
+    세그먼트별 mel 블록(N × 1 × 240 × 240)을 공유 메모리 링 버퍼에 쓰고,
+    로컬 Unix 소켓으로 접속한 소비자(분류기)에게 헤더를 알리는 publisher
+
+    소켓으로는 JSON 한 줄씩 전송한다:
+      - 접속 직후: {"type": "hello", "shm": 이름, "slots": 슬롯 수, "slot_bytes": 슬롯 크기}
+      - 세그먼트마다: {"type": "segment", "seq", "slot", "count", "timestamp", "mics", "sources",
+                      "skipped", "t_separated", "t_published"}
+      (skipped: 활동 게이트가 건너뛴 마이크 {마이크 인덱스: 이유}, 모두 건너뛰면 count는 0)
+    """
+
+    def __init__(self, name=SHM_NAME, socket_path=SHM_SOCKET_PATH, slots=SHM_SLOTS, max_mels=SHM_MAX_MELS):
+        """
+        :param name: 공유 메모리 이름
+        :param socket_path: 알림용 Unix 소켓 경로
+        :param slots: 링 버퍼 슬롯 수 (소비자가 이 개수만큼 뒤처지면 덮어써짐)
+        :param max_mels: 한 세그먼트의 최대 mel 개수 (마이크 수 × 부품 수)
+        """
+        self.slots = slots
+        self.max_mels = max_mels
+        self.slot_bytes = _slot_bytes(max_mels)
+        self.socket_path = socket_path
+        self.seq = 0
+
+        self.shm = self._create_shm(name, slots * self.slot_bytes)
+        self.name = self.shm.name
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(socket_path)
+        self._server.listen()
+        self._clients = []
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._running = True
+        self._accept_thread = threading.Thread(target=self._accept_loop, name="mel-publisher", daemon=True)
+        self._accept_thread.start()
+        logger.info("📡 mel publisher 시작: shm=%s, socket=%s", self.name, socket_path)
+
+    @staticmethod
+    def _create_shm(name, size):
+        """
+        공유 메모리를 새로 만든다. 비정상 종료로 남은 같은 이름의 세그먼트가 있으면 지우고 다시 만든다
+        (소켓 경로를 지우고 다시 bind하는 것과 같은 처리)
+        :param name: 공유 메모리 이름
+        :param size: 크기 (바이트)
+        :return: SharedMemory
+        """
+        try:
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            logger.warning("⚠️ 남아 있던 공유 메모리 삭제 후 다시 생성: %s", name)
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                break
+            client.settimeout(0.5)
+            hello = {"type": "hello", "shm": self.name, "slots": self.slots, "slot_bytes": self.slot_bytes}
+            try:
+                client.sendall((json.dumps(hello) + "\n").encode())
+            except OSError:
+                client.close()
+                continue
+            with self._lock:
+                self._clients.append(client)
+
+    def _broadcast(self, header):
+        line = (json.dumps(header, ensure_ascii=False) + "\n").encode()
+        with self._lock:
+            alive = []
+            for client in self._clients:
+                try:
+                    client.sendall(line)
+                    alive.append(client)
+                except OSError:
+                    client.close()  # 느리거나 끊긴 소비자는 제외
+            self._clients = alive
+
+    def publish(self, timestamp_str, mels, keys, t_separated=None, skipped=None):
+        """
+        한 세그먼트의 mel 블록을 공유 메모리에 쓰고 소비자에게 알립니다.
+
+        :param timestamp_str: 세그먼트 폴더명
+        :param mels: [N, 1, 240, 240] 텐서
+        :param keys: [(mic_idx, source_name), ...]
+        :param t_separated: 분리 완료 시각 (time.time(), 지연 측정용)
+        :param skipped: 활동 게이트가 건너뛴 마이크 {mic_idx: 이유}
+        :return: 시퀀스 번호
+        """
+        count = mels.shape[0]
+        if count > self.max_mels:
+            raise ValueError(f"mel 개수({count})가 SHM_MAX_MELS({self.max_mels})보다 많습니다")
+
+        with self._publish_lock:  # 여러 스레드가 publish해도 시퀀스 번호와 슬롯이 겹치지 않도록
+            seq = self.seq
+            slot = seq % self.slots
+            offset = slot * self.slot_bytes
+            header = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf, offset=offset)
+            data = np.ndarray((count, *MEL_SHAPE), dtype=np.float32, buffer=self.shm.buf, offset=offset + HEADER_BYTES)
+
+            header[0] = -1  # 기록 중
+            data[...] = mels.detach().to(torch.float32).numpy()
+            header[0] = seq
+            self.seq += 1
+
+            self._broadcast({
+                "type": "segment",
+                "seq": seq,
+                "slot": slot,
+                "count": count,
+                "timestamp": timestamp_str,
+                "mics": [mic_idx for mic_idx, _ in keys],
+                "sources": [source_name for _, source_name in keys],
+                "skipped": {str(mic_idx): reason for mic_idx, reason in (skipped or {}).items()},
+                "t_separated": t_separated,
+                "t_published": time.time(),
+            })
+        return seq
+
+    def close(self):
+        self._running = False
+        self._server.close()
+        with self._lock:
+            for client in self._clients:
+                client.close()
+            self._clients = []
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class MelSubscriber:
+    """
+    MelPublisher에 접속해 세그먼트별 mel 블록을 받는 소비자용 클라이언트
+
+    사용 예:
+        with MelSubscriber() as sub:
+            while True:
+                mels, header = sub.receive()
+                # mels: [N, 1, 240, 240], header["mics"], header["sources"]
+    """
+
+    def __init__(self, socket_path=SHM_SOCKET_PATH):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(socket_path)
+        self._reader = self._sock.makefile("r", encoding="utf-8")
+        hello = json.loads(self._reader.readline())
+        self.slot_bytes = hello["slot_bytes"]
+        self.shm = shared_memory.SharedMemory(name=hello["shm"])
+        try:
+            # 소비자가 종료될 때 resource_tracker가 publisher의 공유 메모리를 지우지 않도록 등록 해제
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, "shared_memory")  # type: ignore[attr-defined]
+        except Exception:
+            pass
+        self.overwritten = 0  # 읽기 전에 publisher가 덮어쓴 세그먼트 수
+
+    def receive(self, copy=True):
+        """
+        다음 세그먼트를 기다렸다가 반환합니다.
+
+        :param copy: False면 공유 메모리 view를 그대로 반환 (다음 SHM_SLOTS개 세그먼트 안에 사용해야 함)
+        :return: (mels [N, 1, 240, 240] 텐서, 헤더 딕셔너리), 연결이 끊기면 None
+        """
+        while True:
+            line = self._reader.readline()
+            if not line:
+                return None
+            header = json.loads(line)
+            if header.get("type") != "segment":
+                continue
+
+            offset = header["slot"] * self.slot_bytes
+            seq_view = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf, offset=offset)
+            data = np.ndarray((header["count"], *MEL_SHAPE), dtype=np.float32,
+                              buffer=self.shm.buf, offset=offset + HEADER_BYTES)
+            if seq_view[0] != header["seq"]:
+                self.overwritten += 1
+                continue
+
+            mels = torch.from_numpy(data.copy() if copy else data)
+            if seq_view[0] != header["seq"]:  # 복사 도중 덮어써짐
+                self.overwritten += 1
+                continue
+
+            header["t_received"] = time.time()
+            return mels, header
+
+    def close(self):
+        self._reader.close()
+        self._sock.close()
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def measure_loopback_latency(count=100, mels_per_segment=5, interval=0.01):
+    """
+    같은 프로세스 안에서 publisher → subscriber 지연을 측정합니다.
+
+    :param count: 보낼 세그먼트 수
+    :param mels_per_segment: 세그먼트당 mel 개수
+    :param interval: 세그먼트 사이 간격 (초)
+    :return: 지연 시간 리스트 (초)
+    """
+    name = f"{SHM_NAME}_loopback_{os.getpid()}"
+    socket_path = f"{SHM_SOCKET_PATH}.loopback"
+    latencies = []
+
+    with MelPublisher(name=name, socket_path=socket_path) as publisher:
+        subscriber = MelSubscriber(socket_path)
+        time.sleep(0.1)  # accept 완료 대기
+
+        def consume():
+            for _ in range(count):
+                result = subscriber.receive()
+                if result is None:
+                    break
+                _, header = result
+                latencies.append(header["t_received"] - header["t_separated"])
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        keys = [(0, f"source_{i}") for i in range(mels_per_segment)]
+        for _ in range(count):
+            mels = torch.randn(mels_per_segment, *MEL_SHAPE)
+            publisher.publish("loopback", mels, keys, t_separated=time.time())
+            time.sleep(interval)
+        consumer.join()
+        subscriber.close()
+
+    ordered = sorted(latencies)
+    if ordered:
+        p50 = ordered[len(ordered) // 2]
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        print(f"📊 loopback 지연 ({len(ordered)}개): p50 {p50 * 1000:.2f}ms, p99 {p99 * 1000:.2f}ms")
+    return latencies
+
+
+if __name__ == "__main__":
+    measure_loopback_latency()
@@ -0,0 +1,273 @@
+# === metrics.py ===
+import os
+import sys
+import json
+import time
+import bisect
+import logging
+import threading
+from config import METRICS_ENABLED, METRICS_PATH, METRICS_FORMAT, METRICS_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# 1ms ~ 100s 로그 간격 버킷 (초)
+DEFAULT_BUCKETS = tuple(round(10 ** (e / 4), 6) for e in range(-12, 9))
+
+
+class Histogram:
+    """고정 버킷 히스토그램 (p50/p95/p99는 버킷 내 선형 보간으로 추정)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막은 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            if cumulative + c >= target and c > 0:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return lower + (upper - lower) * (target - cumulative) / c
+            cumulative += c
+        return self.max
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+
+_peak_rss_before_reset = 0  # reset_peak_rss로 초기화하기 전까지의 최대 RSS (바이트)
+
+
+def peak_rss_bytes():
+    """프로세스 최대 RSS (바이트), 지원하지 않는 플랫폼이면 0"""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak if sys.platform == "darwin" else peak * 1024  # Linux는 KB 단위
+    return max(peak, _peak_rss_before_reset)
+
+
+def rss_bytes(field="VmRSS"):
+    """
+    /proc/self/status의 메모리 값 (바이트), 지원하지 않는 플랫폼이면 0
+
+    :param field: 'VmRSS' (현재 RSS) 또는 'VmHWM' (마지막 reset_peak_rss 이후 최대 RSS)
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def reset_peak_rss():
+    """
+    최대 RSS(VmHWM)를 현재 RSS로 초기화합니다 (Linux, 호출 단위 최대 메모리 측정용).
+
+    초기화는 프로세스 전체에 적용되므로, 초기화 전 최댓값을 기억해 두어
+    peak_rss_bytes()는 계속 프로세스 전체 최댓값을 반환한다.
+
+    :return: 초기화했으면 True
+    """
+    global _peak_rss_before_reset
+    peak = peak_rss_bytes()
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    _peak_rss_before_reset = peak
+    return True
+
+
+class Metrics:
+    """
+    라이브 루프용 경량 지표 저장소 (카운터, 게이지, 히스토그램)
+
+    enabled=False이면 모든 기록 함수가 즉시 반환하고 timer()는 공유 no-op 컨텍스트를 돌려준다.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._gauge_callbacks = {}
+        self._histograms = {}
+        self._exporter = None
+        self._stop = threading.Event()
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def gauge_callback(self, name, fn, **labels):
+        """스냅샷 시점에 fn()을 호출해 게이지 값을 읽습니다 (예: 큐 길이)."""
+        with self._lock:
+            self._gauge_callbacks[_key(name, labels)] = fn
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def timer(self, name, **labels):
+        """with 블록 실행 시간을 히스토그램에 기록하는 컨텍스트"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def snapshot(self):
+        """현재 지표를 딕셔너리로 반환합니다."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            callbacks = dict(self._gauge_callbacks)
+            histograms = {key: (h.count, h.sum, h.max, h.percentile(0.5), h.percentile(0.95), h.percentile(0.99))
+                          for key, h in self._histograms.items()}
+        for key, fn in callbacks.items():
+            try:
+                gauges[key] = fn()
+            except Exception:
+                pass
+        gauges[("peak_rss_bytes", ())] = peak_rss_bytes()
+
+        def fmt(key):
+            name, labels = key
+            return {"name": name, "labels": dict(labels)}
+
+        return {
+            "time": time.time(),
+            "counters": [{**fmt(k), "value": v} for k, v in counters.items()],
+            "gauges": [{**fmt(k), "value": v} for k, v in gauges.items()],
+            "histograms": [{**fmt(k), "count": c, "sum": s, "max": m, "p50": p50, "p95": p95, "p99": p99}
+                           for k, (c, s, m, p50, p95, p99) in histograms.items()],
+        }
+
+    def to_prometheus(self, snapshot=None):
+        """Prometheus text exposition 형식 문자열 (히스토그램은 summary로 출력)"""
+        snapshot = snapshot or self.snapshot()
+
+        def labels_str(labels, extra=None):
+            items = {**labels, **(extra or {})}
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items.items()) + "}"
+
+        lines = []
+        for c in snapshot["counters"]:
+            lines.append(f"audix_{c['name']}_total{labels_str(c['labels'])} {c['value']}")
+        for g in snapshot["gauges"]:
+            lines.append(f"audix_{g['name']}{labels_str(g['labels'])} {g['value']}")
+        for h in snapshot["histograms"]:
+            for q in ("p50", "p95", "p99"):
+                quantile = {"p50": "0.5", "p95": "0.95", "p99": "0.99"}[q]
+                lines.append(f"audix_{h['name']}{labels_str(h['labels'], {'quantile': quantile})} {h[q]:.6f}")
+            lines.append(f"audix_{h['name']}_count{labels_str(h['labels'])} {h['count']}")
+            lines.append(f"audix_{h['name']}_sum{labels_str(h['labels'])} {h['sum']:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=METRICS_PATH, fmt=METRICS_FORMAT):
+        """지표를 파일로 원자적으로 저장합니다 ('prometheus' 또는 'json')."""
+        snapshot = self.snapshot()
+        text = json.dumps(snapshot, ensure_ascii=False, indent=2) if fmt == "json" else self.to_prometheus(snapshot)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def start_exporter(self, path=METRICS_PATH, interval=METRICS_INTERVAL, fmt=METRICS_FORMAT):
+        """interval초마다 지표 파일을 갱신하는 백그라운드 스레드를 시작합니다."""
+        if not self.enabled or self._exporter is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.write(path, fmt)
+                except OSError as e:
+                    logger.warning("⚠️ 지표 저장 실패: %s", e)
+
+        self._stop.clear()
+        self._exporter = threading.Thread(target=run, name="metrics-exporter", daemon=True)
+        self._exporter.start()
+        logger.info("📈 지표 저장 시작: %s (%d초마다, %s)", path, interval, fmt)
+
+    def stop_exporter(self, path=METRICS_PATH, fmt=METRICS_FORMAT):
+        """exporter를 멈추고 마지막 지표를 저장합니다."""
+        if self._exporter is None:
+            return
+        self._stop.set()
+        self._exporter.join()
+        self._exporter = None
+        self.write(path, fmt)
+
+
+METRICS = Metrics()
+
+# 모듈 수준 단축 함수
+inc = METRICS.inc
+set_gauge = METRICS.set_gauge
+observe = METRICS.observe
+timer = METRICS.timer
@@ -1,28 +1,339 @@
-from demucs.htdemucs import HTDemucs
+import os
+import time
+import tempfile
+import itertools
+import contextlib
+import logging
 import torch
-from demucs.apply import apply_model
-from config import MODEL_PATH, DEVICE, SOURCES, FORCE_STEREO_INPUT
-from resample import maybe_resample
+import numpy as np
+from config import (MODEL_PATH, DEVICE, SOURCES, FORCE_STEREO_INPUT, SEPARATION_MAX_BATCH, MONO_INFERENCE,
+                    INFERENCE_MODE, INTRA_OP_THREADS, INTER_OP_THREADS, FAST_START, MODEL_ARTIFACT_PATH)
+import metrics
 
-def load_model():
+logger = logging.getLogger(__name__)
+
+INFERENCE_MODES = ("fp32", "int8", "bf16", "compile")
+ARTIFACT_VERSION = 1  # 아티팩트 형식이 바뀌면 올려서 기존 파일을 다시 생성
+
+
+def load_model(mono=MONO_INFERENCE, mode=INFERENCE_MODE, intra_threads=INTRA_OP_THREADS,
+               inter_threads=INTER_OP_THREADS, checkpoint=MODEL_PATH,
+               artifact=MODEL_ARTIFACT_PATH if FAST_START else None):
     """
     모델을 로드하고 평가 모드로 설정합니다.
+    :param mono: True면 모노 입력 전용으로 변환 (fold_to_mono 참고)
+    :param mode: 추론 모드 (apply_inference_mode 참고)
+    :param intra_threads: 연산 내부 스레드 수 (None이면 PyTorch 기본값)
+    :param inter_threads: 연산 간 스레드 수 (None이면 PyTorch 기본값)
+    :param checkpoint: 체크포인트 경로
+    :param artifact: 가중치 아티팩트 경로 (None이면 체크포인트를 직접 로드, export_model_artifact 참고)
     :return: (model, sources) 튜플
     """
-    print(f"📦 모델 로드 중 (Device: {DEVICE})")
-    
-    model = HTDemucs(sources=SOURCES)
+    set_num_threads(intra_threads, inter_threads)
+    logger.info("📦 모델 로드 중 (Device: %s, 모드: %s)", DEVICE, mode)
+    start = time.perf_counter()
 
-    state_dict = torch.load(MODEL_PATH, map_location=DEVICE, weights_only=False)
-    model.load_state_dict(state_dict, strict=False)
+    model = None
+    if artifact is not None:
+        model = load_model_artifact(artifact, checkpoint)
+        if model is None:
+            try:
+                export_model_artifact(checkpoint, artifact)
+                model = load_model_artifact(artifact, checkpoint)
+            except (OSError, RuntimeError) as e:
+                logger.warning("⚠️ 가중치 아티팩트 생성 실패, 체크포인트를 직접 로드합니다: %s", e)
+    if model is None:
+        model = _load_checkpoint(checkpoint)
+
+    if mono:
+        fold_to_mono(model)
 
     model.to(DEVICE)
     model.eval()
+    apply_inference_mode(model, mode)
 
     sources = model.sources if hasattr(model, 'sources') else [f"source_{i}" for i in range(getattr(model, 'nb_sources', 2))]
+    metrics.set_gauge("model_load_seconds", time.perf_counter() - start)
+    logger.info("📦 모델 로드 완료 (%.2f초)", time.perf_counter() - start)
     return model, sources
 
 
+def _build_model(device=None):
+    from demucs.htdemucs import HTDemucs  # demucs는 모델이 필요할 때만 import (시작 시간 단축)
+
+    if device is None:
+        return HTDemucs(sources=SOURCES)
+    with torch.device(device):
+        return HTDemucs(sources=SOURCES)
+
+
+def _load_checkpoint(checkpoint):
+    model = _build_model()
+    state_dict = torch.load(checkpoint, map_location=DEVICE, weights_only=False)
+    result = model.load_state_dict(state_dict, strict=False)
+    if result.missing_keys or result.unexpected_keys:
+        logger.warning("⚠️ 체크포인트 키 불일치: 누락 %d개, 미사용 %d개",
+                       len(result.missing_keys), len(result.unexpected_keys))
+    return model
+
+
+def _checkpoint_fingerprint(checkpoint):
+    # 체크포인트 전체 해시는 시작할 때마다 계산하기엔 느리므로 크기와 수정 시각으로 변경 여부를 판단
+    stat = os.stat(checkpoint)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _validation_output(model):
+    # 고정된 입력에 대한 출력 앞부분 (아티팩트가 체크포인트와 같은 결과를 내는지 확인용)
+    generator = torch.Generator().manual_seed(0)
+    mix = torch.randn(1, 2, model.samplerate, generator=generator)
+    with torch.no_grad():
+        return model(mix)[..., :1024].clone()
+
+
+def export_model_artifact(checkpoint=MODEL_PATH, artifact=MODEL_ARTIFACT_PATH):
+    """
+    체크포인트에서 빠른 시작용 가중치 아티팩트를 만듭니다.
+
+    아티팩트는 weights_only로 읽을 수 있는 순수 state_dict(모든 키 포함)와 메타데이터로 구성되며,
+    임시 파일로 저장한 뒤 그 파일로 다시 만든 모델이 고정 입력에 대해 체크포인트 모델과 같은 출력을 낼 때만
+    아티팩트 경로로 옮긴다 (검증에 실패하면 예외).
+
+    :param checkpoint: 원본 체크포인트 경로
+    :param artifact: 저장할 아티팩트 경로
+    :return: 아티팩트 경로
+    """
+    logger.info("🛠️ 가중치 아티팩트 생성 중: %s → %s", checkpoint, artifact)
+    model = _load_checkpoint(checkpoint).eval()
+    reference = _validation_output(model)
+    payload = {
+        "state_dict": model.state_dict(),
+        "meta": {
+            "version": ARTIFACT_VERSION,
+            "sources": list(SOURCES),
+            "checkpoint": _checkpoint_fingerprint(checkpoint),
+            "torch_version": torch.__version__,
+        },
+        "reference": reference,
+    }
+
+    folder = os.path.dirname(artifact)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    # 여러 프로세스(supervisor 워커)가 동시에 만들어도 서로의 임시 파일을 덮어쓰지 않도록 고유한 이름 사용
+    fd, tmp_path = tempfile.mkstemp(dir=folder or ".", prefix=os.path.basename(artifact) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        torch.save(payload, tmp_path)
+
+        # 저장된 파일로 실제 로드 경로를 거쳐 검증한 뒤에만 아티팩트로 확정
+        restored = _from_artifact_payload(torch.load(tmp_path, map_location="cpu", mmap=True, weights_only=True))
+        if not torch.allclose(_validation_output(restored.eval()), reference, rtol=1e-5, atol=1e-6):
+            raise RuntimeError("아티팩트로 만든 모델의 출력이 체크포인트와 다릅니다")
+        os.replace(tmp_path, artifact)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    logger.info("✅ 가중치 아티팩트 검증 및 저장 완료: %s", artifact)
+    return artifact
+
+
+def _from_artifact_payload(payload):
+    # 가중치를 meta 장치에서 만든 모델에 그대로 연결 (랜덤 초기화와 복사 생략, mmap된 텐서를 그대로 사용)
+    try:
+        model = _build_model(device="meta")
+    except Exception:
+        model = _build_model()  # meta 장치에서 만들 수 없는 버전이면 일반 생성 후 연결
+    model.load_state_dict(payload["state_dict"], strict=True, assign=True)
+    if any(t.is_meta for t in itertools.chain(model.parameters(), model.buffers())):
+        # state_dict에 없는 (persistent=False) 버퍼가 있으면 일반 생성으로 다시 연결
+        model = _build_model()
+        model.load_state_dict(payload["state_dict"], strict=True, assign=True)
+    return model
+
+
+def load_model_artifact(artifact=MODEL_ARTIFACT_PATH, checkpoint=MODEL_PATH):
+    """
+    검증된 가중치 아티팩트를 memory-map으로 로드합니다.
+
+    가중치는 파일에서 필요한 페이지만 읽히므로 체크포인트를 unpickle해 복사하는 것보다 빠르다.
+    아티팩트가 없거나, 읽을 수 없거나, 형식/부품 구성이 다르거나, 체크포인트가 아티팩트 생성 후 바뀌었으면 None을 반환한다
+    (체크포인트 파일이 없으면 아티팩트만 배포된 것으로 보고 그대로 사용).
+
+    :return: 모델 (평가 모드 설정 전) 또는 None
+    """
+    if not os.path.exists(artifact):
+        logger.info("ℹ️ 가중치 아티팩트 없음: %s", artifact)
+        return None
+    try:
+        payload = torch.load(artifact, map_location="cpu", mmap=True, weights_only=True)
+        meta = payload["meta"]
+    except Exception as e:
+        # 쓰다 만 파일이나 손상된 파일이면 체크포인트로 다시 만들도록 None 반환
+        logger.warning("⚠️ 가중치 아티팩트를 읽지 못해 다시 만듭니다: %s", e)
+        return None
+    if meta.get("version") != ARTIFACT_VERSION or meta.get("sources") != list(SOURCES):
+        logger.info("ℹ️ 가중치 아티팩트 형식/구성이 다릅니다: %s", artifact)
+        return None
+    if os.path.exists(checkpoint) and meta["checkpoint"] != _checkpoint_fingerprint(checkpoint):
+        logger.info("ℹ️ 체크포인트가 변경되어 가중치 아티팩트를 다시 만듭니다: %s", checkpoint)
+        return None
+
+    model = _from_artifact_payload(payload)
+    logger.info("⚡ 가중치 아티팩트 로드 (mmap): %s", artifact)
+    return model
+
+
+def verify_model_artifact(artifact=MODEL_ARTIFACT_PATH):
+    """
+    아티팩트로 만든 모델이 생성 시 기록한 기준 출력을 그대로 내는지 확인합니다.
+
+    :return: 기준 출력과의 최대 절대 오차
+    """
+    payload = torch.load(artifact, map_location="cpu", mmap=True, weights_only=True)
+    model = _from_artifact_payload(payload).eval()
+    error = (_validation_output(model) - payload["reference"]).abs().max().item()
+    print(f"{'✅' if error <= 1e-6 else '❌'} 아티팩트 기준 출력 최대 오차: {error:.2e}")
+    return error
+
+
+def set_num_threads(intra_threads=None, inter_threads=None):
+    """
+    PyTorch CPU 스레드 수를 설정합니다.
+
+    inter-op 스레드 수는 프로세스에서 병렬 연산이 한 번이라도 실행된 뒤에는 바꿀 수 없으므로,
+    모델 로드 전에 호출해야 합니다.
+    """
+    if intra_threads:
+        torch.set_num_threads(intra_threads)
+    if inter_threads:
+        try:
+            torch.set_num_interop_threads(inter_threads)
+        except RuntimeError as e:
+            logger.warning("⚠️ inter-op 스레드 수를 바꿀 수 없습니다 (이미 병렬 연산이 실행됨): %s", e)
+    logger.info("🧵 스레드: intra-op %d, inter-op %d", torch.get_num_threads(), torch.get_num_interop_threads())
+
+
+def bf16_supported():
+    """CPU가 bf16 연산을 하드웨어로 지원하는지 확인합니다 (AVX512-BF16 또는 AMX)."""
+    checks = [getattr(torch.cpu, name, None) for name in ("_is_avx512_bf16_supported", "_is_amx_tile_supported")]
+    return any(check() for check in checks if check is not None)
+
+
+def apply_inference_mode(model, mode):
+    """
+    평가 모드로 설정된 모델에 CPU 추론 가속 모드를 적용합니다 (in-place).
+
+    - 'fp32': 변환 없음
+    - 'int8': Linear 레이어(트랜스포머 포함)를 동적 int8 양자화 (가중치 int8, 활성값은 실행 중 양자화)
+    - 'bf16': 추론 시 bf16 autocast 사용 (CPU가 지원하지 않으면 fp32로 대체)
+    - 'compile': torch.compile로 forward를 컴파일 (첫 호출에 컴파일 시간이 걸림)
+
+    :param model: 로드된 모델
+    :param mode: 추론 모드
+    :return: 변환된 모델
+    """
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"알 수 없는 추론 모드: {mode} (가능: {INFERENCE_MODES})")
+
+    model.inference_mode = mode
+    model.autocast_dtype = None
+
+    if mode == "int8":
+        if DEVICE.type != "cpu":
+            raise ValueError("int8 동적 양자화는 CPU에서만 지원됩니다")
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    elif mode == "bf16":
+        if DEVICE.type == "cpu" and not bf16_supported():
+            logger.warning("⚠️ 이 CPU는 bf16을 지원하지 않아 fp32로 추론합니다")
+            model.inference_mode = "fp32"
+        else:
+            model.autocast_dtype = torch.bfloat16
+    elif mode == "compile":
+        # apply_model이 모델 속성(samplerate, segment 등)을 사용하므로 모듈 대신 forward만 컴파일
+        model.forward = torch.compile(model.forward, dynamic=False)
+    return model
+
+
+def inference_context(model):
+    """모델의 추론 모드에 맞는 컨텍스트 (no_grad + 필요하면 autocast)"""
+    stack = contextlib.ExitStack()
+    stack.enter_context(torch.no_grad())
+    dtype = getattr(model, "autocast_dtype", None)
+    if dtype is not None:
+        stack.enter_context(torch.autocast(device_type=DEVICE.type, dtype=dtype))
+    return stack
+
+
+def fold_to_mono(model):
+    """
+    스테레오 HTDemucs를 모노 입력 전용으로 변환합니다.
+
+    두 채널에 같은 신호를 복제해 넣는 것과 같은 결과가 나오도록
+    시간 분기(tencoder)와 주파수 분기(encoder) 첫 레이어의 입력 채널 가중치를 합칩니다.
+    마지막 디코더 레이어에 정규화가 없으면 첫 번째 출력 채널만 계산하도록 가중치를 잘라내고,
+    정규화가 있으면 (채널 간 통계가 섞이므로) 전체를 계산한 뒤 첫 번째 채널만 반환합니다.
+
+    :param model: 로드된 HTDemucs 모델 (in-place 변환)
+    :return: 변환된 모델
+    """
+    channels = model.audio_channels
+    n_sources = len(model.sources)
+
+    # 1. 입력: 채널별 가중치 블록을 합침 (주파수 분기는 채널마다 실수/허수 2개)
+    first_layers = [model.encoder[0]]
+    if len(model.tencoder) > 0:
+        first_layers.append(model.tencoder[0])
+    for layer in first_layers:
+        if not hasattr(layer, "conv"):
+            raise ValueError(f"모노 변환을 지원하지 않는 첫 레이어 구조입니다: {type(layer).__name__}")
+        _fold_input_channels(layer.conv, channels)
+
+    # 2. 출력: 가능하면 첫 번째 채널만 계산
+    last_layers = [model.decoder[-1]]
+    if len(model.tdecoder) > 0:
+        last_layers.append(model.tdecoder[-1])
+    needs_hook = False
+    for layer in last_layers:
+        if isinstance(layer.norm2, torch.nn.Identity):
+            _trim_output_channels(layer.conv_tr, n_sources, channels)
+        else:
+            needs_hook = True
+    if needs_hook:
+        model.register_forward_hook(_first_channel_hook)
+
+    model.audio_channels = 1
+    model.mono_inference = True
+    logger.info("🔀 모노 추론 모드 적용 (출력 채널 가중치 축소: %s)", "일부" if needs_hook else "전체")
+    return model
+
+
+def _fold_input_channels(conv, channels):
+    # weight: (out, in, *kernel), in = channels * (채널당 입력 수)
+    weight = conv.weight.data
+    per_channel = weight.shape[1] // channels
+    folded = weight.view(weight.shape[0], channels, per_channel, *weight.shape[2:]).sum(dim=1)
+    conv.weight = torch.nn.Parameter(folded.contiguous())
+    conv.in_channels = per_channel
+
+
+def _trim_output_channels(conv_tr, n_sources, channels):
+    # ConvTranspose weight: (in, out, *kernel), out = sources * channels * (채널당 출력 수)
+    weight = conv_tr.weight.data
+    per_channel = weight.shape[1] // (n_sources * channels)
+    trimmed = weight.view(weight.shape[0], n_sources, channels, per_channel, *weight.shape[2:])[:, :, :1]
+    conv_tr.weight = torch.nn.Parameter(trimmed.reshape(weight.shape[0], -1, *weight.shape[2:]).contiguous())
+    if conv_tr.bias is not None:
+        bias = conv_tr.bias.data.view(n_sources, channels, per_channel)[:, :1]
+        conv_tr.bias = torch.nn.Parameter(bias.reshape(-1).contiguous())
+    conv_tr.out_channels = n_sources * per_channel
+
+
+def _first_channel_hook(module, inputs, output):
+    # (batch, sources, channels, samples) → 첫 번째 채널만
+    return output[:, :, :1]
+
+
 def separate(model, audio_np):
     """
     오디오 데이터를 모델에 입력하여 소스 분리를 수행합니다.
@@ -30,17 +341,56 @@ def separate(model, audio_np):
     :param audio_np: 입력 오디오 데이터 (numpy 배열)
     :return: 분리된 소스들 (torch.Tensor)
     """
-    # numpy to tensor 및 차원 조정
-    audio = torch.from_numpy(audio_np).float().unsqueeze(0)  # (samples,) → (1, samples)
+    return separate_batch(model, [audio_np])[0]
 
-    if FORCE_STEREO_INPUT:  # 모델이 2채널을 요구하는 경우 복제
-        audio = audio.repeat(2, 1)  # (1, samples) → (2, samples)
 
-    # (channels, samples) → (batch=1, channels, samples)
-    audio = audio.unsqueeze(0).to(DEVICE)
+def to_model_input(model, audio):
+    """
+    마이크별 모노 오디오를 모델 입력 채널 수에 맞춥니다.
 
-    audio = maybe_resample(audio)
+    :param model: 로드된 모델
+    :param audio: (mics, samples) torch.Tensor
+    :return: (mics, 1 또는 2, samples) torch.Tensor (스테레오 복제는 expand view)
+    """
+    audio = audio.unsqueeze(1)  # (mics, samples) → (mics, 1, samples)
 
-    with torch.no_grad():
-        sources = apply_model(model, audio, split=True, shifts=1, progress=False)[0]
-    return sources.cpu()
\ No newline at end of file
+    if FORCE_STEREO_INPUT and not getattr(model, "mono_inference", False):  # 모델이 2채널을 요구하는 경우 복제
+        audio = audio.expand(-1, 2, -1)  # (mics, 1, samples) → (mics, 2, samples)
+    return audio
+
+
+def separate_batch(model, audio_np, max_batch=SEPARATION_MAX_BATCH):
+    """
+    여러 마이크의 오디오를 하나의 배치로 묶어 소스 분리를 수행합니다.
+
+    모든 마이크의 구간을 max_batch개씩 묶어 모델에 넣으며, 구간 길이 / 겹침 / shifts / 메모리 예산은
+    config.SEPARATION_* 설정을 따릅니다 (separator.Separator 참고).
+
+    :param model: 로드된 모델
+    :param audio_np: [samples, channels] numpy 배열, 마이크별 1차원 배열 리스트 또는 (mics, samples) 텐서
+    :param max_batch: 한 번에 모델에 넣을 최대 구간 수
+    :return: 분리된 소스들 (torch.Tensor, shape: [mics, sources, channels, samples])
+    """
+    from separator import get_separator
+
+    return get_separator(model)(to_audio_tensor(audio_np), max_batch=max_batch)
+
+
+def to_audio_tensor(audio_np):
+    """
+    분리 입력을 (mics, samples) float32 텐서로 맞춥니다.
+
+    :param audio_np: [samples, channels] numpy 배열, 마이크별 1차원 배열 리스트 또는 (mics, samples) 텐서
+    :return: (mics, samples) torch.Tensor (텐서 입력은 그대로 반환)
+    """
+    if isinstance(audio_np, (list, tuple)):
+        return torch.stack([torch.as_tensor(a, dtype=torch.float32) for a in audio_np])  # (mics, samples)
+    if isinstance(audio_np, torch.Tensor):
+        return audio_np  # 이미 (mics, samples) 텐서 (dsp.DSPChain 버퍼)
+    return torch.from_numpy(np.ascontiguousarray(audio_np.T)).float()  # [samples, channels] → (mics, samples)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    export_model_artifact()
+    verify_model_artifact()
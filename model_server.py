@@ -0,0 +1,310 @@
+# === model_server.py ===
+import os
+import json
+import queue
+import socket
+import threading
+import time
+import logging
+import numpy as np
+import torch
+from config import (SAMPLE_RATE, SEGMENT_DURATION, LOG_LEVEL, MODEL_SERVER_SOCKET,
+                    MODEL_SERVER_MAX_BATCH, MODEL_SERVER_MAX_WAIT)
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # 배치 스레드 종료 신호
+
+# 프로토콜: JSON 한 줄 헤더 + float32 바이트
+#   서버 → 클라이언트 (접속 직후): {"type": "hello", "sources": [...], "samplerate": 모델 샘플레이트}
+#   클라이언트 → 서버: {"type": "separate", "id": n, "mics": M, "samples": T} + (M, T) float32
+#   서버 → 클라이언트: {"type": "result", "id": n, "shape": [M, S, C, T']} + float32
+#                      또는 {"type": "error", "id": n, "error": 메시지}
+
+
+def _send(sock, header, payload=None):
+    data = (json.dumps(header) + "\n").encode()
+    if payload is not None:
+        data += payload
+    sock.sendall(data)
+
+
+def _recv(reader):
+    # 헤더 한 줄과 뒤따르는 float32 배열을 읽음 (연결이 끊기면 None)
+    line = reader.readline()
+    if not line:
+        return None
+    header = json.loads(line)
+    if header["type"] == "separate":
+        shape = (header["mics"], header["samples"])
+    elif header["type"] == "result":
+        shape = tuple(header["shape"])
+    else:
+        return header, None
+
+    buffer = bytearray(int(np.prod(shape)) * 4)
+    if reader.readinto(buffer) != len(buffer):
+        return None
+    return header, np.frombuffer(buffer, dtype=np.float32).reshape(shape)
+
+
+class _Request:
+    def __init__(self, conn, lock, request_id, audio):
+        self.conn = conn
+        self.lock = lock
+        self.id = request_id
+        self.audio = audio  # (mics, samples)
+        self.t_received = time.perf_counter()
+
+    def reply(self, header, payload=None):
+        header["id"] = self.id
+        try:
+            with self.lock:
+                _send(self.conn, header, payload)
+        except OSError:
+            pass  # 클라이언트가 이미 종료됨
+
+
+class ModelServer:
+    """
+    모델을 메모리에 올려 두고 Unix 소켓으로 분리 요청을 받는 로컬 서비스
+
+    동시에 들어온 요청들은 마이크 수 합이 max_batch에 이르거나 첫 요청 후 max_wait초가 지날 때까지 모은 뒤,
+    길이가 같은 것끼리 묶어 separate_batch 한 번으로 처리한다.
+    """
+
+    def __init__(self, model, socket_path=MODEL_SERVER_SOCKET, max_batch=MODEL_SERVER_MAX_BATCH,
+                 max_wait=MODEL_SERVER_MAX_WAIT):
+        """
+        :param model: 로드된 모델
+        :param socket_path: Unix 소켓 경로
+        :param max_batch: 한 번에 모델에 넣을 최대 마이크 수
+        :param max_wait: 첫 요청 이후 다른 요청을 기다리는 최대 시간 (초)
+        """
+        self.model = model
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._requests = queue.Queue()
+        self._running = False
+        self._server = None
+        self._threads = []
+
+        # 통계
+        self.batches = 0
+        self.requests = 0
+
+    def warm_up(self, seconds=SEGMENT_DURATION):
+        """첫 요청이 느려지지 않도록 한 세그먼트 길이로 미리 한 번 분리합니다."""
+        from model import separate_batch
+
+        start = time.perf_counter()
+        separate_batch(self.model, [np.zeros(int(SAMPLE_RATE * seconds), dtype=np.float32)])
+        logger.info("🔥 warm-up 완료 (%.2f초)", time.perf_counter() - start)
+
+    def start(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        self._server.listen()
+        self._running = True
+        for target, name in ((self._accept_loop, "model-server-accept"), (self._batch_loop, "model-server-batch")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("🧠 모델 서버 시작: %s (배치 최대 %d, 대기 최대 %.0fms)",
+                    self.socket_path, self.max_batch, self.max_wait * 1000)
+        return self
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._client_loop, args=(conn,), name="model-server-client", daemon=True).start()
+
+    def _client_loop(self, conn):
+        lock = threading.Lock()
+        hello = {"type": "hello", "sources": list(self.model.sources), "samplerate": self.model.samplerate}
+        with conn, conn.makefile("rb") as reader:
+            try:
+                with lock:
+                    _send(conn, hello)
+                while self._running:
+                    message = _recv(reader)
+                    if message is None:
+                        break
+                    header, audio = message
+                    if header["type"] == "separate":
+                        self._requests.put(_Request(conn, lock, header["id"], audio))
+            except (OSError, ValueError) as e:
+                logger.warning("⚠️ 클라이언트 연결 오류: %s", e)
+
+    def _collect(self):
+        # 첫 요청을 기다린 뒤, 배치가 차거나 마감 시간이 될 때까지 추가 요청을 모음
+        first = self._requests.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        mics = first.audio.shape[0]
+        deadline = time.monotonic() + self.max_wait
+        while mics < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is _STOP:
+                self._requests.put(_STOP)  # 현재 배치를 처리한 뒤 종료
+                break
+            batch.append(request)
+            mics += request.audio.shape[0]
+        return batch
+
+    def _batch_loop(self):
+        from separator import get_separator
+
+        separator = get_separator(self.model)
+
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+
+            # 길이가 같은 요청끼리 묶어 처리
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.audio.shape[1], []).append(request)
+
+            for group in groups.values():
+                audio = torch.from_numpy(np.concatenate([request.audio for request in group]))  # (mics, samples)
+                try:
+                    with metrics.timer("server_separate_seconds"):
+                        # 모델 호출당 구간 수는 Separator의 SEPARATION_MAX_BATCH/메모리 예산을 따름 (max_batch는 요청을 모으는 마이크 수 기준)
+                        sources = separator.separate(audio)  # 재사용 버퍼 (응답 후 반납)
+                except Exception as e:
+                    logger.exception("❌ 분리 실패: %s", e)
+                    for request in group:
+                        request.reply({"type": "error", "error": str(e)})
+                    continue
+
+                metrics.observe("server_batch_mics", audio.shape[0])
+                offset = 0
+                for request in group:
+                    count = request.audio.shape[0]
+                    result = sources[offset:offset + count].contiguous().numpy()
+                    offset += count
+                    request.reply({"type": "result", "shape": list(result.shape)}, result.tobytes())
+                    metrics.observe("server_request_seconds", time.perf_counter() - request.t_received)
+                separator.release(sources)
+
+            self.batches += 1
+            self.requests += len(batch)
+
+    def close(self):
+        self._running = False
+        self._requests.put(_STOP)
+        if self._server is not None:
+            self._server.close()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        logger.info("🧠 모델 서버 종료: 요청 %d개, 배치 %d개", self.requests, self.batches)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SeparationClient:
+    """
+    ModelServer에 접속해 분리를 요청하는 클라이언트
+
+    model.separate / model.separate_batch와 같은 입출력을 가지므로 로드된 모델 대신 사용할 수 있다.
+    한 연결의 요청은 순서대로 처리되므로, 동시에 요청하려면 스레드/프로세스마다 클라이언트를 만든다.
+
+    사용 예:
+        with SeparationClient() as client:
+            sources = client.separate_batch(audio)  # (mics, sources, channels, samples)
+    """
+
+    def __init__(self, socket_path=MODEL_SERVER_SOCKET):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(socket_path)
+        self._reader = self._sock.makefile("rb")
+        hello, _ = _recv(self._reader)
+        self.sources = hello["sources"]
+        self.samplerate = hello["samplerate"]
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def separate_batch(self, audio_np):
+        """
+        :param audio_np: [samples, channels] numpy 배열, 마이크별 1차원 배열 리스트 또는 (mics, samples) 텐서
+        :return: 분리된 소스들 (torch.Tensor, shape: [mics, sources, channels, samples])
+        """
+        if isinstance(audio_np, (list, tuple)):
+            audio = np.stack([np.asarray(a, dtype=np.float32) for a in audio_np])
+        elif isinstance(audio_np, torch.Tensor):
+            audio = audio_np.detach().float().contiguous().numpy()  # (mics, samples)
+        else:
+            audio = np.ascontiguousarray(np.asarray(audio_np, dtype=np.float32).T)
+
+        with self._lock:
+            request_id = self._next_id
+            self._next_id += 1
+            header = {"type": "separate", "id": request_id, "mics": audio.shape[0], "samples": audio.shape[1]}
+            _send(self._sock, header, audio.tobytes())
+            message = _recv(self._reader)
+
+        if message is None:
+            raise ConnectionError("모델 서버와의 연결이 끊어졌습니다")
+        header, sources = message
+        if header["type"] == "error":
+            raise RuntimeError(f"모델 서버 분리 실패: {header['error']}")
+        return torch.from_numpy(sources)
+
+    def separate(self, audio_np):
+        """model.separate와 같이 마이크 하나의 오디오를 분리합니다 ([sources, channels, samples])."""
+        return self.separate_batch([audio_np])[0]
+
+    def close(self):
+        self._reader.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def serve(socket_path=MODEL_SERVER_SOCKET):
+    """모델을 로드하고 warm-up 후 종료(Ctrl+C)될 때까지 요청을 처리합니다."""
+    from model import load_model
+    from resample import init_resampler
+
+    model, _ = load_model()
+    init_resampler(model.samplerate)
+    server = ModelServer(model, socket_path)
+    server.warm_up()
+    with server:
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    serve()
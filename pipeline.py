@@ -0,0 +1,203 @@
+# === pipeline.py ===
+import queue
+import threading
+import time
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DROP_POLICIES = ("block", "drop_newest", "drop_oldest")
+_STOP = object()  # 워커 종료 신호
+
+
+class Stage:
+    """
+    파이프라인의 한 단계: 자체 bounded 큐와 워커 스레드를 가진다.
+
+    func(item)의 반환값이 다음 단계로 전달되며, None을 반환하면 해당 항목은 여기서 끝난다.
+    항목이 drop_policy로 버려지거나 func가 예외를 던지면 on_drop(item)이 호출된다
+    (항목이 들고 있는 재사용 버퍼를 반납하는 용도).
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=2, drop_policy="block", on_drop=None):
+        """
+        :param name: 단계 이름 (예: 'denoise')
+        :param func: 항목 처리 함수
+        :param workers: 워커 스레드 수
+        :param queue_size: 입력 큐 최대 길이
+        :param drop_policy: 큐가 가득 찼을 때 정책
+            - 'block': 빈 자리가 생길 때까지 대기 (backpressure)
+            - 'drop_newest': 새로 들어온 항목을 버림
+            - 'drop_oldest': 큐에서 가장 오래된 항목을 버리고 새 항목을 넣음
+        :param on_drop: 처리되지 못하고 버려진 항목을 받는 함수 (None이면 호출 안 함)
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"알 수 없는 drop_policy: {drop_policy} (가능: {DROP_POLICIES})")
+        if workers < 1:
+            raise ValueError(f"workers는 1 이상이어야 합니다: {workers}")
+
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.drop_policy = drop_policy
+        self.on_drop = on_drop
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.next_stage = None
+        self._threads = []
+        self._lock = threading.Lock()
+
+        # 통계
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_time = 0.0
+
+    def put(self, item):
+        """
+        drop_policy에 따라 항목을 큐에 넣습니다.
+
+        :return: 항목이 큐에 들어갔으면 True, 버려졌으면 False
+        """
+        if self.drop_policy == "block":
+            self.queue.put(item)
+            return True
+
+        if self.drop_policy == "drop_newest":
+            try:
+                self.queue.put_nowait(item)
+                return True
+            except queue.Full:
+                self._drop(item)
+                return False
+
+        # drop_oldest
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return True
+            except queue.Full:
+                try:
+                    self._drop(self.queue.get_nowait())
+                except queue.Empty:
+                    pass
+
+    def _drop(self, item):
+        with self._lock:
+            self.dropped += 1
+        metrics.inc("segments_dropped", stage=self.name)
+        self._discard(item)
+
+    def _discard(self, item):
+        if self.on_drop is None:
+            return
+        try:
+            self.on_drop(item)
+        except Exception as e:
+            logger.exception("❌ [%s] 버린 항목 정리 실패: %s", self.name, e)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+
+            start = time.perf_counter()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                metrics.inc("stage_errors", stage=self.name)
+                logger.exception("❌ [%s] 처리 실패: %s", self.name, e)
+                self._discard(item)
+                continue
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self.processed += 1
+                self.busy_time += elapsed
+            metrics.observe("stage_seconds", elapsed, stage=self.name)
+            if isinstance(result, dict):
+                result.setdefault("timings", {})[self.name] = elapsed
+
+            if result is not None and self.next_stage is not None:
+                self.next_stage.put(result)
+
+    def start(self):
+        metrics.METRICS.gauge_callback("queue_depth", self.queue.qsize, stage=self.name)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """남은 항목을 모두 처리한 뒤 워커를 종료합니다."""
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats(self):
+        with self._lock:
+            return {
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "queue_depth": self.queue.qsize(),
+                "workers": self.workers,
+                "avg_time": self.busy_time / self.processed if self.processed else 0.0,
+            }
+
+
+class Pipeline:
+    """
+    여러 Stage를 순서대로 연결한 파이프라인
+
+    각 단계가 독립적으로 동작하므로 세그먼트 N+1의 잡음 제거, 세그먼트 N의 분리,
+    세그먼트 N-1의 저장이 동시에 진행된다.
+    """
+
+    def __init__(self, stages):
+        """
+        :param stages: Stage 리스트 (실행 순서대로)
+        """
+        if not stages:
+            raise ValueError("최소 한 개의 단계가 필요합니다")
+        self.stages = list(stages)
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next_stage = next_stage
+        self._started = False
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        self._started = True
+        return self
+
+    def submit(self, item):
+        """
+        첫 번째 단계에 항목을 넣습니다 (첫 단계의 drop_policy 적용).
+
+        :return: 항목이 받아들여졌으면 True
+        """
+        return self.stages[0].put(item)
+
+    def close(self):
+        """앞 단계부터 차례로 남은 항목을 처리하고 종료합니다."""
+        if not self._started:
+            return
+        for stage in self.stages:
+            stage.stop()
+        self._started = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def stats(self):
+        """단계별 통계 딕셔너리"""
+        return {stage.name: stage.stats() for stage in self.stages}
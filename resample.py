@@ -1,9 +1,35 @@
 # === resample.py ===
+import logging
 import torch
-from torchaudio.transforms import Resample
 from config import SAMPLE_RATE, DEVICE
+from kernel_cache import cached_transform
+
+logger = logging.getLogger(__name__)
 
 RESAMPLER = None  # 전역 변수로 사용
+_RESAMPLERS = {}  # (원본, 목표 샘플레이트, 장치) → Resample 캐시
+
+
+def get_resampler(orig_freq, new_freq, device=DEVICE):
+    """
+    프로세스 전체에서 공유하는 Resample 모듈을 반환합니다 (필터 커널은 커널 캐시에서 읽거나 한 번만 계산).
+
+    Resample은 상태가 없는 모듈이므로 여러 스레드에서 함께 사용해도 된다.
+
+    :return: torch.nn.Module, 샘플레이트가 같으면 None
+    """
+    if orig_freq == new_freq:
+        return None
+    key = (orig_freq, new_freq, str(device))
+    resampler = _RESAMPLERS.get(key)
+    if resampler is None:
+        from torchaudio.transforms import Resample  # torchaudio는 처음 필요할 때 import
+
+        resampler = cached_transform(f"resample:{orig_freq}:{new_freq}", lambda: Resample(orig_freq, new_freq))
+        resampler = resampler.to(device)
+        _RESAMPLERS[key] = resampler
+    return resampler
+
 
 def init_resampler(model_samplerate):
     """
@@ -15,11 +41,11 @@ def init_resampler(model_samplerate):
     global RESAMPLER
 
     if SAMPLE_RATE != model_samplerate:
-        RESAMPLER = Resample(SAMPLE_RATE, model_samplerate).to(DEVICE)
-        print(f"🎚️ 리샘플러 생성됨: {SAMPLE_RATE} → {model_samplerate}")
+        RESAMPLER = get_resampler(SAMPLE_RATE, model_samplerate)
+        logger.info("🎚️ 리샘플러 생성됨: %d → %d", SAMPLE_RATE, model_samplerate)
     else:
         RESAMPLER = None
-        print("✅ 리샘플러 불필요 (샘플레이트 일치)")
+        logger.info("✅ 리샘플러 불필요 (샘플레이트 일치)")
 
     return RESAMPLER
 
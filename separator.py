@@ -0,0 +1,311 @@
+# === separator.py ===
+import queue
+import random
+import weakref
+import threading
+import logging
+import torch
+from config import (DEVICE, SEGMENT_DURATION, SEPARATION_MAX_BATCH, SEPARATION_CHUNK_SECONDS,
+                    SEPARATION_CHUNK_OVERLAP, SEPARATION_SHIFTS, SEPARATION_MEMORY_BUDGET_MB,
+                    SEPARATION_BYTES_PER_SAMPLE, SEPARATION_OUTPUT_POOL, SEPARATION_ACQUIRE_TIMEOUT,
+                    SEPARATION_TRACK_PEAK_RSS)
+from model import to_model_input, inference_context
+from resample import maybe_resample
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _training_frames(model):
+    # 훈련 세그먼트 길이로 패딩해서 계산하는 모델(HTDemucs)이면 그 길이, 아니면 None
+    if getattr(model, "use_train_segment", False):
+        return int(model.segment * model.samplerate)
+    return None
+
+
+class Separator:
+    """
+    메모리 상한 안에서 긴 오디오를 구간으로 나누어 분리하는 overlap-add 분리기
+
+    demucs.apply.apply_model(split=True, shifts=...)과 같은 방식(삼각 가중치 overlap-add, 무작위 시간 이동 평균)이지만,
+    - 모든 마이크 × 이동 × 구간을 한 줄로 세워 max_batch개씩 모델에 넣으므로
+      메모리 사용량이 마이크 수나 SEGMENT_DURATION과 상관없이 (구간 수 × 구간 길이)로 고정되고,
+    - 메모리 예산이 주어지면 구간 수(필요하면 구간 길이)를 예산에 맞춰 고르며,
+    - 모델 입력 버퍼와 결과 버퍼를 미리 할당해 재사용한다.
+
+    모델 입력 버퍼와 정규화 버퍼는 호출 사이에 공유하므로, 여러 스레드(분리 단계 워커, 모델 서버)가 같은
+    Separator를 쓰면 구간 계산은 lock으로 한 번에 하나씩 수행된다 (결과 버퍼 대기는 lock 밖에서).
+
+    separate()가 반환하는 결과는 버퍼 풀의 view이므로 다 쓰면 release()로 돌려줘야 한다
+    (빈 버퍼가 없으면 separate()가 acquire_timeout초까지 대기 → backpressure).
+    """
+
+    def __init__(self, model, chunk_seconds=SEPARATION_CHUNK_SECONDS, overlap=SEPARATION_CHUNK_OVERLAP,
+                 shifts=SEPARATION_SHIFTS, memory_budget_mb=SEPARATION_MEMORY_BUDGET_MB,
+                 bytes_per_sample=SEPARATION_BYTES_PER_SAMPLE, max_batch=SEPARATION_MAX_BATCH,
+                 pool_size=SEPARATION_OUTPUT_POOL, track_peak_rss=SEPARATION_TRACK_PEAK_RSS,
+                 acquire_timeout=SEPARATION_ACQUIRE_TIMEOUT):
+        """
+        :param model: 로드된 모델
+        :param chunk_seconds: 구간 길이 (초, None이면 모델 훈련 세그먼트 길이)
+        :param overlap: 이웃 구간 겹침 비율 (0~1)
+        :param shifts: 무작위 시간 이동 횟수 (0이면 이동 없음)
+        :param memory_budget_mb: 추론 메모리 상한 (MB, None이면 max_batch 그대로)
+        :param bytes_per_sample: 모델 입력 샘플 하나당 추론 메모리 추정치 (바이트, measure_bytes_per_sample 참고)
+        :param max_batch: 한 번의 모델 호출에 넣을 최대 구간 수
+        :param pool_size: 결과 버퍼 개수
+        :param track_peak_rss: True면 호출마다 최대 RSS를 지표로 기록
+        :param acquire_timeout: 빈 결과 버퍼를 기다리는 최대 시간 (초, None이면 무한 대기)
+        """
+        self.model = model
+        self.samplerate = model.samplerate
+        self.shifts = shifts
+        self.max_shift = int(0.5 * self.samplerate) if shifts else 0
+        self.bytes_per_sample = bytes_per_sample
+        self.budget = memory_budget_mb * 2 ** 20 if memory_budget_mb else None
+        self.track_peak_rss = track_peak_rss
+        self.acquire_timeout = acquire_timeout
+
+        training = _training_frames(model)
+        chunk = int(chunk_seconds * self.samplerate) if chunk_seconds else (training or int(model.segment * self.samplerate))
+        if training is not None and chunk > training:
+            logger.warning("⚠️ 구간 길이를 모델 훈련 세그먼트 길이(%.2f초)로 줄입니다", training / self.samplerate)
+            chunk = training
+        if self.budget is not None and training is None and chunk * bytes_per_sample > self.budget:
+            # 패딩 없이 입력 길이만큼 계산하는 모델은 구간을 줄여 예산을 맞춤 (최소 1초)
+            chunk = max(int(self.budget // bytes_per_sample), self.samplerate)
+        self.chunk = chunk
+        self.stride = max(1, int((1 - overlap) * chunk))
+        self.valid = model.valid_length(chunk) if hasattr(model, "valid_length") else chunk
+        self.max_batch = self._plan_batch(max_batch)
+
+        weight = torch.cat([torch.arange(1, chunk // 2 + 1), torch.arange(chunk - chunk // 2, 0, -1)]).float()
+        self.weight = weight / weight.max()
+
+        self._input = torch.empty(0, device=DEVICE)  # (구간 수, 입력 채널, valid) 모델 입력 버퍼
+        self._norm = torch.empty(0)                  # (이동 수, 샘플) 겹침 가중치 정규화 버퍼
+        self._lock = threading.Lock()                # _input/_norm을 쓰는 구간 계산 보호
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(torch.empty(0))  # 첫 사용 시 필요한 크기로 할당
+        self.last_peak_rss = 0
+
+    def _plan_batch(self, max_batch):
+        # 모델은 입력을 valid 길이로 패딩해서 계산하므로 구간당 메모리는 valid 기준
+        per_chunk = self.valid * self.bytes_per_sample
+        batch = max_batch
+        if self.budget is not None:
+            batch = max(1, min(max_batch, int(self.budget // per_chunk)))
+            if per_chunk > self.budget:
+                logger.warning("⚠️ 구간 하나(%.0fMB 추정)가 메모리 예산(%.0fMB)보다 큽니다",
+                               per_chunk / 2 ** 20, self.budget / 2 ** 20)
+        logger.info("🧩 분리 구간: %.2f초 × 최대 %d개 (겹침 %.0f%%, 이동 %d회, 추론 메모리 추정 %.0fMB)",
+                    self.chunk / self.samplerate, batch, 100 * (1 - self.stride / self.chunk), self.shifts,
+                    batch * per_chunk / 2 ** 20)
+        return batch
+
+    def _acquire(self, shape):
+        numel = 1
+        for size in shape:
+            numel *= size
+        try:
+            with metrics.timer("separate_buffer_wait_seconds"):
+                buffer = self._pool.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise RuntimeError(f"{self.acquire_timeout}초 동안 반납된 분리 결과 버퍼가 없습니다 (버퍼 누수 의심)") from None
+        if buffer.numel() < numel:
+            logger.debug("📦 분리 결과 버퍼 할당: %.1fMB", numel * 4 / 2 ** 20)
+            buffer = torch.empty(numel)
+        return buffer[:numel].view(shape)
+
+    def release(self, sources):
+        """separate()로 받은 결과 버퍼를 돌려줍니다."""
+        self._pool.put(sources._base if sources._base is not None else sources)
+
+    def _windows(self, length, origin):
+        # 원본 좌표 origin부터 stride 간격의 구간들: (시작, 길이) - 마지막 구간은 끝에서 잘림
+        # (구간이 이동 폭보다 짧으면 0 이전에서 끝나는 구간은 원본과 겹치지 않으므로 제외)
+        return [(start, min(self.chunk, length - start)) for start in range(origin, length, self.stride)
+                if start + self.chunk > 0]
+
+    def _normalizers(self, length, origins):
+        # 이동별로 위치마다 겹친 가중치 합의 역수 / 이동 수
+        if self._norm.numel() < len(origins) * length:
+            self._norm = torch.empty(len(origins) * length)
+        norm = self._norm[:len(origins) * length].view(len(origins), length).zero_()
+        for shift_idx, origin in enumerate(origins):
+            for start, size in self._windows(length, origin):
+                begin = max(start, 0)
+                norm[shift_idx, begin:start + size] += self.weight[begin - start:size]
+        return norm.reciprocal_().div_(len(origins))
+
+    def _input_buffer(self, channels):
+        shape = (self.max_batch, channels, self.valid)
+        if self._input.shape != shape:
+            self._input = torch.empty(shape, device=DEVICE)
+        return self._input
+
+    @staticmethod
+    def _fill(dst, src, start):
+        # dst (channels, n) ← src[:, start:start + n], 범위 밖은 0
+        n, length = dst.shape[-1], src.shape[-1]
+        begin, end = max(start, 0), min(start + n, length)
+        if end <= begin:
+            dst.zero_()
+            return
+        dst[:, :begin - start].zero_()
+        dst[:, begin - start:end - start].copy_(src[:, begin:end])
+        dst[:, end - start:].zero_()
+
+    def separate(self, audio, max_batch=None):
+        """
+        (mics, samples) 오디오를 분리합니다.
+
+        :param audio: (mics, samples) float32 텐서
+        :param max_batch: 이번 호출에서 한 번에 모델에 넣을 최대 구간 수 (None이면 계획된 값)
+        :return: (mics, sources, channels, samples) 결과 버퍼 view (사용 후 release 필요)
+        """
+        x = maybe_resample(to_model_input(self.model, audio).to(DEVICE))  # (mics, 입력 채널, samples)
+        mics, in_channels, length = x.shape
+        batch_limit = min(max_batch or self.max_batch, self.max_batch)
+
+        origins = [random.randint(0, self.max_shift) - self.max_shift for _ in range(self.shifts)] or [0]
+        jobs = [(mic, shift_idx, start, size)
+                for shift_idx, origin in enumerate(origins)
+                for start, size in self._windows(length, origin)
+                for mic in range(mics)]
+
+        out = self._acquire((mics, len(self.model.sources), self.model.audio_channels, length)).zero_()
+        try:
+            with self._lock, metrics.timer("separate_seconds"):
+                # 최대 RSS는 프로세스 전체 값이므로 lock 안에서 초기화/측정 (동시 호출이 서로 초기화하지 않도록)
+                tracked = self.track_peak_rss and metrics.reset_peak_rss()
+                rss_before = metrics.rss_bytes() if tracked else 0
+                norm = self._normalizers(length, origins)
+                inputs = self._input_buffer(in_channels)
+                for first in range(0, len(jobs), batch_limit):
+                    group = jobs[first:first + batch_limit]
+                    # 짧은 마지막 구간도 valid 길이의 가운데에 두고 앞뒤 실제 문맥으로 채움 (apply_model과 같음)
+                    for row, (mic, _, start, size) in enumerate(group):
+                        self._fill(inputs[row], x[mic], start - (self.valid - size) // 2)
+                    with inference_context(self.model):
+                        y = self.model(inputs[:len(group)])  # (n, sources, channels, valid)
+                    if y.device != out.device or y.dtype != out.dtype:
+                        y = y.to(out.device, torch.float32)
+
+                    for row, (mic, shift_idx, start, size) in enumerate(group):
+                        lead = (self.valid - size) // 2
+                        begin = max(start, 0)
+                        piece = y[row, ..., lead + begin - start:lead + size]
+                        piece.mul_(norm[shift_idx, begin:start + size])
+                        out[mic, ..., begin:start + size].addcmul_(piece, self.weight[begin - start:size])
+                    metrics.observe("separate_batch_size", len(group))
+
+                if tracked:
+                    self.last_peak_rss = metrics.rss_bytes("VmHWM")
+                    metrics.set_gauge("separate_peak_rss_bytes", self.last_peak_rss)
+                    metrics.set_gauge("separate_rss_increase_bytes", self.last_peak_rss - rss_before)
+        except Exception:
+            self.release(out)
+            raise
+        return out
+
+    def __call__(self, audio, max_batch=None):
+        """separate()와 같지만 결과를 새 텐서로 복사해 반환합니다 (버퍼 반납 불필요)."""
+        sources = self.separate(audio, max_batch)
+        try:
+            return sources.clone()
+        finally:
+            self.release(sources)
+
+
+_separators = weakref.WeakKeyDictionary()  # 모델 → 기본 Separator
+
+
+def get_separator(model):
+    """모델별로 공유하는 기본 설정(config.SEPARATION_*)의 Separator를 반환합니다."""
+    separator = _separators.get(model)
+    if separator is None:
+        separator = _separators[model] = Separator(model)
+    return separator
+
+
+def measure_bytes_per_sample(model):
+    """
+    구간 하나를 분리할 때 늘어나는 최대 RSS로 SEPARATION_BYTES_PER_SAMPLE 값을 측정합니다 (Linux).
+
+    :return: 모델 입력 샘플 하나당 바이트 (측정할 수 없으면 None)
+    """
+    separator = Separator(model, shifts=0, max_batch=1, pool_size=1, track_peak_rss=False)
+    audio = torch.randn(1, separator.chunk) * 0.1
+    separator.release(separator.separate(audio))  # 버퍼 할당 및 지연 초기화 제외
+
+    if not metrics.reset_peak_rss():
+        return None
+    before = metrics.rss_bytes()
+    separator.release(separator.separate(audio))
+    increase = metrics.rss_bytes("VmHWM") - before
+    return increase / separator.valid
+
+
+def check_flat_memory(model, segments=300, mics=2, seconds=SEGMENT_DURATION, tolerance_mb=32.0, **kwargs):
+    """
+    세그먼트를 연속으로 분리하면서 RSS가 늘지 않는지 확인합니다.
+
+    처음 10% 세그먼트(버퍼 할당, 지연 초기화)를 지난 시점과 마지막 세그먼트의 RSS를 비교한다.
+
+    :param model: 로드된 모델
+    :param segments: 분리할 세그먼트 수
+    :param mics: 마이크 수
+    :param seconds: 세그먼트 길이 (초)
+    :param tolerance_mb: 허용하는 RSS 증가량 (MB)
+    :param kwargs: Separator 인자
+    :return: (통과 여부, 세그먼트별 RSS 바이트 리스트)
+    """
+    from benchmarks.synthetic import generate_machine_audio
+
+    separator = Separator(model, **kwargs)
+    rss = []
+    for i in range(segments):
+        audio = torch.from_numpy(generate_machine_audio(mics=mics, seconds=seconds, seed=i % 4).T.copy())
+        separator.release(separator.separate(audio))
+        rss.append(metrics.rss_bytes())
+        if (i + 1) % max(1, segments // 10) == 0:
+            print(f"📈 세그먼트 {i + 1:4d}: RSS {rss[-1] / 2**20:.0f}MB, 호출 최대 RSS {separator.last_peak_rss / 2**20:.0f}MB")
+
+    settled = rss[max(1, segments // 10) - 1]
+    growth = (rss[-1] - settled) / 2 ** 20
+    passed = growth <= tolerance_mb
+    print(f"{'✅' if passed else '❌'} 세그먼트 {segments}개 분리 후 RSS 증가 {growth:+.1f}MB (허용 {tolerance_mb:.0f}MB)")
+    return passed, rss
+
+
+if __name__ == "__main__":
+    import os
+    import argparse
+    from config import MODEL_PATH, SOURCES
+
+    parser = argparse.ArgumentParser(description="메모리 상한 분리: 샘플당 메모리 측정 및 연속 분리 메모리 확인")
+    parser.add_argument("--segments", type=int, default=300, help="연속으로 분리할 세그먼트 수")
+    parser.add_argument("--mics", type=int, default=2, help="마이크 수")
+    parser.add_argument("--seconds", type=float, default=SEGMENT_DURATION, help="세그먼트 길이 (초)")
+    parser.add_argument("--budget-mb", type=float, default=SEPARATION_MEMORY_BUDGET_MB, help="추론 메모리 상한 (MB)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if os.path.exists(MODEL_PATH):
+        from model import load_model
+
+        separation_model, _ = load_model()
+    else:
+        # 체크포인트가 없으면 무작위 가중치 모델로 메모리만 측정
+        from demucs.htdemucs import HTDemucs
+
+        separation_model = HTDemucs(sources=SOURCES).eval()
+
+    bytes_per_sample = measure_bytes_per_sample(separation_model)
+    if bytes_per_sample is not None:
+        print(f"📏 모델 입력 샘플당 추론 메모리: {bytes_per_sample:.0f}바이트 (config.SEPARATION_BYTES_PER_SAMPLE)")
+    check_flat_memory(separation_model, segments=args.segments, mics=args.mics, seconds=args.seconds,
+                      memory_budget_mb=args.budget_mb,
+                      bytes_per_sample=bytes_per_sample or SEPARATION_BYTES_PER_SAMPLE)
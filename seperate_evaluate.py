@@ -1,8 +1,20 @@
 import os
+import csv
+import json
+import argparse
+import itertools
+import collections
 import torchaudio
 import torch
+import random
+import time
 import numpy as np
-from model import load_model, separate  # 너의 Demucs 로딩 함수 사용
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from model import load_model, separate, separate_batch, INFERENCE_MODES  # 너의 Demucs 로딩 함수 사용
+from resample import get_resampler
+from config import (SAMPLE_RATE, MONO_CHECK_MIN_SISDR, INFERENCE_MAX_SISDR_DROP, EVAL_BATCH_SIZE,
+                    EVAL_IO_WORKERS, EVAL_REPORT_PATH)
 from pathlib import Path
 
 # === 사용자 설정 ===
@@ -19,20 +31,45 @@ def compute_sisdr(est, ref):
     sisdr = 10 * torch.log10(torch.sum(proj ** 2) / torch.sum(noise ** 2))
     return sisdr.item()
 
+def compute_sisdr_batch(est, ref, lengths=None, eps=1e-8):
+    """
+    여러 추정/정답 쌍의 SI-SDR을 한 번에 계산합니다.
+
+    :param est: (..., T) 추정 텐서
+    :param ref: (..., T) 정답 텐서 (est와 같은 shape)
+    :param lengths: (...) 또는 브로드캐스트 가능한 유효 길이 (None이면 전체, 패딩된 뒷부분은 무시)
+    :param eps: 0 나누기 방지
+    :return: (...) SI-SDR (dB)
+    """
+    est, ref = est.double(), ref.double()
+    if lengths is None:
+        mask = torch.ones(est.shape[-1], dtype=est.dtype)
+        count = torch.tensor(float(est.shape[-1]), dtype=est.dtype)
+    else:
+        lengths = torch.as_tensor(lengths, dtype=est.dtype)
+        mask = (torch.arange(est.shape[-1], dtype=est.dtype) < lengths.unsqueeze(-1)).to(est.dtype)
+        count = lengths
+
+    est = (est - (est * mask).sum(-1, keepdim=True) / count.unsqueeze(-1)) * mask
+    ref = (ref - (ref * mask).sum(-1, keepdim=True) / count.unsqueeze(-1)) * mask
+    alpha = (est * ref).sum(-1, keepdim=True) / ((ref ** 2).sum(-1, keepdim=True) + eps)
+    proj = alpha * ref
+    noise = est - proj
+    return 10 * torch.log10(((proj ** 2).sum(-1) + eps) / ((noise ** 2).sum(-1) + eps))
+
 # === 분리 및 평가 ===
-def evaluate_demucs_on_folder(folder):
+def evaluate_demucs_on_folder(folder, model=None):
     # 1. 혼합 소리 로드
     mix_path = os.path.join(folder, "mixture.wav")
     mixture, sr = torchaudio.load(mix_path)
     if mixture.shape[0] > 1:
         mixture = mixture.mean(dim=0, keepdim=True)
 
-    # 2. 모델 로드 및 분리
-    model, _ = load_model()  # load_model()은 인자가 필요 없음
-    model.eval()
-    with torch.no_grad():
-        estimates = separate(model, mixture.unsqueeze(0))  # shape: [1, 5, 1, time]
-        estimates = estimates.squeeze(0).squeeze(1)  # shape: [5, time]
+    # 2. 모델 로드 및 분리 (model을 넘기면 재사용)
+    if model is None:
+        model, _ = load_model()
+    estimates = separate(model, mixture[0].numpy())  # shape: [5, channels, time]
+    estimates = estimates[:, 0]  # shape: [5, time]
 
     # 3. 평가
     scores = {}
@@ -56,9 +93,309 @@ def evaluate_demucs_on_folder(folder):
 
     return scores
 
+# === 모노 추론 경로 검증 ===
+def check_mono_equivalence(folder, min_sisdr=MONO_CHECK_MIN_SISDR, seed=0):
+    """
+    모노 추론 모드(load_model(mono=True))의 결과가 스테레오 복제 경로와 일치하는지 확인합니다.
+
+    :param folder: mixture.wav가 있는 평가 폴더
+    :param min_sisdr: 일치한다고 볼 최소 SI-SDR (dB, 스테레오 결과의 첫 채널을 기준으로 계산)
+    :param seed: apply_model의 랜덤 shift를 맞추기 위한 시드
+    :return: (통과 여부, 소스별 SI-SDR 딕셔너리)
+    """
+    mixture, sr = torchaudio.load(os.path.join(folder, "mixture.wav"))
+    mixture = mixture.mean(dim=0).numpy()
+
+    estimates = {}
+    for mono in (False, True):
+        model, _ = load_model(mono=mono)
+        random.seed(seed)
+        torch.manual_seed(seed)
+        estimates[mono] = separate(model, mixture)  # shape: [5, channels, time]
+
+    scores = {}
+    for i, source in enumerate(SOURCES):
+        ref = estimates[False][i, 0]
+        est = estimates[True][i, 0]
+        scores[source] = compute_sisdr(est, ref)
+        max_diff = (est - ref).abs().max().item()
+        print(f"🔀 {source}: SI-SDR = {scores[source]:.2f} dB, 최대 오차 = {max_diff:.2e}")
+
+    passed = all(score >= min_sisdr for score in scores.values())
+    print(f"{'✅' if passed else '❌'} 모노 추론 검증 (기준: {min_sisdr:.1f} dB)")
+    return passed, scores
+
+# === 추론 모드 정확도 / 속도 검증 ===
+def check_inference_modes(folder, modes=INFERENCE_MODES, max_drop=INFERENCE_MAX_SISDR_DROP, repeats=3, seed=0):
+    """
+    추론 모드(int8, bf16, compile 등)별로 fp32 대비 SI-SDR 변화와 분리 속도를 측정합니다.
+
+    :param folder: mixture.wav와 부품별 정답 wav가 있는 평가 폴더
+    :param modes: 비교할 추론 모드 목록 (fp32는 항상 기준으로 포함)
+    :param max_drop: 통과로 볼 fp32 대비 최대 평균 SI-SDR 감소량 (dB)
+    :param repeats: 속도 측정 반복 횟수 (첫 호출은 warm-up으로 제외)
+    :param seed: apply_model의 랜덤 shift를 맞추기 위한 시드
+    :return: {모드: {"sisdr": {부품: dB}, "drop": dB, "vs_fp32": dB, "seconds": 초, "rtf": 실시간 대비 비율, "passed": bool}}
+    """
+    mixture, sr = torchaudio.load(os.path.join(folder, "mixture.wav"))
+    mixture = mixture.mean(dim=0).numpy()
+    duration = len(mixture) / sr
+
+    targets = {}
+    for source in SOURCES:
+        gt_path = os.path.join(folder, f"{source}.wav")
+        if os.path.exists(gt_path):
+            targets[source] = torchaudio.load(gt_path)[0].mean(dim=0)
+
+    modes = ["fp32"] + [mode for mode in modes if mode != "fp32"]
+    results = {}
+    outputs = {}
+    for mode in modes:
+        model, _ = load_model(mode=mode)
+        separate(model, mixture)  # warm-up (compile 모드는 여기서 컴파일)
+
+        elapsed = []
+        for _ in range(repeats):
+            random.seed(seed)
+            torch.manual_seed(seed)
+            start = time.perf_counter()
+            estimates = separate(model, mixture)  # shape: [5, channels, time]
+            elapsed.append(time.perf_counter() - start)
+
+        sisdr = {}
+        for i, source in enumerate(SOURCES):
+            if source in targets:
+                length = min(estimates.shape[-1], targets[source].shape[-1])
+                sisdr[source] = compute_sisdr(estimates[i, 0, :length], targets[source][:length])
+
+        seconds = sorted(elapsed)[len(elapsed) // 2]
+        outputs[mode] = estimates[:, 0]  # 첫 번째 채널, shape: [5, time]
+        results[mode] = {
+            "sisdr": sisdr,
+            "seconds": seconds,
+            "rtf": seconds / duration,
+            "actual_mode": getattr(model, "inference_mode", mode),
+        }
+
+    reference = results["fp32"]
+    print(f"\n📊 추론 모드 비교 (기준: fp32, 허용 감소량 {max_drop:.2f} dB)")
+    for mode, result in results.items():
+        drops = [reference["sisdr"][source] - score for source, score in result["sisdr"].items()]
+        result["drop"] = sum(drops) / len(drops) if drops else 0.0
+        result["vs_fp32"] = compute_sisdr(outputs[mode].flatten(), outputs["fp32"].flatten()) \
+            if mode != "fp32" else float("inf")
+        result["passed"] = result["drop"] <= max_drop
+        speedup = reference["seconds"] / result["seconds"]
+        print(f"{'✅' if result['passed'] else '❌'} {mode:8s} ({result['actual_mode']}): "
+              f"SI-SDR 감소 {result['drop']:+.2f} dB, fp32 대비 {result['vs_fp32']:.1f} dB, "
+              f"{result['seconds']:.2f}초 (RTF {result['rtf']:.3f}, {speedup:.2f}배)")
+    return results
+
+# === 배치 평가 러너 ===
+def find_eval_folders(root):
+    """root 아래에서 mixture.wav가 있는 폴더를 모두 찾습니다 (정렬된 순서)."""
+    folders = []
+    for dirpath, _, filenames in os.walk(root):
+        if "mixture.wav" in filenames:
+            folders.append(dirpath)
+    return sorted(folders)
+
+
+def _load_mono(path, sample_rate):
+    # 모노로 섞고 sample_rate로 맞춘 1차원 텐서
+    audio, sr = torchaudio.load(path)
+    audio = audio.mean(dim=0)
+    resampler = get_resampler(sr, sample_rate, device="cpu")
+    return resampler(audio) if resampler is not None else audio
+
+
+def load_eval_clip(folder, sample_rate=SAMPLE_RATE):
+    """
+    평가 폴더의 혼합 소리와 부품별 정답을 sample_rate로 맞춰 읽습니다.
+
+    :return: {"folder", "mixture": (T,), "targets": {부품: (T,)}}
+    """
+    targets = {}
+    for source in SOURCES:
+        gt_path = os.path.join(folder, f"{source}.wav")
+        if os.path.exists(gt_path):
+            targets[source] = _load_mono(gt_path, sample_rate)
+    mixture = _load_mono(os.path.join(folder, "mixture.wav"), sample_rate)
+    return {"folder": folder, "mixture": mixture, "targets": targets}
+
+
+def _prefetch(executor, folders, depth, sample_rate):
+    # 최대 depth개까지 미리 읽어 두면서 순서대로 반환 (I/O와 추론을 겹침)
+    pending = collections.deque()
+    folders = iter(folders)
+    for folder in itertools.islice(folders, depth):
+        pending.append(executor.submit(load_eval_clip, folder, sample_rate))
+    while pending:
+        clip = pending.popleft().result()
+        for folder in itertools.islice(folders, 1):
+            pending.append(executor.submit(load_eval_clip, folder, sample_rate))
+        yield clip
+
+
+def _nonempty(clips):
+    # 길이가 0인 클립은 분리할 수 없으므로 건너뜀
+    for clip in clips:
+        if clip["mixture"].shape[-1] > 0:
+            yield clip
+        else:
+            print(f"⚠️ 빈 mixture.wav 건너뜀: {clip['folder']}")
+
+
+def _length_batches(clips, batch_size, max_pending):
+    # 길이가 정확히 같은 클립끼리만 묶어 batch_size개씩 반환 (패딩하면 구간별 정규화가 달라져 결과가 배치 구성에 좌우됨)
+    # 대기 중인 클립이 max_pending개를 넘으면 가장 많이 모인 길이를 batch_size보다 적어도 먼저 내보냄
+    buckets = {}
+    pending = 0
+    for clip in clips:
+        bucket = buckets.setdefault(clip["mixture"].shape[-1], [])
+        bucket.append(clip)
+        pending += 1
+        if len(bucket) == batch_size or pending > max_pending:
+            fullest = max(buckets, key=lambda length: len(buckets[length]))  # 가득 찬 길이가 있으면 그 길이
+            batch = buckets.pop(fullest)
+            pending -= len(batch)
+            yield batch
+    yield from buckets.values()
+
+
+def _score_batch(clips, estimates):
+    # 배치의 모든 클립 × 부품 SI-SDR을 한 번에 계산 (정답이 없는 부품은 NaN)
+    length = max(clip["mixture"].shape[-1] for clip in clips)
+    refs = torch.zeros(len(clips), len(SOURCES), length)
+    lengths = torch.zeros(len(clips), len(SOURCES))
+    present = torch.zeros(len(clips), len(SOURCES), dtype=torch.bool)
+    for i, clip in enumerate(clips):
+        for j, source in enumerate(SOURCES):
+            target = clip["targets"].get(source)
+            if target is None:
+                continue
+            n = min(target.shape[-1], clip["mixture"].shape[-1])
+            refs[i, j, :n] = target[:n]
+            lengths[i, j] = n
+            present[i, j] = True
+
+    scores = compute_sisdr_batch(estimates[:, :len(SOURCES), 0, :length], refs, lengths.clamp_min(1))
+    return scores.masked_fill(~present, float("nan"))
+
+
+def run_evaluation(root=FOLDER, model=None, batch_size=EVAL_BATCH_SIZE, io_workers=EVAL_IO_WORKERS,
+                   report_path=EVAL_REPORT_PATH, **model_kwargs):
+    """
+    root 아래의 모든 평가 폴더를 한 번 로드한 모델로 배치 분리하고 SI-SDR/RTF 리포트를 저장합니다.
+
+    길이가 정확히 같은 클립끼리만 배치로 묶어 패딩 없이 분리하므로, 클립의 결과가 함께 묶인 클립에 좌우되지 않는다
+    (길이가 제각각이면 배치가 batch_size보다 작아짐). 길이가 0인 클립은 분리할 수 없어 건너뛴다.
+    분리 시간은 배치 단위로 재므로 RTF도 배치별(report["batches"])로 보고하며, 클립 행에는 속한 배치의 RTF를 적는다.
+    오디오는 모델 샘플레이트로 맞춰 읽으므로 분리 전후 리샘플링이 없다.
+
+    :param root: 평가 폴더들의 상위 폴더 (폴더마다 mixture.wav와 <부품>.wav)
+    :param model: 로드된 모델 또는 SeparationClient (None이면 model_kwargs로 load_model)
+    :param batch_size: 한 번에 분리할 클립 수
+    :param io_workers: 오디오를 미리 읽는 스레드 수
+    :param report_path: 확장자 없는 리포트 경로 (.csv / .json 저장)
+    :param model_kwargs: load_model 인자 (mode, checkpoint 등)
+    :return: 리포트 딕셔너리
+    """
+    folders = find_eval_folders(root)
+    if not folders:
+        raise FileNotFoundError(f"mixture.wav가 있는 폴더가 없습니다: {root}")
+    if model is None:
+        model, _ = load_model(**model_kwargs)
+    if hasattr(model, "separate_batch"):
+        run_separation = model.separate_batch  # SeparationClient
+    else:
+        run_separation = partial(separate_batch, model, max_batch=batch_size)
+    sample_rate = model.samplerate
+
+    rows = []
+    batches = []
+    start_all = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=io_workers) as executor:
+        clips = _prefetch(executor, folders, batch_size * 2, sample_rate)
+        for batch in _length_batches(_nonempty(clips), batch_size, max_pending=batch_size * 4):
+            mixtures = torch.stack([clip["mixture"] for clip in batch])  # 모두 같은 길이 (패딩 없음)
+
+            start = time.perf_counter()
+            estimates = run_separation(mixtures)  # (clips, sources, channels, samples)
+            elapsed = time.perf_counter() - start
+            scores = _score_batch(batch, estimates)
+
+            # 분리 시간은 배치 단위로만 잴 수 있으므로 RTF는 배치마다 보고하고, 클립 행에는 속한 배치만 기록
+            audio_seconds = mixtures.numel() / sample_rate
+            batch_stats = {"clips": len(batch), "audio_seconds": audio_seconds,
+                           "seconds": elapsed, "rtf": elapsed / audio_seconds}
+            batches.append(batch_stats)
+
+            for clip, clip_scores in zip(batch, scores):
+                row = {"folder": os.path.relpath(clip["folder"], root),
+                       "duration": clip["mixture"].shape[-1] / sample_rate,
+                       "batch": len(batches) - 1, "batch_rtf": batch_stats["rtf"]}
+                row.update({source: clip_scores[j].item() for j, source in enumerate(SOURCES)})
+                rows.append(row)
+            print(f"⏳ {len(rows)}/{len(folders)} 클립 (배치 {len(batch)}개 × {mixtures.shape[-1] / sample_rate:.1f}초, "
+                  f"{elapsed:.2f}초, RTF {batch_stats['rtf']:.3f})")
+
+    summary = {}
+    for source in SOURCES:
+        values = torch.tensor([row[source] for row in rows])
+        values = values[~values.isnan()]
+        if len(values):
+            summary[source] = {"mean": values.mean().item(), "median": values.median().item(), "count": len(values)}
+    total_audio = sum(row["duration"] for row in rows)
+    report = {
+        "root": root,
+        "mode": getattr(model, "inference_mode", None),
+        "options": {key: str(value) for key, value in model_kwargs.items()},
+        "clips": len(rows),
+        "audio_seconds": total_audio,
+        "wall_seconds": time.perf_counter() - start_all,
+        "mean_rtf": sum(batch["seconds"] for batch in batches) / total_audio if total_audio else None,
+        "sources": summary,
+        "batches": batches,
+        "rows": rows,
+    }
+    _write_report(report, report_path)
+
+    if report["mean_rtf"] is None:
+        print("\n⚠️ 분리한 클립이 없습니다 (모두 길이 0)")
+    else:
+        print(f"\n📊 {len(rows)}개 클립 ({total_audio / 60:.1f}분), 평균 RTF {report['mean_rtf']:.3f}")
+    for source, stats in summary.items():
+        print(f"{source}: 평균 {stats['mean']:.2f} dB, 중앙값 {stats['median']:.2f} dB ({stats['count']}개)")
+    return report
+
+
+def _write_report(report, report_path):
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    fields = ["folder", *SOURCES, "duration", "batch", "batch_rtf"]
+    with open(report_path + ".csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(report["rows"])
+    with open(report_path + ".json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"💾 리포트 저장: {report_path}.csv, {report_path}.json")
+
 # === 실행 ===
 if __name__ == "__main__":
-    scores = evaluate_demucs_on_folder(FOLDER)
-    print("\n📊 전체 결과:")
-    for src, score in scores.items():
-        print(f"{src}: {score:.2f} dB")
+    parser = argparse.ArgumentParser(description="분리 품질(SI-SDR) / 속도 배치 평가")
+    parser.add_argument("root", nargs="?", default=FOLDER, help="평가 폴더들의 상위 폴더")
+    parser.add_argument("--checkpoint", default=None, help="체크포인트 경로 (기본: config.MODEL_PATH)")
+    parser.add_argument("--mode", default=None, choices=INFERENCE_MODES, help="추론 모드 (기본: config.INFERENCE_MODE)")
+    parser.add_argument("--batch-size", type=int, default=EVAL_BATCH_SIZE, help="한 번에 분리할 클립 수")
+    parser.add_argument("--io-workers", type=int, default=EVAL_IO_WORKERS, help="오디오 읽기 스레드 수")
+    parser.add_argument("--report", default=EVAL_REPORT_PATH, help="확장자 없는 리포트 경로")
+    args = parser.parse_args()
+
+    model_kwargs = {}
+    if args.checkpoint:
+        model_kwargs["checkpoint"] = args.checkpoint
+    if args.mode:
+        model_kwargs["mode"] = args.mode
+    run_evaluation(args.root, batch_size=args.batch_size, io_workers=args.io_workers,
+                   report_path=args.report, **model_kwargs)
@@ -0,0 +1,182 @@
+# === streaming.py ===
+import time
+import random
+import torch
+from config import (SAMPLE_RATE, DEVICE, STREAM_HOP_SECONDS, STREAM_CONTEXT_SECONDS,
+                    STREAM_LOOKAHEAD_SECONDS, STREAM_CROSSFADE_SECONDS)
+from model import to_model_input, to_audio_tensor, inference_context
+import resample
+import metrics
+
+
+class StreamingSeparator:
+    """
+    짧은 hop 단위로 오디오를 받아 과거 문맥과 함께 분리하고,
+    이전 조각과 겹치는 구간을 crossfade하여 소스 오디오 조각을 바로 내보내는 분리기
+
+    hop 하나를 내보내려면 [E - context, E + hop + crossfade + lookahead) 구간을 분리한 뒤
+    [E, E + hop) 구간을 출력하고, [E + hop, E + hop + crossfade)는 다음 조각과 섞기 위해 보관한다.
+    따라서 지연 시간은 hop + crossfade + lookahead + 처리 시간이다.
+
+    HTDemucs는 훈련 세그먼트 길이(약 7.8초)로 패딩해서 계산하므로,
+    context + hop + crossfade + lookahead를 그보다 짧게 잡아야 한 번의 forward로 끝난다.
+
+    매 hop마다 문맥을 포함한 창 전체를 다시 분리하므로 연산량은 입력 1초당
+    (context + hop + crossfade + lookahead) / hop초 분량이다 (기본값 4 + 1 + 0.25 + 0.5 = 5.75초 / 1초 hop,
+    패딩까지 치면 hop마다 훈련 세그먼트 길이 forward 한 번). 세그먼트 파이프라인(main.process_stream)의
+    약 6배 이상이고 분류기는 SEGMENT_DURATION 전체의 mel을 입력으로 받으므로, 이 분리기는 파이프라인에
+    연결하지 않고 지연 시간/품질을 평가하는 용도(evaluate_streaming)로만 사용한다.
+    """
+
+    def __init__(self, model, hop_seconds=STREAM_HOP_SECONDS, context_seconds=STREAM_CONTEXT_SECONDS,
+                 lookahead_seconds=STREAM_LOOKAHEAD_SECONDS, crossfade_seconds=STREAM_CROSSFADE_SECONDS,
+                 shifts=0, samplerate=SAMPLE_RATE):
+        """
+        :param model: 로드된 모델
+        :param hop_seconds: 한 번에 내보내는 조각 길이 (초)
+        :param context_seconds: 조각 앞쪽에 함께 넣는 과거 문맥 길이 (초)
+        :param lookahead_seconds: 조각 뒤쪽에 기다렸다가 넣는 미래 문맥 길이 (초)
+        :param crossfade_seconds: 이전 조각과 섞는 구간 길이 (초)
+        :param shifts: apply_model shifts (0이면 shift 없이 한 번만 계산)
+        :param samplerate: 입력 샘플링 주파수 (모델 샘플레이트와 같아야 함)
+        """
+        if resample.RESAMPLER is not None or samplerate != model.samplerate:
+            raise ValueError("스트리밍 분리는 입력 샘플레이트와 모델 샘플레이트가 같아야 합니다")
+
+        self.model = model
+        self.shifts = shifts
+        self.hop = int(hop_seconds * samplerate)
+        self.context = int(context_seconds * samplerate)
+        self.lookahead = int(lookahead_seconds * samplerate)
+        self.crossfade = int(crossfade_seconds * samplerate)
+        if self.hop <= 0 or self.crossfade > self.hop:
+            raise ValueError("hop은 0보다 크고 crossfade 이상이어야 합니다")
+
+        self.latency_seconds = (self.hop + self.crossfade + self.lookahead) / samplerate
+        # 입력 1초당 다시 분리하는 오디오 길이 (초) - 문맥 재분리 비용
+        self.compute_ratio = (self.context + self.hop + self.crossfade + self.lookahead) / self.hop
+        self._fade_in = torch.linspace(0, 1, self.crossfade) if self.crossfade else None
+        self.reset()
+
+    def reset(self):
+        """스트림 상태를 초기화합니다."""
+        self._buffer = None       # (mics, samples) 입력 버퍼
+        self._buffer_start = 0    # 버퍼 첫 샘플의 절대 위치
+        self._emitted = 0         # 지금까지 내보낸 샘플 수 (= 다음 조각 시작 위치 E)
+        self._tail = None         # 다음 조각과 crossfade할 구간
+
+    def _buffered_end(self):
+        return self._buffer_start + (self._buffer.shape[-1] if self._buffer is not None else 0)
+
+    def _separate_window(self, start, end):
+        # 절대 구간 [start, end)를 분리 (버퍼 밖은 0으로 패딩)
+        from demucs.apply import apply_model
+
+        window = self._buffer[:, start - self._buffer_start:end - self._buffer_start]
+        if window.shape[-1] < end - start:
+            window = torch.nn.functional.pad(window, (0, end - start - window.shape[-1]))
+        batch = to_model_input(self.model, window).to(DEVICE).contiguous()
+        with inference_context(self.model), metrics.timer("stream_separate_seconds"):
+            sources = apply_model(self.model, batch, split=True, shifts=self.shifts, progress=False)
+        return sources.float().cpu()  # (mics, sources, channels, end - start)
+
+    def _emit(self, final=False):
+        E = self._emitted
+        start = max(0, E - self.context)
+        end = E + self.hop + self.crossfade + (0 if final else self.lookahead)
+        sources = self._separate_window(start, end)
+
+        chunk = sources[..., E - start:E - start + self.hop].clone()
+        if self._tail is not None and self.crossfade:
+            head = chunk[..., :self.crossfade]
+            chunk[..., :self.crossfade] = self._tail * (1 - self._fade_in) + head * self._fade_in
+        self._tail = sources[..., E - start + self.hop:E - start + self.hop + self.crossfade].clone()
+
+        self._emitted += self.hop
+        # 다음 조각에 필요한 문맥만 남기고 버퍼 정리
+        keep_from = max(0, self._emitted - self.context)
+        if keep_from > self._buffer_start:
+            self._buffer = self._buffer[:, keep_from - self._buffer_start:]
+            self._buffer_start = keep_from
+        return E, chunk
+
+    def push(self, audio):
+        """
+        새 오디오를 넣고, 준비된 조각들을 반환합니다.
+
+        :param audio: (mics, samples) 또는 (samples,) torch.Tensor
+        :return: [(시작 샘플 위치, (mics, sources, channels, hop) 텐서), ...]
+        """
+        if audio.dim() == 1:
+            audio = audio.unsqueeze(0)
+        audio = audio.float()
+        self._buffer = audio if self._buffer is None else torch.cat([self._buffer, audio], dim=-1)
+
+        chunks = []
+        while self._buffered_end() >= self._emitted + self.hop + self.crossfade + self.lookahead:
+            chunks.append(self._emit())
+        return chunks
+
+    def flush(self):
+        """남은 입력을 미래 문맥 없이 모두 내보냅니다 (마지막 조각은 입력 길이에 맞춰 잘림)."""
+        chunks = []
+        if self._buffer is None:
+            return chunks
+        end = self._buffered_end()
+        while self._emitted < end:
+            start, chunk = self._emit(final=True)
+            chunks.append((start, chunk[..., :end - start]))
+        return chunks
+
+
+def evaluate_streaming(model, audio_np, hop_seconds=STREAM_HOP_SECONDS, seed=0, **kwargs):
+    """
+    스트리밍 분리 결과를 전체 세그먼트 분리 결과와 SI-SDR로 비교합니다.
+
+    기준 분리는 SEPARATION_SHIFTS 대신 스트리밍과 같은 shifts로 계산하고 두 경로 모두 같은 seed로 시작하므로,
+    차이는 무작위 시간 이동이 아니라 스트리밍(짧은 문맥, crossfade)에서만 온다.
+
+    :param model: 로드된 모델
+    :param audio_np: 1차원 numpy 오디오 (한 마이크)
+    :param hop_seconds: 스트리밍 hop (초)
+    :param seed: shifts 무작위 시간 이동의 seed (shifts=0이면 영향 없음)
+    :param kwargs: StreamingSeparator의 나머지 인자
+    :return: {부품 이름: SI-SDR(dB)} (전체 세그먼트 분리 결과를 기준으로 계산)
+    """
+    from seperate_evaluate import compute_sisdr
+    from separator import Separator
+
+    shifts = kwargs.get("shifts", 0)
+    random.seed(seed)
+    whole = Separator(model, shifts=shifts)(to_audio_tensor([audio_np]))[0]  # (sources, channels, samples)
+
+    random.seed(seed)  # apply_model의 shifts도 random 모듈을 사용
+    separator = StreamingSeparator(model, hop_seconds=hop_seconds, **kwargs)
+    audio = torch.as_tensor(audio_np, dtype=torch.float32)
+    hop = separator.hop
+    chunks = []
+    start = time.perf_counter()
+    for offset in range(0, audio.shape[-1], hop):
+        chunks += separator.push(audio[offset:offset + hop])
+    chunks += separator.flush()
+    elapsed = time.perf_counter() - start
+    streamed = torch.cat([chunk for _, chunk in chunks], dim=-1)[0]  # 첫 번째 마이크
+
+    length = min(streamed.shape[-1], whole.shape[-1])
+    scores = {}
+    for i, source in enumerate(model.sources):
+        scores[source] = compute_sisdr(streamed[i, 0, :length], whole[i, 0, :length])
+        print(f"🎛️ {source}: 스트리밍 vs 전체 SI-SDR = {scores[source]:.2f} dB")
+    print(f"⏱️ 스트리밍 지연 {separator.latency_seconds:.2f}초 (hop {hop_seconds:.2f}초), "
+          f"{len(chunks)}개 조각 처리 {elapsed:.2f}초 (입력 {audio.shape[-1] / SAMPLE_RATE:.1f}초, "
+          f"입력 1초당 {separator.compute_ratio:.2f}초 분량 재분리)")
+    return scores
+
+
+if __name__ == "__main__":
+    from model import load_model
+    from benchmarks.synthetic import generate_machine_audio
+
+    model, _ = load_model()
+    audio = generate_machine_audio(mics=1, seconds=10, sr=SAMPLE_RATE)[:, 0]
+    evaluate_streaming(model, audio)
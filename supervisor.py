@@ -0,0 +1,183 @@
+# === supervisor.py ===
+import os
+import time
+import signal
+import logging
+import multiprocessing as mp
+from config import (MICROPHONES, LOG_LEVEL, METRICS_PATH, SHM_NAME, SHM_SOCKET_PATH, USE_MODEL_SERVER,
+                    SUPERVISOR_THREADS_PER_WORKER, SUPERVISOR_PIN_CPUS, SUPERVISOR_RESTART_DELAY)
+
+logger = logging.getLogger(__name__)
+
+# torch 및 수치 라이브러리가 읽는 스레드 수 환경 변수 (import 전에 설정되어야 함)
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def plan_workers(mics=MICROPHONES, threads_per_worker=SUPERVISOR_THREADS_PER_WORKER,
+                 pin_cpus=SUPERVISOR_PIN_CPUS):
+    """
+    마이크를 입력 장치별로 묶어 장치마다 워커 하나를 두는 구성을 만듭니다.
+
+    입력 장치는 한 프로세스만 열 수 있는 경우가 많고 (ALSA hw:, 대부분의 USB 오디오 인터페이스),
+    같은 장치를 여러 스트림으로 열면 워커 간 샘플 위치도 맞지 않으므로 장치 하나의 채널은 모두 한 워커가 녹음한다.
+    따라서 워커 수는 입력 장치 수로 정해지며, 한 장치에 마이크가 많으면 그 워커 안에서
+    PIPELINE_WORKERS와 연산 스레드 수로 처리량을 늘린다 (연산 스레드는 마이크 수에 비례해 나눔).
+
+    :param mics: 마이크 구성 리스트 (config.MICROPHONES 형식)
+    :param threads_per_worker: 워커별 연산 스레드 수 (None이면 CPU 코어를 워커별 마이크 수에 비례해 나눔)
+    :param pin_cpus: True면 워커마다 겹치지 않는 CPU 코어 목록을 지정
+    :return: [{"name", "device", "mics", "threads", "cpus"}, ...]
+    """
+    by_device = {}
+    for mic in mics:
+        by_device.setdefault(mic["device"], []).append(mic)
+    groups = [(device, sorted(device_mics, key=lambda mic: mic["channel"])) for device, device_mics in by_device.items()]
+
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    if threads_per_worker:
+        threads = [threads_per_worker] * len(groups)
+    else:
+        threads = [max(1, len(cpus) * len(group) // len(mics)) for _, group in groups]
+    if sum(threads) > len(cpus):
+        logger.warning("⚠️ 워커 %d개의 스레드 합 %d개가 CPU 코어 수(%d)보다 많습니다", len(groups), sum(threads), len(cpus))
+
+    workers = []
+    first_cpu = 0
+    for idx, ((device, group), worker_threads) in enumerate(zip(groups, threads)):
+        worker_cpus = None
+        if pin_cpus and sum(threads) <= len(cpus):
+            worker_cpus = cpus[first_cpu:first_cpu + worker_threads]
+            first_cpu += worker_threads
+        workers.append({"name": f"worker{idx}", "device": device, "mics": group,
+                        "threads": worker_threads, "cpus": worker_cpus})
+    return workers
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def run_worker(spec, repeat=None):
+    """
+    워커 프로세스 본체: 자신이 맡은 마이크만 녹음하고 처리합니다.
+
+    :param spec: plan_workers가 만든 워커 구성
+    :param repeat: 처리할 세그먼트 수 (None이면 계속)
+    """
+    signal.signal(signal.SIGTERM, _raise_interrupt)  # terminate() 시에도 남은 세그먼트를 저장하고 종료
+    if spec["cpus"] and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, spec["cpus"])
+
+    logging.basicConfig(level=LOG_LEVEL, format=f"%(asctime)s %(levelname)s [{spec['name']}] %(name)s: %(message)s")
+
+    import metrics
+    from main import process_stream
+    from model import load_model
+    from model_server import SeparationClient
+    from resample import init_resampler
+
+    stem, ext = os.path.splitext(METRICS_PATH)
+    metrics_path = f"{stem}_{spec['name']}{ext}"
+    metrics.METRICS.start_exporter(path=metrics_path)
+    socket_stem, socket_ext = os.path.splitext(SHM_SOCKET_PATH)  # mel publisher 공유 메모리/소켓도 워커마다 분리
+
+    if USE_MODEL_SERVER:
+        model = SeparationClient()  # 모든 워커가 하나의 모델 서버를 공유
+        source_names = model.sources
+    else:
+        model, source_names = load_model(intra_threads=spec["threads"], inter_threads=1)
+        init_resampler(model.samplerate)
+
+    try:
+        process_stream(model, source_names, repeat=repeat, mics=spec["mics"],
+                       segment_name=f"segment_{spec['name']}.pt", shm_name=f"{SHM_NAME}_{spec['name']}",
+                       socket_path=f"{socket_stem}_{spec['name']}{socket_ext}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        metrics.METRICS.stop_exporter(path=metrics_path)
+
+
+class Supervisor:
+    """
+    워커 프로세스들을 시작하고, 비정상 종료된 워커를 다시 시작하는 감독 프로세스
+
+    워커마다 연산 스레드 수를 나누어 지정해 코어 과다 사용(oversubscription)을 막는다.
+    """
+
+    def __init__(self, workers, restart_delay=SUPERVISOR_RESTART_DELAY):
+        """
+        :param workers: plan_workers의 반환값
+        :param restart_delay: 워커가 종료된 뒤 다시 시작하기까지 대기 시간 (초)
+        """
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self._ctx = mp.get_context("spawn")  # 부모의 torch 스레드 풀을 물려받지 않도록 spawn 사용
+        self._processes = {}
+        self._exited_at = {}
+        self.restarts = {spec["name"]: 0 for spec in workers}
+
+    def _start(self, spec):
+        # spawn된 자식은 시작 시점의 환경 변수를 물려받으므로 스레드 수를 잠시 설정했다가 되돌림
+        saved = {var: os.environ.get(var) for var in _THREAD_ENV_VARS}
+        os.environ.update({var: str(spec["threads"]) for var in _THREAD_ENV_VARS})
+        try:
+            process = self._ctx.Process(target=run_worker, args=(spec,), name=spec["name"], daemon=False)
+            process.start()
+        finally:
+            for var, value in saved.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+
+        self._processes[spec["name"]] = process
+        mic_ids = [mic["id"] for mic in spec["mics"]]
+        logger.info("🚀 %s 시작 (pid %d, 마이크 %s, 스레드 %d, CPU %s)",
+                    spec["name"], process.pid, mic_ids, spec["threads"], spec["cpus"] or "제한 없음")
+
+    def start(self):
+        for spec in self.workers:
+            self._start(spec)
+        return self
+
+    def poll(self):
+        """종료된 워커를 확인하고 restart_delay가 지났으면 다시 시작합니다."""
+        now = time.monotonic()
+        for spec in self.workers:
+            name = spec["name"]
+            process = self._processes[name]
+            if process.is_alive():
+                continue
+            if name not in self._exited_at:
+                self._exited_at[name] = now
+                logger.error("💥 %s 종료됨 (exit code %s), %d초 후 재시작", name, process.exitcode, self.restart_delay)
+            elif now - self._exited_at[name] >= self.restart_delay:
+                del self._exited_at[name]
+                self.restarts[name] += 1
+                self._start(spec)
+
+    def run(self, interval=1.0):
+        """Ctrl+C로 멈출 때까지 워커를 감시합니다."""
+        self.start()
+        try:
+            while True:
+                time.sleep(interval)
+                self.poll()
+        except KeyboardInterrupt:
+            logger.info("🛑 종료 요청")
+        finally:
+            self.stop()
+
+    def stop(self, timeout=30):
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes.values():
+            process.join(timeout)
+        logger.info("📊 재시작 횟수: %s", self.restarts)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    Supervisor(plan_workers()).run()
@@ -0,0 +1,48 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from capture import ContinuousRecorder, FakeStatus, fake_stream_factory
+
+SAMPLERATE = 1000
+BLOCK = 500
+
+
+def make_recorder():
+    # 세그먼트 1초, 버퍼 3초 - 스트림은 시작하지 않고 callback을 직접 호출
+    return ContinuousRecorder(channels=2, samplerate=SAMPLERATE, segment_duration=1, overlap=0,
+                              buffer_seconds=3, stream_factory=fake_stream_factory(realtime=False))
+
+
+def feed(recorder, blocks):
+    for _ in range(blocks):
+        recorder._callback(np.zeros((BLOCK, 2), dtype=np.float32), BLOCK, None, FakeStatus())
+
+
+def test_overwriting_held_segment_counts_overrun():
+    recorder = make_recorder()
+    feed(recorder, 2)
+    assert recorder.read_segment(timeout=0, hold=True) is not None
+    feed(recorder, 4)  # 버퍼(3초)가 가득 찼지만 아직 덮어쓰지 않음
+    assert recorder.stats()["overwritten_segments"] == 0
+
+    feed(recorder, 1)  # 반납하지 않은 첫 세그먼트를 덮어씀
+    stats = recorder.stats()
+    assert stats["overwritten_segments"] == 1
+    assert stats["overruns"] >= 1
+    assert stats["segments_held"] == 0
+
+
+def test_released_segment_is_not_an_overrun():
+    recorder = make_recorder()
+    feed(recorder, 2)
+    recorder.read_segment(timeout=0, hold=True)
+    recorder.release_segment(recorder.last_segment_start)
+    for _ in range(3):
+        feed(recorder, 2)
+        recorder.read_segment(timeout=0, hold=True)
+        recorder.release_segment(recorder.last_segment_start)
+
+    stats = recorder.stats()
+    assert stats["overwritten_segments"] == 0
+    assert stats["overruns"] == 0
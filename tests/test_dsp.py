@@ -0,0 +1,78 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import numpy as np
+from config import LEVEL_TARGET_RMS_DB
+from dsp import DSPChain, level_adjust_
+from main import adaptive_level_adjust
+from pipeline import Stage
+
+SAMPLES = 44100
+
+
+def _signal(amplitude, seed):
+    rng = np.random.default_rng(seed)
+    t = np.arange(SAMPLES) / 44100
+    return (amplitude * np.sin(2 * np.pi * 220 * t) + 0.05 * amplitude * rng.standard_normal(SAMPLES)).astype(np.float32)
+
+
+@pytest.mark.parametrize("amplitude", [0.0, 0.01, 0.2, 0.95], ids=["silent", "quiet", "moderate", "loud"])
+def test_level_adjust_matches_adaptive_level_adjust(amplitude):
+    audio_np = np.stack([_signal(amplitude, 0), _signal(amplitude * 0.5, 1)], axis=1)  # [samples, mics]
+    expected = np.stack([adaptive_level_adjust(audio_np[:, mic], target_rms_db=LEVEL_TARGET_RMS_DB)
+                         for mic in range(audio_np.shape[1])])
+
+    chain = DSPChain(audio_np.shape[1], SAMPLES, pool_size=1)
+    audio = chain.process(audio_np)
+    try:
+        np.testing.assert_allclose(audio.numpy(), expected, rtol=1e-4, atol=1e-5)
+    finally:
+        chain.release(audio)
+
+
+def test_level_adjust_does_not_allocate_output():
+    audio = torch.from_numpy(np.stack([_signal(0.95, 0), _signal(0.01, 1)]))
+    assert level_adjust_(audio, LEVEL_TARGET_RMS_DB).data_ptr() == audio.data_ptr()
+
+
+def _release_clean(chain):
+    def on_drop(item):
+        chain.release(item.pop("clean"))
+    return on_drop
+
+
+def test_buffer_released_when_stage_fails():
+    chain = DSPChain(1, SAMPLES, pool_size=1, acquire_timeout=1.0)
+    audio_np = _signal(0.2, 0)[:, None]
+
+    def failing(item):
+        raise RuntimeError("분리 실패")
+
+    stage = Stage("level", failing, on_drop=_release_clean(chain))
+    stage.start()
+    stage.put({"clean": chain.acquire(audio_np)})
+    stage.stop()
+
+    assert stage.stats()["errors"] == 1
+    chain.release(chain.acquire(audio_np))  # 반납되지 않았다면 acquire_timeout 후 RuntimeError
+
+
+def test_buffer_released_when_item_dropped():
+    chain = DSPChain(1, SAMPLES, pool_size=2, acquire_timeout=1.0)
+    audio_np = _signal(0.2, 0)[:, None]
+    stage = Stage("separate", lambda item: None, queue_size=1, drop_policy="drop_newest",
+                  on_drop=_release_clean(chain))  # 시작하지 않아 큐가 비지 않음
+
+    assert stage.put({"clean": chain.acquire(audio_np)})
+    assert not stage.put({"clean": chain.acquire(audio_np)})
+    assert stage.stats()["dropped"] == 1
+    chain.release(chain.acquire(audio_np))  # 버려진 항목의 버퍼는 다시 사용 가능
+
+
+def test_acquire_times_out_when_pool_exhausted():
+    chain = DSPChain(1, SAMPLES, pool_size=1, acquire_timeout=0.05)
+    audio_np = _signal(0.2, 0)[:, None]
+    chain.acquire(audio_np)
+    with pytest.raises(RuntimeError):
+        chain.acquire(audio_np)
@@ -0,0 +1,52 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchaudio")
+
+import kernel_cache
+from torchaudio.transforms import Resample, MelSpectrogram
+
+FACTORIES = {
+    "resample": lambda: Resample(44100, 16000),
+    "mel": lambda: MelSpectrogram(sample_rate=16000, n_fft=4096, win_length=1024, hop_length=300, n_mels=240),
+}
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(kernel_cache, "_cache", None)
+    return str(tmp_path / "dsp_kernels.pt")
+
+
+def reload_cache(monkeypatch):
+    monkeypatch.setattr(kernel_cache, "_cache", None)  # 다음 시작처럼 파일에서 다시 읽음
+
+
+@pytest.mark.parametrize("kind", FACTORIES)
+def test_rebuilt_transform_matches_factory(kind, cache_path, monkeypatch):
+    factory = FACTORIES[kind]
+    kernel_cache.cached_transform(kind, factory, enabled=True, path=cache_path)
+    reload_cache(monkeypatch)
+
+    def not_called():
+        raise AssertionError("캐시가 있으면 factory를 호출하지 않아야 함")
+
+    rebuilt = kernel_cache.cached_transform(kind, not_called, enabled=True, path=cache_path)
+    expected = factory()
+    assert type(rebuilt) is type(expected)
+    audio = torch.randn(2, 44100)
+    torch.testing.assert_close(rebuilt(audio), expected(audio))
+
+
+def test_cache_file_holds_only_tensors(cache_path):
+    kernel_cache.cached_transform("mel", FACTORIES["mel"], enabled=True, path=cache_path)
+    torch.load(cache_path, weights_only=True)  # 모듈이 저장되어 있으면 UnpicklingError
+
+
+def test_pickled_module_cache_is_ignored(cache_path):
+    # 예전 형식(모듈 pickle)이나 바뀐 파일은 weights_only로 읽히지 않으므로 다시 계산
+    torch.save({"resample|torchaudio=any": Resample(44100, 16000)}, cache_path)
+    module = kernel_cache.cached_transform("resample", FACTORIES["resample"], enabled=True, path=cache_path)
+    audio = torch.randn(1, 44100)
+    torch.testing.assert_close(module(audio), FACTORIES["resample"]()(audio))
+    torch.load(cache_path, weights_only=True)
@@ -0,0 +1,53 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchaudio")
+pytest.importorskip("noisereduce")
+
+import numpy as np
+import kernel_cache
+import main
+from config import SAMPLE_RATE, SEGMENT_DURATION, MICROPHONES, SOURCES, MEL_SIZE
+
+
+class IdentityModel(torch.nn.Module):
+    """입력을 모든 부품에 그대로 복사하는 분리 모델 대역 (Separator가 사용하는 속성만 가짐)"""
+    samplerate = SAMPLE_RATE
+    segment = SEGMENT_DURATION
+    sources = SOURCES
+    audio_channels = 2
+
+    def forward(self, x):
+        return x.unsqueeze(1).repeat(1, len(self.sources), 1, 1)  # (n, sources, channels, samples)
+
+
+class CollectingWriter:
+    def __init__(self):
+        self.segments = []
+
+    def submit(self, timestamp, mels, keys, skipped=None):
+        self.segments.append((timestamp, mels, keys, skipped))
+
+
+def make_item(index, seed=0):
+    rng = np.random.default_rng(seed)
+    audio = (0.1 * rng.standard_normal((SAMPLE_RATE * SEGMENT_DURATION, len(MICROPHONES)))).astype(np.float32)
+    return {"index": index, "timestamp": f"segment_{index}", "audio": audio, "mics": [mic["id"] for mic in MICROPHONES]}
+
+
+def test_default_pipeline_produces_mels(monkeypatch):
+    # 기본 설정(DENOISE_BACKEND 포함)으로 만든 파이프라인이 세그먼트를 실패 없이 mel까지 처리하는지
+    monkeypatch.setattr(kernel_cache, "_save", lambda path: None)  # 테스트가 커널 캐시 파일을 쓰지 않도록
+    writer = CollectingWriter()
+    pipeline = main.build_pipeline(IdentityModel(), SOURCES, main.load_noise_clip(), writer, mics=MICROPHONES)
+
+    with pipeline:
+        assert pipeline.submit(make_item(0))
+
+    stats = pipeline.stats()
+    assert all(stage["errors"] == 0 for stage in stats.values()), stats
+    assert len(writer.segments) == 1
+    _, mels, keys, _ = writer.segments[0]
+    expected = sum(len(mic["parts"] or SOURCES) for mic in MICROPHONES)
+    assert mels.shape == (expected, 1, *MEL_SIZE)
+    assert len(keys) == expected
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import metrics
+from separator import Separator
+
+SAMPLE_RATE = 8000
+
+
+class IdentityModel(torch.nn.Module):
+    """입력을 모든 부품에 그대로 복사하는 분리 모델 대역 (Separator가 사용하는 속성만 가짐)"""
+    samplerate = SAMPLE_RATE
+    segment = 1.0
+    sources = ["a", "b"]
+    audio_channels = 2
+
+    def forward(self, x):
+        return x.unsqueeze(1).repeat(1, len(self.sources), 1, 1)  # (n, sources, channels, samples)
+
+
+def make_separator(**kwargs):
+    params = {"chunk_seconds": 0.25, "overlap": 0.25, "shifts": 0, "memory_budget_mb": None,
+              "max_batch": 3, "pool_size": 2, "track_peak_rss": False, "acquire_timeout": 1.0}
+    params.update(kwargs)
+    return Separator(IdentityModel(), **params)
+
+
+def expected_sources(audio):
+    # (mics, samples) → (mics, sources, channels, samples): 모든 부품과 채널이 입력과 같아야 함
+    return audio[:, None, None, :].expand(-1, 2, 2, -1)
+
+
+@pytest.mark.parametrize("shifts", [0, 2])
+def test_overlap_add_reconstructs_input(shifts):
+    audio = torch.randn(3, int(1.3 * SAMPLE_RATE))
+    separator = make_separator(shifts=shifts)
+    torch.testing.assert_close(separator(audio), expected_sources(audio), rtol=1e-5, atol=1e-5)
+
+
+def test_concurrent_calls_keep_their_own_results():
+    separator = make_separator(pool_size=4)
+    inputs = [torch.randn(2, SAMPLE_RATE) for _ in range(4)]
+    results = [None] * len(inputs)
+
+    def run(i):
+        for _ in range(5):
+            results[i] = separator(inputs[i])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(inputs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for audio, result in zip(inputs, results):
+        torch.testing.assert_close(result, expected_sources(audio), rtol=1e-5, atol=1e-5)
+
+
+def test_peak_rss_measured_under_lock(monkeypatch):
+    # 최대 RSS 초기화/측정은 프로세스 전체 값이므로 다른 호출과 겹치지 않게 lock 안에서만 해야 함
+    separator = make_separator(track_peak_rss=True)
+    calls = []
+
+    def reset_peak_rss():
+        calls.append(("reset", separator._lock.locked()))
+        return True
+
+    def rss_bytes(field="VmRSS"):
+        calls.append((field, separator._lock.locked()))
+        return 100 if field == "VmRSS" else 300
+
+    monkeypatch.setattr(metrics, "reset_peak_rss", reset_peak_rss)
+    monkeypatch.setattr(metrics, "rss_bytes", rss_bytes)
+    separator(torch.randn(1, SAMPLE_RATE))
+
+    assert calls == [("reset", True), ("VmRSS", True), ("VmHWM", True)]
+    assert separator.last_peak_rss == 300
+
+
+def test_output_buffer_reused_and_acquire_times_out():
+    separator = make_separator(pool_size=1, acquire_timeout=0.1)
+    audio = torch.randn(1, SAMPLE_RATE)
+
+    first = separator.separate(audio)
+    with pytest.raises(RuntimeError):
+        separator.separate(audio)  # 반납 전에는 빈 버퍼가 없음
+    pointer = first.data_ptr()
+    separator.release(first)
+
+    second = separator.separate(audio)
+    assert second.data_ptr() == pointer
+    separator.release(second)
@@ -0,0 +1,165 @@
+# === writer.py ===
+import os
+import queue
+import threading
+import time
+import logging
+import torch
+from config import OUTPUT_FOLDER, OUTPUT_LAYOUT, WRITER_QUEUE_SIZE
+from mel import save_mel
+import metrics
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_LAYOUTS = ("segment", "per_file")
+SEGMENT_FILE_NAME = "segment.pt"
+SKIP_MARKER_NAME = "skipped.txt"
+_STOP = object()  # 종료 신호
+
+
+def segment_path(timestamp_str, output_folder=OUTPUT_FOLDER, file_name=SEGMENT_FILE_NAME):
+    """세그먼트 통합 파일 경로 (output/<timestamp>/segment.pt)"""
+    return os.path.join(output_folder, timestamp_str, file_name)
+
+
+def save_segment(timestamp_str, mels, keys, output_folder=OUTPUT_FOLDER, skipped=None, file_name=SEGMENT_FILE_NAME):
+    """
+    한 세그먼트의 모든 마이크/부품 mel을 하나의 파일로 원자적으로 저장합니다.
+
+    파일 내용: {"timestamp": str, "mels": [N, 1, 240, 240] 텐서, "mics": [마이크 인덱스], "sources": [부품 이름],
+               "skipped": {마이크 인덱스: 건너뛴 이유}}
+
+    :param timestamp_str: 세그먼트 폴더명
+    :param mels: [N, 1, 240, 240] 텐서
+    :param keys: [(mic_idx, source_name), ...] (mels와 같은 순서)
+    :param skipped: 활동 게이트가 건너뛴 마이크 {mic_idx: 'quiet' | 'unchanged'}
+    :param file_name: 파일 이름 (여러 워커 프로세스가 같은 세그먼트 폴더에 쓸 때는 워커별로 다르게)
+    :return: 저장 경로
+    """
+    path = segment_path(timestamp_str, output_folder, file_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {
+        "timestamp": timestamp_str,
+        "mels": mels.contiguous(),
+        "mics": [mic_idx for mic_idx, _ in keys],
+        "sources": [source_name for _, source_name in keys],
+        "skipped": dict(skipped or {}),
+    }
+    tmp_path = path + ".tmp"
+    torch.save(payload, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def save_skip_marker(timestamp_str, skipped, output_folder=OUTPUT_FOLDER):
+    """
+    per_file 레이아웃에서 건너뛴 마이크를 표시합니다 (output/<timestamp>/mic_N/skipped.txt에 이유 기록).
+    """
+    for mic_idx, reason in skipped.items():
+        mic_folder = os.path.join(output_folder, timestamp_str, f"mic_{mic_idx + 1}")  # save_mel과 같은 1부터 시작하는 번호
+        os.makedirs(mic_folder, exist_ok=True)
+        with open(os.path.join(mic_folder, SKIP_MARKER_NAME), "w") as f:
+            f.write(reason + "\n")
+
+
+def load_segment(path):
+    """save_segment로 저장한 파일을 읽습니다."""
+    return torch.load(path, weights_only=True)
+
+
+class AsyncMelWriter:
+    """
+    완성된 mel 텐서를 bounded 큐로 받아 백그라운드 스레드에서 디스크에 쓰는 writer
+
+    layout='segment'이면 세그먼트당 하나의 통합 파일(segment.pt)을,
+    layout='per_file'이면 기존과 같은 mic_N/<source>.pt 파일들을 저장합니다.
+    큐가 가득 차면 submit()이 대기하므로 디스크가 느릴 때 파이프라인에 backpressure가 걸립니다.
+    """
+
+    def __init__(self, layout=OUTPUT_LAYOUT, queue_size=WRITER_QUEUE_SIZE, output_folder=OUTPUT_FOLDER,
+                 segment_name=SEGMENT_FILE_NAME):
+        """
+        :param layout: 'segment' 또는 'per_file'
+        :param queue_size: 대기 가능한 최대 세그먼트 수
+        :param output_folder: 저장 폴더
+        :param segment_name: layout='segment'일 때 세그먼트 통합 파일 이름
+        """
+        if layout not in OUTPUT_LAYOUTS:
+            raise ValueError(f"알 수 없는 layout: {layout} (가능: {OUTPUT_LAYOUTS})")
+        self.layout = layout
+        self.output_folder = output_folder
+        self.segment_name = segment_name
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+
+        # 통계
+        self.written = 0
+        self.errors = 0
+        self.write_time = 0.0
+
+    def start(self):
+        metrics.METRICS.gauge_callback("queue_depth", self.queue.qsize, stage="writer")
+        self._thread = threading.Thread(target=self._run, name="mel-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, timestamp_str, mels, keys, skipped=None):
+        """
+        한 세그먼트의 mel들을 저장 대기열에 넣습니다.
+
+        :param timestamp_str: 세그먼트 폴더명
+        :param mels: [N, 1, 240, 240] 텐서
+        :param keys: [(mic_idx, source_name), ...]
+        :param skipped: 활동 게이트가 건너뛴 마이크 {mic_idx: 이유}
+        """
+        self.queue.put((timestamp_str, mels, keys, skipped))
+
+    def _write(self, timestamp_str, mels, keys, skipped):
+        if self.layout == "segment":
+            save_segment(timestamp_str, mels, keys, self.output_folder, skipped, self.segment_name)
+            return
+        if skipped:
+            save_skip_marker(timestamp_str, skipped, self.output_folder)
+        for (mic_idx, source_name), mel in zip(keys, mels):
+            # view를 그대로 저장하면 전체 storage가 저장되므로 복제
+            save_mel(mel.clone(), mic_idx, source_name, timestamp_str)
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is _STOP:
+                break
+            start = time.perf_counter()
+            try:
+                self._write(*job)
+                self.written += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error("❌ 저장 실패 (%s): %s", job[0], e)
+            elapsed = time.perf_counter() - start
+            self.write_time += elapsed
+            metrics.observe("write_seconds", elapsed)
+
+    def backlog(self):
+        """아직 쓰지 않은 세그먼트 수"""
+        return self.queue.qsize()
+
+    def close(self):
+        """남은 세그먼트를 모두 기록한 뒤 종료하고 통계를 출력합니다."""
+        if self._thread is None:
+            return
+        backlog = self.backlog()
+        if backlog:
+            logger.info("⏳ 저장 대기 중인 세그먼트 %d개 기록 중...", backlog)
+        self.queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        avg = self.write_time / self.written if self.written else 0.0
+        logger.info("💾 저장 완료: %d개 세그먼트 (실패 %d, 평균 %.3f초, 종료 시 대기 %d개)",
+                    self.written, self.errors, avg, backlog)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()